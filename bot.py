@@ -1,15 +1,23 @@
 # bot.py — Entry point. Run this file to start the bot: python bot.py
 from keep_alive import keep_alive
 import asyncio
+import hashlib
+import json
 import logging
 import os
+import time
+from contextlib import contextmanager
 from datetime import datetime
 
 import discord
-import motor.motor_asyncio
 from discord.ext import commands
 
 import config
+from models import database, id_schema, user_model
+from models.storage import open_storage
+from services import cluster_service
+from services.cache_service import shared_cache
+from services.log_service import log_dispatcher
 
 # ── Logging setup ──────────────────────────────────────────────────────────
 logging.basicConfig(
@@ -17,7 +25,11 @@ logging.basicConfig(
     format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
     handlers=[
         logging.StreamHandler(),
-        logging.FileHandler("bot.log", encoding="utf-8"),
+        # One log file per cluster process when started by cluster.py
+        logging.FileHandler(
+            f"bot-{cluster_service.CLUSTER_ID}.log" if cluster_service.IS_WORKER else "bot.log",
+            encoding="utf-8",
+        ),
     ],
 )
 log = logging.getLogger("bot")
@@ -28,39 +40,132 @@ intents.message_content = True   # Required: enable in Discord Dev Portal
 intents.members = True           # Required: enable in Discord Dev Portal
 
 
-class CommunityBot(commands.Bot):
+class CommunityBot(commands.AutoShardedBot):
     def __init__(self):
         super().__init__(
             command_prefix="!",   # Prefix is unused (we use slash commands) but required
             intents=intents,
             help_command=None,    # We have our own /help
+            max_messages=config.DISCORD_MAX_MESSAGES,  # Logs use services/message_cache.py
+            # Set by cluster.py for its processes; otherwise every shard runs here
+            shard_count=config.SHARD_COUNT,
+            shard_ids=cluster_service.SHARD_IDS,
         )
-        self.db = None
+        self.mongo = None   # MongoDB client (see models/database.py)
+        self.db = None      # MongoDB database; None when running on SQLite
+        self.store = None   # models/storage.py backend for everything but the economy
         self.start_time = datetime.utcnow()
+        self.startup_timings: dict[str, float] = {}   # {phase: seconds}, filled by setup_hook
+        self._started = time.perf_counter()
+        self._tasks: set[asyncio.Task] = set()   # Background jobs started by spawn()
+
+    def spawn(self, coro, name: str) -> asyncio.Task:
+        """Run a background job, holding a reference until it ends and logging its failure."""
+        task = asyncio.create_task(coro, name=name)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            log.error(f"Background job '{task.get_name()}' failed", exc_info=task.exception())
+
+    @contextmanager
+    def _phase(self, name: str):
+        start = time.perf_counter()
+        yield
+        self.startup_timings[name] = time.perf_counter() - start
 
     async def setup_hook(self):
         """Called automatically before the bot connects. Load cogs and DB here."""
-        await self.connect_database()
-        await self.load_cogs()
-        # Sync slash commands to Discord
-        await self.tree.sync()
-        log.info("Slash commands synced.")
+        with self._phase("database"):
+            if config.STORAGE_BACKEND != "sqlite":
+                await self.connect_database()
+            self.store = open_storage(self.db)
+            await asyncio.gather(self.store.open(), shared_cache.connect())
+        with self._phase("cogs"):
+            await self.load_cogs()
+        if self.db is not None and user_model.migration_pending():
+            # Moves v1 user documents over in the background; lookups cope meanwhile.
+            # One cluster is enough: the others would only race it for the same batches,
+            # so they just watch for it to finish.
+            if cluster_service.CLUSTER_ID == 0:
+                self.spawn(user_model.migrate_to_v2(self.db), "users v2 migration")
+            else:
+                self.spawn(user_model.watch_schema_state(self.db), "users v2 watch")
+        if self.db is not None and id_schema.migration_pending():
+            # Same for the string IDs of the other collections
+            if cluster_service.CLUSTER_ID == 0:
+                self.spawn(id_schema.migrate(self.db), "ID migration")
+            else:
+                self.spawn(id_schema.watch_schema_state(self.db), "ID migration watch")
+        with self._phase("command sync"):
+            # Commands are global: one cluster syncing them is enough
+            if cluster_service.CLUSTER_ID == 0:
+                await self.sync_commands()
+        self.spawn(cluster_service.run_ipc(self), "cluster IPC")
+        log.info("Startup: " + ", ".join(f"{k} {v * 1000:.0f}ms" for k, v in self.startup_timings.items()))
+
+    def _command_hash(self, guild: discord.Object | None) -> str:
+        """Hash of the command payload Discord would receive for this scope."""
+        cmds = self.tree.get_commands(guild=guild)
+        try:
+            payload = [c.to_dict(self.tree) for c in cmds]
+        except TypeError:   # discord.py < 2.4
+            payload = [c.to_dict() for c in cmds]
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    async def sync_commands(self):
+        """Sync slash commands to Discord, skipping any scope that hasn't changed since the last sync."""
+        try:
+            with open(config.COMMAND_SYNC_STATE, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+
+        guilds = [discord.Object(id=g) for g in config.SYNC_GUILDS]
+        for guild in guilds:
+            self.tree.copy_global_to(guild=guild)
+        changed = False
+        for guild in guilds or [None]:
+            scope = f"{self.application_id}:{guild.id if guild else 'global'}"
+            digest = self._command_hash(guild)
+            if state.get(scope) == digest:
+                log.info(f"Slash commands unchanged ({scope}), sync skipped.")
+                continue
+            await self.tree.sync(guild=guild)
+            state[scope] = digest
+            changed = True
+            log.info(f"Slash commands synced ({scope}).")
+
+        if changed:
+            with open(config.COMMAND_SYNC_STATE, "w", encoding="utf-8") as f:
+                json.dump(state, f, indent=2)
 
     async def connect_database(self):
         """Connect to MongoDB and create indexes for performance."""
-        client = motor.motor_asyncio.AsyncIOMotorClient(config.MONGO_URI)
-        self.db = client["discord_bot"]
+        self.mongo = database.connect(config.MONGO_URI)
+        self.db = self.mongo["discord_bot"]
 
-        # Indexes — these make queries fast even with millions of records
-        await self.db.users.create_index(
-            [("user_id", 1), ("guild_id", 1)], unique=True
+        # Indexes are declared next to the queries that need them. Imported here so
+        # SQLite deployments never load the MongoDB-only modules.
+        from models import mongo_storage
+        from services import economy_service, inventory_service, ledger_service
+        await asyncio.gather(
+            database.ensure_indexes(
+                self.db,
+                user_model.INDEXES,
+                mongo_storage.INDEXES,
+                economy_service.INDEXES,
+                ledger_service.INDEXES,
+                inventory_service.INDEXES,
+            ),
+            user_model.load_schema_state(self.db),
+            user_model.repair_partial_users(self.db),
+            id_schema.load_schema_state(self.db),
         )
-        await self.db.users.create_index([("guild_id", 1), ("xp", -1)])
-        await self.db.users.create_index([("guild_id", 1), ("balance", -1)])
-        await self.db.warnings.create_index([("user_id", 1), ("guild_id", 1)])
-        await self.db.giveaways.create_index([("guild_id", 1), ("ended", 1)])
-        await self.db.tickets.create_index([("user_id", 1), ("guild_id", 1)])
-        log.info("Connected to MongoDB and ensured indexes.")
+        log.info(f"Connected to MongoDB ({database.driver_name()}) and ensured indexes.")
 
     async def load_cogs(self):
         """Load all command and event cogs."""
@@ -72,30 +177,66 @@ class CommunityBot(commands.Bot):
             "commands.moderation",
             "commands.autoroles",
             "commands.utility",
+            "commands.settings",
             "events.on_message",
             "events.on_member_join",
             "events.on_member_remove",
             "events.on_message_edit",
         ]
-        for cog in cogs:
+        # Economy features, role panels and timed roles only exist on MongoDB (see README)
+        mongo_only = {"commands.economy", "commands.autoroles"}
+        if self.db is None:
+            for cog in sorted(mongo_only):
+                log.warning(f"Skipped cog {cog}: needs MongoDB storage (STORAGE_BACKEND=sqlite)")
+            cogs = [c for c in cogs if c not in mongo_only]
+
+        async def load(cog: str):
+            start = time.perf_counter()
             try:
                 await self.load_extension(cog)
-                log.info(f"Loaded cog: {cog}")
+                log.info(f"Loaded cog: {cog} ({(time.perf_counter() - start) * 1000:.0f}ms)")
             except Exception as e:
                 log.error(f"Failed to load cog {cog}: {e}")
 
+        # Cog setups are independent (cache warm-ups, one-time migrations), so they
+        # overlap their database round trips instead of waiting on each other
+        await asyncio.gather(*(load(cog) for cog in cogs))
+
+    async def close(self):
+        # Don't lose buffered log entries on shutdown
+        await log_dispatcher.flush_all()
+        if self.store:
+            await self.store.close()
+        await shared_cache.close()
+        if self.mongo:
+            # Motor's close() is sync, PyMongo's async one is a coroutine
+            result = self.mongo.close()
+            if asyncio.iscoroutine(result):
+                await result
+        await super().close()
+
     async def on_ready(self):
         log.info(f"Logged in as {self.user} (ID: {self.user.id})")
+        if "ready" not in self.startup_timings:
+            self.startup_timings["ready"] = time.perf_counter() - self._started
+            log.info(f"Time to ready: {self.startup_timings['ready']:.2f}s")
+        await self.update_presence()
+
+    async def update_presence(self):
+        """Show the server count across all clusters."""
+        if not self.is_ready():
+            return
         await self.change_presence(
             activity=discord.Activity(
                 type=discord.ActivityType.watching,
-                name=f"{len(self.guilds)} servers | /help"
+                name=f"{cluster_service.totals(self)['guilds']} servers | /help"
             )
         )
 
 
 async def main():
-    keep_alive()
+    if not cluster_service.IS_WORKER:   # cluster.py runs its own
+        keep_alive()
     async with CommunityBot() as bot:
         await bot.start(config.BOT_TOKEN)
 
@@ -0,0 +1,103 @@
+# cluster.py — Runs the bot as several processes: python cluster.py
+#
+# The shards (SHARD_COUNT, or Discord's recommendation) are split into
+# CLUSTER_COUNT contiguous ranges, one bot.py process each, so the bot can use
+# more than one CPU core. The launcher restarts a process that exits and relays
+# stats between them (see services/cluster_service.py).
+
+from keep_alive import keep_alive
+import asyncio
+import json
+import logging
+import os
+import sys
+
+import aiohttp
+
+import config
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+log = logging.getLogger("cluster")
+
+IDENTIFY_SECONDS = 5     # Discord allows one shard login per 5 seconds (max_concurrency 1)
+RESTART_DELAY = 10
+
+_writers: set[asyncio.StreamWriter] = set()
+
+
+async def recommended_shards() -> int:
+    async with aiohttp.ClientSession() as session:
+        async with session.get(
+            "https://discord.com/api/v10/gateway/bot",
+            headers={"Authorization": f"Bot {config.BOT_TOKEN}"},
+        ) as resp:
+            resp.raise_for_status()
+            return (await resp.json())["shards"]
+
+
+def shard_ranges(shard_count: int, clusters: int) -> list[list[int]]:
+    """Contiguous shard ID ranges, as even as possible."""
+    clusters = max(1, min(clusters, shard_count))
+    size, extra = divmod(shard_count, clusters)
+    ranges, start = [], 0
+    for i in range(clusters):
+        end = start + size + (1 if i < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+
+# ── IPC relay ──────────────────────────────────────────────────────────────
+# Every line a cluster sends is forwarded to all other clusters.
+
+async def _relay(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    _writers.add(writer)
+    try:
+        while line := await reader.readline():
+            json.loads(line)   # Drop a client that sends garbage
+            for other in list(_writers):
+                if other is not writer:
+                    other.write(line)
+    except (OSError, ValueError):
+        pass
+    finally:
+        _writers.discard(writer)
+        writer.close()
+
+
+# ── Processes ──────────────────────────────────────────────────────────────
+
+async def run_cluster(cluster_id: int, shard_ids: list[int], shard_count: int, start_delay: float):
+    await asyncio.sleep(start_delay)
+    env = {
+        **os.environ,
+        "CLUSTER_ID": str(cluster_id),
+        "SHARD_IDS": ",".join(map(str, shard_ids)),
+        "SHARD_COUNT": str(shard_count),
+    }
+    while True:
+        log.info(f"Starting cluster {cluster_id} (shards {shard_ids[0]}-{shard_ids[-1]} of {shard_count})")
+        process = await asyncio.create_subprocess_exec(sys.executable, "bot.py", env=env)
+        code = await process.wait()
+        log.warning(f"Cluster {cluster_id} exited with code {code}; restarting in {RESTART_DELAY}s")
+        await asyncio.sleep(RESTART_DELAY)
+
+
+async def main():
+    keep_alive()
+    shard_count = config.SHARD_COUNT or await recommended_shards()
+    ranges = shard_ranges(shard_count, config.CLUSTER_COUNT)
+    server = await asyncio.start_server(_relay, "127.0.0.1", config.CLUSTER_IPC_PORT)
+    log.info(f"{shard_count} shard(s) over {len(ranges)} cluster(s)")
+
+    # Stagger the first start so clusters don't compete for shard logins
+    delay, jobs = 0, []
+    for cluster_id, shard_ids in enumerate(ranges):
+        jobs.append(run_cluster(cluster_id, shard_ids, shard_count, delay))
+        delay += len(shard_ids) * IDENTIFY_SECONDS
+    async with server:
+        await asyncio.gather(*jobs)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
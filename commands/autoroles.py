@@ -7,6 +7,9 @@ from discord import app_commands
 from discord.ext import commands, tasks
 
 import config
+from models.id_schema import snowflake
+from services import inventory_service as inventory
+from services.cluster_service import owns_guild
 
 
 class RolePanelView(discord.ui.View):
@@ -56,43 +59,20 @@ class AutoRoles(commands.Cog):
     # ── Background: expire temporary roles ────────────────────────────────
     @tasks.loop(minutes=1)
     async def expire_roles_task(self):
-        now = datetime.utcnow()
-        cursor = self.db.users.find({
-            "inventory": {
-                "$elemMatch": {
-                    "expires": {"$lte": now},
-                    "type": "role",
-                }
-            }
-        })
-        async for user_doc in cursor:
-            guild = self.bot.get_guild(int(user_doc["guild_id"]))
+        owned = lambda guild_id: owns_guild(self.bot, guild_id)
+        for item in await inventory.take_expired(self.db, datetime.utcnow(), owned):
+            if item.get("type") != "role" or not item.get("role_id"):
+                continue
+            guild = self.bot.get_guild(int(item["guild_id"]))
             if not guild:
                 continue
-            member = guild.get_member(int(user_doc["user_id"]))
-            expired_items = []
-            kept_items = []
-            for item in user_doc.get("inventory", []):
-                exp = item.get("expires")
-                if exp and exp <= now and item.get("type") == "role":
-                    expired_items.append(item)
-                else:
-                    kept_items.append(item)
-
-            for item in expired_items:
-                if member and item.get("role_id"):
-                    role = guild.get_role(int(item["role_id"]))
-                    if role and role in member.roles:
-                        try:
-                            await member.remove_roles(role, reason="Temporary role expired")
-                        except discord.Forbidden:
-                            pass
-
-            if expired_items:
-                await self.db.users.update_one(
-                    {"_id": user_doc["_id"]},
-                    {"$set": {"inventory": kept_items}},
-                )
+            member = guild.get_member(int(item["user_id"]))
+            role = guild.get_role(int(item["role_id"]))
+            if member and role and role in member.roles:
+                try:
+                    await member.remove_roles(role, reason="Temporary role expired")
+                except discord.Forbidden:
+                    pass
 
     @expire_roles_task.before_loop
     async def before_expire(self):
@@ -104,7 +84,7 @@ class AutoRoles(commands.Cog):
     @app_commands.checks.has_permissions(administrator=True)
     async def rolepanel(self, interaction: discord.Interaction, title: str = "🎭 Role Selection",
                         description: str = "Click a button to assign or remove a role."):
-        guild_doc = await self.db.guilds.find_one({"guild_id": str(interaction.guild.id)})
+        guild_doc = await self.db.guilds.find_one({"guild_id": snowflake(interaction.guild.id)})
         role_panel = guild_doc.get("role_panel", []) if guild_doc else []
 
         if not role_panel:
@@ -148,17 +128,9 @@ class AutoRoles(commands.Cog):
                 await interaction.response.send_message("Invalid duration.", ephemeral=True)
                 return
 
-            inv_entry = {
-                "item_id": f"role_{role.id}",
-                "name": role.name,
-                "type": "role",
-                "role_id": str(role.id),
-                "expires": expires,
-            }
-            await self.db.users.update_one(
-                {"user_id": str(member.id), "guild_id": str(interaction.guild.id)},
-                {"$push": {"inventory": inv_entry}},
-                upsert=True,
+            await inventory.add_item(
+                self.db, interaction.guild.id, member.id, f"role_{role.id}", role.name, "role",
+                role_id=str(role.id), duration=expires - datetime.utcnow(),
             )
 
         exp_str = f" (expires <t:{int(expires.timestamp())}:R>)" if expires else " (permanent)"
@@ -1,13 +1,21 @@
 # commands/economy.py — /balance, /daily, /work, /deposit, /withdraw, /pay,
-#                       /shop, /buy, /inventory, and admin economy commands.
+#                       /shop, /buy, /inventory, and admin economy/shop commands.
+
+from datetime import datetime, timedelta
 
 import discord
 from discord import app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
 
 import config
-from models.user_model import get_or_create_user
+from models.user_model import migration_pending
 from services import economy_service as eco
+from services.cluster_service import CLUSTER_ID
+from services import inventory_service as inv
+from services import ledger_service as ledger
+
+
+MIGRATION_BUSY = "Member data is being upgraded in the background — try again in a few minutes."
 
 
 def is_admin():
@@ -19,11 +27,45 @@ def is_admin():
 class Economy(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.flush_buffers.start()
+        self.compact_ledger.start()
+        self.pay_interest.start()
 
     @property
     def db(self):
         return self.bot.db
 
+    async def cog_unload(self):
+        self.flush_buffers.cancel()
+        self.compact_ledger.cancel()
+        self.pay_interest.cancel()
+        await self.flush_buffers()
+
+    # ── Background: batched writes and ledger snapshots ───────────────────
+    @tasks.loop(seconds=config.ECONOMY_FLUSH_SECONDS)
+    async def flush_buffers(self):
+        await eco.flush_chat_coins(self.db)
+        await ledger.flush(self.db)
+
+    @tasks.loop(hours=config.LEDGER_SNAPSHOT_HOURS)
+    async def compact_ledger(self):
+        # Compaction covers every guild at once, so only the first cluster runs it
+        if CLUSTER_ID == 0:
+            await ledger.compact(self.db)
+
+    @compact_ledger.before_loop
+    async def before_compact(self):
+        await self.bot.wait_until_ready()
+
+    @tasks.loop(hours=config.BANK_INTEREST_HOURS)
+    async def pay_interest(self):
+        for guild in self.bot.guilds:
+            await eco.pay_scheduled_interest(self.db, guild.id)
+
+    @pay_interest.before_loop
+    async def before_interest(self):
+        await self.bot.wait_until_ready()
+
     # ── /balance ──────────────────────────────────────────────────────────
     @app_commands.command(name="balance", description="Check your coin balance.")
     @app_commands.describe(member="Member to check (leave empty for yourself)")
@@ -92,14 +134,15 @@ class Economy(commands.Cog):
 
     # ── /baltop ───────────────────────────────────────────────────────────
     @app_commands.command(name="baltop", description="Show the richest members.")
-    async def baltop(self, interaction: discord.Interaction):
+    @app_commands.describe(ranking="Rank by wallet, bank, or total (default)")
+    @app_commands.choices(ranking=[
+        app_commands.Choice(name="Total", value="net_worth"),
+        app_commands.Choice(name="Wallet", value="balance"),
+        app_commands.Choice(name="Bank", value="bank"),
+    ])
+    async def baltop(self, interaction: discord.Interaction, ranking: str = "net_worth"):
         await interaction.response.defer()
-        cursor = self.db.users.find(
-            {"guild_id": str(interaction.guild.id)},
-            sort=[("balance", -1)],
-            limit=10,
-        )
-        top = await cursor.to_list(length=10)
+        top = await eco.richest(self.db, interaction.guild.id, ranking)
         if not top:
             await interaction.followup.send("No economy data yet!")
             return
@@ -110,7 +153,7 @@ class Economy(commands.Cog):
             member = interaction.guild.get_member(int(doc["user_id"]))
             name = member.display_name if member else f"User {doc['user_id']}"
             medal = medals[i] if i < 3 else f"`#{i+1}`"
-            lines.append(f"{medal} **{name}** — {config.CURRENCY_SYMBOL} {doc['balance']:,}")
+            lines.append(f"{medal} **{name}** — {config.CURRENCY_SYMBOL} {doc.get(ranking, 0):,}")
         embed.description = "\n".join(lines)
         await interaction.followup.send(embed=embed)
 
@@ -120,16 +163,22 @@ class Economy(commands.Cog):
         items = await eco.get_shop(self.db, interaction.guild.id)
         if not items:
             await interaction.response.send_message(
-                "The shop is empty! An admin can add items to the guild document in MongoDB.",
+                "The shop is empty! An admin can add items with `/shopadd`.",
                 ephemeral=True,
             )
             return
+        stock = await eco.get_stock(self.db, interaction.guild.id) if any("stock" in i for i in items) else {}
         embed = discord.Embed(title="🛒 Server Shop", color=discord.Color.blurple())
         for item in items:
             duration = f" ({item['duration_hours']}h)" if item.get("duration_hours") else " (permanent)"
+            limits = ""
+            if item["id"] in stock:
+                limits += f"\n{stock[item['id']]:,} left" if stock[item["id"]] > 0 else "\n**Sold out**"
+            if item.get("per_user_limit"):
+                limits += f"\nLimit {item['per_user_limit']} per member"
             embed.add_field(
                 name=f"{item['name']} — {config.CURRENCY_SYMBOL} {item['price']:,}",
-                value=f"{item.get('description', 'No description')}{duration}\nID: `{item['id']}`",
+                value=f"{item.get('description', 'No description')}{duration}{limits}\nID: `{item['id']}`",
                 inline=False,
             )
         await interaction.response.send_message(embed=embed)
@@ -159,19 +208,40 @@ class Economy(commands.Cog):
         )
         await interaction.response.send_message(embed=embed)
 
+    @buy.autocomplete("item_id")
+    async def item_id_autocomplete(self, interaction: discord.Interaction, current: str):
+        # Served from the shop cache only — autocomplete must answer within 3 seconds
+        eco.refresh_shop_soon(self.db, interaction.guild.id)
+        items = eco.cached_shop(interaction.guild.id) or []
+        current = current.lower()
+        return [
+            app_commands.Choice(
+                name=f"{item['name']} — {item['price']:,} {config.CURRENCY_NAME}"[:100],
+                value=item["id"],
+            )
+            for item in items
+            if current in item["id"].lower() or current in item["name"].lower()
+        ][:25]
+
     # ── /inventory ────────────────────────────────────────────────────────
     @app_commands.command(name="inventory", description="View your inventory.")
-    async def inventory(self, interaction: discord.Interaction):
-        user = await get_or_create_user(self.db, interaction.user.id, interaction.guild.id)
-        inv = user.get("inventory", [])
-        if not inv:
+    @app_commands.describe(page="Page number")
+    async def inventory(self, interaction: discord.Interaction, page: app_commands.Range[int, 1] = 1):
+        items, total = await inv.get_page(self.db, interaction.guild.id, interaction.user.id, page)
+        if not total:
             await interaction.response.send_message("Your inventory is empty.", ephemeral=True)
             return
+        pages = -(-total // inv.INVENTORY_PAGE_SIZE)
+        if not items:
+            await interaction.response.send_message(f"Your inventory only has {pages} page(s).", ephemeral=True)
+            return
         embed = discord.Embed(title="🎒 Your Inventory", color=discord.Color.blurple())
-        for item in inv:
+        for item in items:
             exp = item.get("expires")
             exp_str = f" (expires <t:{int(exp.timestamp())}:R>)" if exp else " (permanent)"
-            embed.add_field(name=item["name"], value=f"Type: {item['type']}{exp_str}", inline=False)
+            qty = f" ×{item['quantity']}" if item.get("quantity", 1) > 1 else ""
+            embed.add_field(name=f"{item['name']}{qty}", value=f"Type: {item['type']}{exp_str}", inline=False)
+        embed.set_footer(text=f"Page {page}/{pages}")
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
     # ── Admin: /addcoins ──────────────────────────────────────────────────
@@ -221,10 +291,7 @@ class Economy(commands.Cog):
     @app_commands.describe(member="Target member")
     @is_admin()
     async def reseteconomy(self, interaction: discord.Interaction, member: discord.Member):
-        await self.db.users.update_one(
-            {"user_id": str(member.id), "guild_id": str(interaction.guild.id)},
-            {"$set": {"balance": 0, "bank": 0, "inventory": [], "last_daily": None, "last_work": None}},
-        )
+        await eco.reset_economy(self.db, member.id, interaction.guild.id)
         await interaction.response.send_message(
             f"Reset {member.mention}'s economy data.", ephemeral=True
         )
@@ -233,6 +300,169 @@ class Economy(commands.Cog):
     async def reseteconomy_error(self, interaction, error):
         await interaction.response.send_message("You need to be an administrator.", ephemeral=True)
 
+    # ── Admin: /ecoaudit ──────────────────────────────────────────────────
+    @app_commands.command(name="ecoaudit", description="[Admin] Show a member's balance history.")
+    @app_commands.describe(member="Target member", date="Rebuild the balance as of this date (YYYY-MM-DD)")
+    @is_admin()
+    async def ecoaudit(self, interaction: discord.Interaction, member: discord.Member, date: str = None):
+        try:
+            at = datetime.strptime(date, "%Y-%m-%d") + timedelta(days=1) if date else datetime.utcnow()
+        except ValueError:
+            await interaction.response.send_message("Dates must look like `2024-01-31`.", ephemeral=True)
+            return
+        await interaction.response.defer(ephemeral=True)
+        await self.flush_buffers()
+        bal = await ledger.balance_at(self.db, interaction.guild.id, member.id, at)
+        entries = await ledger.recent_entries(self.db, interaction.guild.id, member.id)
+
+        label = f"end of {date}" if date else "now"
+        embed = discord.Embed(title=f"📒 Ledger — {member.display_name}", color=discord.Color.blurple())
+        embed.add_field(name=f"Wallet ({label})", value=f"{config.CURRENCY_SYMBOL} {bal['balance']:,}", inline=True)
+        embed.add_field(name=f"Bank ({label})",   value=f"{config.CURRENCY_SYMBOL} {bal['bank']:,}", inline=True)
+        lines = []
+        for e in entries:
+            parts = []
+            if e["balance"]:
+                parts.append(f"wallet {e['balance']:+,}")
+            if e["bank"]:
+                parts.append(f"bank {e['bank']:+,}")
+            lines.append(f"<t:{int(e['ts'].timestamp())}:f> **{e['reason']}** {', '.join(parts)}")
+        embed.add_field(name="Recent Changes", value="\n".join(lines) or "None", inline=False)
+        await interaction.followup.send(embed=embed, ephemeral=True)
+
+    @ecoaudit.error
+    async def ecoaudit_error(self, interaction, error):
+        await interaction.response.send_message("You need to be an administrator.", ephemeral=True)
+
+    # ── Admin: /ecoadjust ─────────────────────────────────────────────────
+    @app_commands.command(name="ecoadjust", description="[Admin] Change every member's wallet or bank by a percentage.")
+    @app_commands.describe(
+        account="Which balance to adjust",
+        percent="e.g. 2 for +2% interest, -5 to take 5%",
+        cap="Most coins any one member can gain or lose (leave empty for no cap)",
+    )
+    @app_commands.choices(account=[
+        app_commands.Choice(name="Bank", value="bank"),
+        app_commands.Choice(name="Wallet", value="balance"),
+    ])
+    @is_admin()
+    async def ecoadjust(self, interaction: discord.Interaction, account: str, percent: float, cap: int = None):
+        if not -100 <= percent <= 100 or percent == 0:
+            await interaction.response.send_message("Percent must be between -100 and 100 and not 0.", ephemeral=True)
+            return
+        if cap is not None and cap < 0:
+            await interaction.response.send_message("Cap can't be negative.", ephemeral=True)
+            return
+        if migration_pending():
+            await interaction.response.send_message(MIGRATION_BUSY, ephemeral=True)
+            return
+        await interaction.response.defer(ephemeral=True)
+        summary = await eco.apply_rate(
+            self.db, interaction.guild.id, account, percent / 100, cap, by=interaction.user.id,
+        )
+        total = summary["balance"] + summary["bank"]
+        await interaction.followup.send(
+            f"Adjusted {summary['members']:,} member(s) by {percent:+g}% — "
+            f"{config.CURRENCY_SYMBOL} **{total:+,}** in total.", ephemeral=True
+        )
+
+    @ecoadjust.error
+    async def ecoadjust_error(self, interaction, error):
+        await interaction.response.send_message("You need to be an administrator.", ephemeral=True)
+
+    # ── Admin: /grantall ──────────────────────────────────────────────────
+    @app_commands.command(name="grantall", description="[Admin] Give coins to every member, or everyone in a role.")
+    @app_commands.describe(amount="Coins per member", role="Only members with this role (leave empty for everyone)")
+    @is_admin()
+    async def grantall(self, interaction: discord.Interaction, amount: int, role: discord.Role = None):
+        if amount <= 0:
+            await interaction.response.send_message("Amount must be positive.", ephemeral=True)
+            return
+        if migration_pending():
+            await interaction.response.send_message(MIGRATION_BUSY, ephemeral=True)
+            return
+        await interaction.response.defer(ephemeral=True)
+        user_ids = [m.id for m in role.members if not m.bot] if role else None
+        summary = await eco.grant_all(
+            self.db, interaction.guild.id, amount, user_ids, by=interaction.user.id,
+        )
+        who = role.mention if role else "every member"
+        await interaction.followup.send(
+            f"Gave {config.CURRENCY_SYMBOL} **{amount:,}** to {who} "
+            f"({summary['members']:,} member(s), {summary['balance']:,} total).", ephemeral=True
+        )
+
+    @grantall.error
+    async def grantall_error(self, interaction, error):
+        await interaction.response.send_message("You need to be an administrator.", ephemeral=True)
+
+    # ── Admin: /shopadd ───────────────────────────────────────────────────
+    @app_commands.command(name="shopadd", description="[Admin] Add or replace a shop item.")
+    @app_commands.describe(
+        item_id="Short unique ID, e.g. vip_30d",
+        name="Display name",
+        price="Price in coins",
+        description="Item description",
+        role="Role granted on purchase (makes this a role item)",
+        duration_hours="Hours until a purchased role expires (leave empty for permanent)",
+        stock="Copies available (leave empty for unlimited)",
+        per_user_limit="How many times one member can buy it (leave empty for no limit)",
+    )
+    @is_admin()
+    async def shopadd(self, interaction: discord.Interaction, item_id: str, name: str, price: int,
+                      description: str = "No description", role: discord.Role = None,
+                      duration_hours: int = None, stock: int = None, per_user_limit: int = None):
+        if price < 0 or (stock is not None and stock < 0):
+            await interaction.response.send_message("Price and stock can't be negative.", ephemeral=True)
+            return
+        if per_user_limit is not None and per_user_limit < 1:
+            await interaction.response.send_message("The per-member limit must be at least 1.", ephemeral=True)
+            return
+        item = {
+            "id": item_id,
+            "name": name,
+            "description": description,
+            "price": price,
+            "type": "role" if role else "item",
+        }
+        if role:
+            item["role_id"] = str(role.id)
+        if duration_hours:
+            item["duration_hours"] = duration_hours
+        if stock is not None:
+            item["stock"] = stock
+        if per_user_limit:
+            item["per_user_limit"] = per_user_limit
+        await eco.add_shop_item(self.db, interaction.guild.id, item)
+        await interaction.response.send_message(
+            f"Added **{name}** (`{item_id}`) to the shop for {config.CURRENCY_SYMBOL} **{price:,}**.", ephemeral=True
+        )
+
+    @shopadd.error
+    async def shopadd_error(self, interaction, error):
+        await interaction.response.send_message("You need to be an administrator.", ephemeral=True)
+
+    # ── Admin: /shopremove ────────────────────────────────────────────────
+    @app_commands.command(name="shopremove", description="[Admin] Remove an item from the shop.")
+    @app_commands.describe(item_id="The item ID shown in /shop")
+    @is_admin()
+    async def shopremove(self, interaction: discord.Interaction, item_id: str):
+        removed = await eco.remove_shop_item(self.db, interaction.guild.id, item_id)
+        msg = f"Removed `{item_id}` from the shop." if removed else "Item not found in the shop."
+        await interaction.response.send_message(msg, ephemeral=True)
+
+    @shopremove.autocomplete("item_id")
+    async def shopremove_autocomplete(self, interaction: discord.Interaction, current: str):
+        return await self.item_id_autocomplete(interaction, current)
+
+    @shopremove.error
+    async def shopremove_error(self, interaction, error):
+        await interaction.response.send_message("You need to be an administrator.", ephemeral=True)
+
 
 async def setup(bot):
+    await eco.load_shops(bot.db)
+    await eco.load_chat_counters(bot.db)
+    await eco.backfill_net_worth(bot.db)
+    await inv.migrate_embedded_inventories(bot.db)
     await bot.add_cog(Economy(bot))
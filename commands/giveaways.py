@@ -4,13 +4,12 @@ import asyncio
 from datetime import datetime
 
 import discord
-from bson import ObjectId
 from discord import app_commands
 from discord.ext import commands, tasks
 
 import config
 from services.giveaway_service import (
-    create_giveaway, end_giveaway, parse_duration, pick_winners
+    create_giveaway, end_giveaway, parse_duration, pick_winners, toggle_entry
 )
 
 
@@ -47,11 +46,8 @@ class GiveawayView(discord.ui.View):
         custom_id="giveaway_enter",
     )
     async def enter(self, interaction: discord.Interaction, button: discord.ui.Button):
-        db = interaction.client.db
-        giveaway = await db.giveaways.find_one({
-            "message_id": str(interaction.message.id),
-            "guild_id": str(interaction.guild.id),
-        })
+        store = interaction.client.store
+        giveaway = await store.find_giveaway(interaction.guild.id, interaction.message.id)
         if not giveaway:
             await interaction.response.send_message("Giveaway not found.", ephemeral=True)
             return
@@ -69,31 +65,24 @@ class GiveawayView(discord.ui.View):
                 return
 
         if giveaway.get("min_level", 0) > 0:
-            user_doc = await db.users.find_one({
-                "user_id": str(interaction.user.id),
-                "guild_id": str(interaction.guild.id),
-            })
-            user_level = user_doc["level"] if user_doc else 0
+            user_doc = await store.get_user(interaction.user.id, interaction.guild.id, "level")
+            user_level = user_doc["level"]
             if user_level < giveaway["min_level"]:
                 await interaction.response.send_message(
                     f"You need to be at least Level **{giveaway['min_level']}** to enter.", ephemeral=True
                 )
                 return
 
-        uid = str(interaction.user.id)
-        if uid in giveaway["entries"]:
-            await db.giveaways.update_one(
-                {"_id": giveaway["_id"]}, {"$pull": {"entries": uid}}
-            )
-            await interaction.response.send_message("❌ You left the giveaway.", ephemeral=True)
-        else:
-            await db.giveaways.update_one(
-                {"_id": giveaway["_id"]}, {"$addToSet": {"entries": uid}}
-            )
+        entered, _, updated = await toggle_entry(store, giveaway["_id"], str(interaction.user.id))
+        if not updated:
+            await interaction.response.send_message("This giveaway has ended.", ephemeral=True)
+            return
+        if entered:
             await interaction.response.send_message("✅ You entered the giveaway!", ephemeral=True)
+        else:
+            await interaction.response.send_message("❌ You left the giveaway.", ephemeral=True)
 
         # Refresh entry count on embed
-        updated = await db.giveaways.find_one({"_id": giveaway["_id"]})
         embed = giveaway_embed(
             updated["prize"], updated["ends_at"],
             updated["winners_count"], updated["entries"]
@@ -107,8 +96,8 @@ class Giveaways(commands.Cog):
         self.check_giveaways.start()
 
     @property
-    def db(self):
-        return self.bot.db
+    def store(self):
+        return self.bot.store
 
     def cog_unload(self):
         self.check_giveaways.cancel()
@@ -117,11 +106,7 @@ class Giveaways(commands.Cog):
     async def check_giveaways(self):
         """Automatically end giveaways when their time is up."""
         now = datetime.utcnow()
-        cursor = self.db.giveaways.find({
-            "ended": False,
-            "ends_at": {"$lte": now},
-        })
-        async for giveaway in cursor:
+        for giveaway in await self.store.due_giveaways(now):
             guild = self.bot.get_guild(int(giveaway["guild_id"]))
             if not guild:
                 continue
@@ -133,7 +118,7 @@ class Giveaways(commands.Cog):
             except discord.NotFound:
                 continue
 
-            winners = await end_giveaway(self.db, giveaway, guild)
+            winners = await end_giveaway(self.store, giveaway, guild)
             embed = giveaway_embed(
                 giveaway["prize"], giveaway["ends_at"],
                 giveaway["winners_count"], giveaway["entries"],
@@ -185,7 +170,7 @@ class Giveaways(commands.Cog):
         message = await interaction.original_response()
 
         await create_giveaway(
-            self.db,
+            self.store,
             guild_id=interaction.guild.id,
             channel_id=interaction.channel.id,
             message_id=message.id,
@@ -205,11 +190,10 @@ class Giveaways(commands.Cog):
     @app_commands.describe(message_id="The message ID of the giveaway")
     @app_commands.checks.has_permissions(manage_guild=True)
     async def gend(self, interaction: discord.Interaction, message_id: str):
-        giveaway = await self.db.giveaways.find_one({
-            "message_id": message_id,
-            "guild_id": str(interaction.guild.id),
-            "ended": False,
-        })
+        if not message_id.strip().isdigit():
+            await interaction.response.send_message("That isn't a message ID.", ephemeral=True)
+            return
+        giveaway = await self.store.find_giveaway(interaction.guild.id, int(message_id), ended=False)
         if not giveaway:
             await interaction.response.send_message("Giveaway not found or already ended.", ephemeral=True)
             return
@@ -222,7 +206,7 @@ class Giveaways(commands.Cog):
             await interaction.followup.send("Original giveaway message not found.", ephemeral=True)
             return
 
-        winners = await end_giveaway(self.db, giveaway, interaction.guild)
+        winners = await end_giveaway(self.store, giveaway, interaction.guild)
         embed = giveaway_embed(
             giveaway["prize"], giveaway["ends_at"],
             giveaway["winners_count"], giveaway["entries"],
@@ -242,11 +226,10 @@ class Giveaways(commands.Cog):
     @app_commands.describe(message_id="The message ID of the ended giveaway")
     @app_commands.checks.has_permissions(manage_guild=True)
     async def greroll(self, interaction: discord.Interaction, message_id: str):
-        giveaway = await self.db.giveaways.find_one({
-            "message_id": message_id,
-            "guild_id": str(interaction.guild.id),
-            "ended": True,
-        })
+        if not message_id.strip().isdigit():
+            await interaction.response.send_message("That isn't a message ID.", ephemeral=True)
+            return
+        giveaway = await self.store.find_giveaway(interaction.guild.id, int(message_id), ended=True)
         if not giveaway:
             await interaction.response.send_message("Ended giveaway not found.", ephemeral=True)
             return
@@ -270,11 +253,7 @@ class Giveaways(commands.Cog):
     # ── /glist ────────────────────────────────────────────────────────────
     @app_commands.command(name="glist", description="List all active giveaways.")
     async def glist(self, interaction: discord.Interaction):
-        cursor = self.db.giveaways.find({
-            "guild_id": str(interaction.guild.id),
-            "ended": False,
-        })
-        active = await cursor.to_list(length=20)
+        active = await self.store.active_giveaways(interaction.guild.id, limit=20)
         if not active:
             await interaction.response.send_message("No active giveaways right now.", ephemeral=True)
             return
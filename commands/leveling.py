@@ -4,7 +4,6 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 
-from models.user_model import get_or_create_user
 from services.xp_service import xp_progress, xp_for_level, make_progress_bar, calculate_level
 
 
@@ -13,24 +12,21 @@ class Leveling(commands.Cog):
         self.bot = bot
 
     @property
-    def db(self):
-        return self.bot.db
+    def store(self):
+        return self.bot.store
 
     # ── /rank ──────────────────────────────────────────────────────────────
     @app_commands.command(name="rank", description="Show your level and XP progress.")
     @app_commands.describe(member="The member to check (leave empty for yourself)")
     async def rank(self, interaction: discord.Interaction, member: discord.Member = None):
         target = member or interaction.user
-        user = await get_or_create_user(self.db, target.id, interaction.guild.id)
+        user = await self.store.get_user(target.id, interaction.guild.id, "xp", "messages")
 
         level, xp_into, xp_needed = xp_progress(user["xp"])
         bar = make_progress_bar(xp_into, xp_needed, length=12)
         pct = int((xp_into / xp_needed) * 100)
 
-        rank_pos = await self.db.users.count_documents({
-            "guild_id": str(interaction.guild.id),
-            "xp": {"$gt": user["xp"]},
-        }) + 1
+        rank_pos = await self.store.xp_rank(interaction.guild.id, user["xp"])
 
         embed = discord.Embed(
             title=f"📊 {target.display_name}'s Rank",
@@ -53,7 +49,7 @@ class Leveling(commands.Cog):
     @app_commands.describe(member="The member to check")
     async def xp(self, interaction: discord.Interaction, member: discord.Member = None):
         target = member or interaction.user
-        user = await get_or_create_user(self.db, target.id, interaction.guild.id)
+        user = await self.store.get_user(target.id, interaction.guild.id, "xp", "level")
         await interaction.response.send_message(
             f"**{target.display_name}** has **{user['xp']:,} XP** total (Level {user['level']})."
         )
@@ -62,12 +58,7 @@ class Leveling(commands.Cog):
     @app_commands.command(name="leaderboard", description="Show the top 10 members by XP.")
     async def leaderboard(self, interaction: discord.Interaction):
         await interaction.response.defer()
-        cursor = self.db.users.find(
-            {"guild_id": str(interaction.guild.id)},
-            sort=[("xp", -1)],
-            limit=10,
-        )
-        top = await cursor.to_list(length=10)
+        top = await self.store.xp_leaderboard(interaction.guild.id, limit=10)
 
         if not top:
             await interaction.followup.send("No data yet! Start chatting to earn XP.")
@@ -94,16 +85,12 @@ class Leveling(commands.Cog):
             await interaction.response.send_message("Amount must be positive.", ephemeral=True)
             return
 
-        user = await get_or_create_user(self.db, member.id, interaction.guild.id)
+        user = await self.store.get_user(member.id, interaction.guild.id, "xp", "level")
         new_xp = user["xp"] + amount
         new_level = calculate_level(new_xp)
         old_level = user["level"]
 
-        await self.db.users.update_one(
-            {"user_id": str(member.id), "guild_id": str(interaction.guild.id)},
-            {"$set": {"xp": new_xp, "level": new_level}},
-            upsert=True,
-        )
+        await self.store.set_xp(member.id, interaction.guild.id, new_xp, new_level)
 
         leveled = "  🎉 They leveled up!" if new_level > old_level else ""
         embed = discord.Embed(
@@ -125,14 +112,11 @@ class Leveling(commands.Cog):
             await interaction.response.send_message("Amount must be positive.", ephemeral=True)
             return
 
-        user = await get_or_create_user(self.db, member.id, interaction.guild.id)
+        user = await self.store.get_user(member.id, interaction.guild.id, "xp")
         new_xp = max(0, user["xp"] - amount)
         new_level = calculate_level(new_xp)
 
-        await self.db.users.update_one(
-            {"user_id": str(member.id), "guild_id": str(interaction.guild.id)},
-            {"$set": {"xp": new_xp, "level": new_level}},
-        )
+        await self.store.set_xp(member.id, interaction.guild.id, new_xp, new_level)
 
         embed = discord.Embed(
             description=f"✅ Removed **{amount:,} XP** from {member.mention}.\nThey now have **{new_xp:,} XP** (Level **{new_level}**).",
@@ -155,11 +139,7 @@ class Leveling(commands.Cog):
 
         new_level = calculate_level(amount)
 
-        await self.db.users.update_one(
-            {"user_id": str(member.id), "guild_id": str(interaction.guild.id)},
-            {"$set": {"xp": amount, "level": new_level}},
-            upsert=True,
-        )
+        await self.store.set_xp(member.id, interaction.guild.id, amount, new_level)
 
         embed = discord.Embed(
             description=f"✅ Set {member.mention}'s XP to **{amount:,}** (Level **{new_level}**).",
@@ -176,11 +156,7 @@ class Leveling(commands.Cog):
     @app_commands.describe(member="Target member")
     @app_commands.checks.has_permissions(administrator=True)
     async def resetxp(self, interaction: discord.Interaction, member: discord.Member):
-        await self.db.users.update_one(
-            {"user_id": str(member.id), "guild_id": str(interaction.guild.id)},
-            {"$set": {"xp": 0, "level": 0, "messages": 0}},
-            upsert=True,
-        )
+        await self.store.reset_xp(member.id, interaction.guild.id)
         await interaction.response.send_message(
             f"✅ Reset {member.mention}'s XP and level to **0**.", ephemeral=True
         )
@@ -30,8 +30,8 @@ class Moderation(commands.Cog):
         self.bot = bot
 
     @property
-    def db(self):
-        return self.bot.db
+    def store(self):
+        return self.bot.store
 
     # ── /warn ─────────────────────────────────────────────────────────────
     @app_commands.command(name="warn", description="Warn a member.")
@@ -45,7 +45,7 @@ class Moderation(commands.Cog):
             await interaction.response.send_message("You can't warn someone with an equal or higher role.", ephemeral=True)
             return
 
-        await add_warning(self.db, member.id, interaction.guild.id, reason, interaction.user.id)
+        await add_warning(self.store, member.id, interaction.guild.id, reason, interaction.user.id)
 
         # DM the warned user
         try:
@@ -60,7 +60,7 @@ class Moderation(commands.Cog):
             pass
 
         # Count warnings
-        warnings = await get_warnings(self.db, member.id, interaction.guild.id)
+        warnings = await get_warnings(self.store, member.id, interaction.guild.id)
         embed = discord.Embed(
             description=f"⚠️ **{member}** has been warned. They now have **{len(warnings)}** warning(s).\n**Reason:** {reason}",
             color=discord.Color.yellow(),
@@ -77,7 +77,7 @@ class Moderation(commands.Cog):
     @app_commands.describe(member="Member to check")
     @app_commands.checks.has_permissions(kick_members=True)
     async def warnings(self, interaction: discord.Interaction, member: discord.Member):
-        warns = await get_warnings(self.db, member.id, interaction.guild.id)
+        warns = await get_warnings(self.store, member.id, interaction.guild.id, stale_ok=True)
         if not warns:
             await interaction.response.send_message(f"**{member}** has no warnings.", ephemeral=True)
             return
@@ -88,7 +88,7 @@ class Moderation(commands.Cog):
         )
         for i, w in enumerate(warns[:10], 1):
             mod = interaction.guild.get_member(int(w["moderator_id"]))
-            mod_name = str(mod) if mod else w["moderator_id"]
+            mod_name = str(mod) if mod else str(w["moderator_id"])
             ts = w["timestamp"].strftime("%Y-%m-%d %H:%M")
             embed.add_field(
                 name=f"#{i} — {ts}",
@@ -107,7 +107,7 @@ class Moderation(commands.Cog):
     @app_commands.describe(member="Member to clear warnings for")
     @app_commands.checks.has_permissions(administrator=True)
     async def clearwarnings(self, interaction: discord.Interaction, member: discord.Member):
-        count = await clear_warnings(self.db, member.id, interaction.guild.id)
+        count = await clear_warnings(self.store, member.id, interaction.guild.id)
         await interaction.response.send_message(
             f"Cleared **{count}** warning(s) for {member.mention}.", ephemeral=True
         )
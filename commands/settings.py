@@ -0,0 +1,106 @@
+# commands/settings.py — /config show, /config set, /config reset (per-guild settings).
+
+import discord
+from discord import app_commands
+from discord.ext import commands, tasks
+
+import config
+from services import guild_config_service as settings_service
+
+
+class Settings(commands.Cog):
+    config_group = app_commands.Group(
+        name="config",
+        description="[Admin] View or change this server's bot settings.",
+        default_permissions=discord.Permissions(administrator=True),
+    )
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.refresh_settings.start()
+
+    @property
+    def store(self):
+        return self.bot.store
+
+    def cog_unload(self):
+        self.refresh_settings.cancel()
+
+    # ── Background: pick up changes made by other instances ───────────────
+    @tasks.loop(seconds=config.GUILD_SETTINGS_REFRESH_SECONDS)
+    async def refresh_settings(self):
+        await settings_service.refresh(self.store)
+
+    @refresh_settings.before_loop
+    async def before_refresh(self):
+        await self.bot.wait_until_ready()
+
+    async def setting_autocomplete(self, interaction: discord.Interaction, current: str):
+        current = current.upper()
+        return [
+            app_commands.Choice(name=name, value=name)
+            for name in settings_service.SETTINGS if current in name
+        ][:25]
+
+    # ── /config show ──────────────────────────────────────────────────────
+    @config_group.command(name="show", description="Show this server's settings.")
+    async def show_settings(self, interaction: discord.Interaction):
+        current = settings_service.get_settings(interaction.guild.id)
+        lines = []
+        for name in settings_service.SETTINGS:
+            marker = "✏️" if name in current.overrides else "▫️"
+            lines.append(f"{marker} **{name}**: {settings_service.format_setting(name, getattr(current, name))}")
+        embed = discord.Embed(
+            title="⚙️ Server Settings",
+            description="\n".join(lines),
+            color=discord.Color.blurple(),
+        )
+        embed.set_footer(text="✏️ = set for this server, ▫️ = bot default")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    # ── /config set ───────────────────────────────────────────────────────
+    @config_group.command(name="set", description="Change a setting for this server.")
+    @app_commands.describe(
+        setting="Setting name",
+        value="New value (IDs/mentions, numbers, on/off; lists are comma-separated)",
+    )
+    @app_commands.autocomplete(setting=setting_autocomplete)
+    async def set_setting(self, interaction: discord.Interaction, setting: str, value: str):
+        setting = setting.upper()
+        if setting not in settings_service.SETTINGS:
+            await interaction.response.send_message("Unknown setting.", ephemeral=True)
+            return
+        try:
+            parsed = settings_service.parse_setting(setting, value)
+            settings_service.check_setting(interaction.guild.id, setting, parsed)
+        except ValueError as e:
+            await interaction.response.send_message(str(e), ephemeral=True)
+            return
+        await settings_service.update_setting(self.store, interaction.guild.id, setting, parsed)
+        await interaction.response.send_message(
+            f"✅ **{setting}** set to {settings_service.format_setting(setting, parsed)}.", ephemeral=True
+        )
+
+    # ── /config reset ─────────────────────────────────────────────────────
+    @config_group.command(name="reset", description="Reset a setting to the bot default.")
+    @app_commands.describe(setting="Setting name")
+    @app_commands.autocomplete(setting=setting_autocomplete)
+    async def reset_setting(self, interaction: discord.Interaction, setting: str):
+        setting = setting.upper()
+        if setting not in settings_service.SETTINGS:
+            await interaction.response.send_message("Unknown setting.", ephemeral=True)
+            return
+        try:
+            settings_service.check_setting(
+                interaction.guild.id, setting, settings_service.default_setting(setting)
+            )
+        except ValueError as e:
+            await interaction.response.send_message(str(e), ephemeral=True)
+            return
+        await settings_service.reset_setting(self.store, interaction.guild.id, setting)
+        await interaction.response.send_message(f"✅ **{setting}** reset to the default.", ephemeral=True)
+
+
+async def setup(bot):
+    await settings_service.load_all(bot.store)
+    await bot.add_cog(Settings(bot))
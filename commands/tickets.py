@@ -1,11 +1,17 @@
-# commands/tickets.py — Ticket panel button, /close, persistent views.
+# commands/tickets.py — Ticket panel button, /close, /ticketsearch, persistent views.
+
+from datetime import datetime, timedelta
 
 import discord
 from discord import app_commands
 from discord.ext import commands
 
 import config
-from services.ticket_service import create_ticket, close_ticket
+from services.cluster_service import owns_guild
+from services.ticket_service import (
+    create_ticket, close_ticket, get_open_ticket, load_open_tickets,
+    search_transcripts, SEARCH_PAGE_SIZE,
+)
 
 
 class TicketOpenView(discord.ui.View):
@@ -21,7 +27,7 @@ class TicketOpenView(discord.ui.View):
     )
     async def open_ticket(self, interaction: discord.Interaction, button: discord.ui.Button):
         await interaction.response.defer(ephemeral=True)
-        channel, error = await create_ticket(interaction.client.db, interaction.guild, interaction.user)
+        channel, error = await create_ticket(interaction.client.store, interaction.guild, interaction.user)
         if error:
             await interaction.followup.send(error, ephemeral=True)
         else:
@@ -41,7 +47,7 @@ class CloseTicketView(discord.ui.View):
     )
     async def close_ticket_btn(self, interaction: discord.Interaction, button: discord.ui.Button):
         await interaction.response.defer()
-        result = await close_ticket(interaction.client.db, interaction.channel, interaction.user)
+        result = await close_ticket(interaction.client.store, interaction.channel, interaction.user)
         if result != "Ticket closed.":
             await interaction.followup.send(result, ephemeral=True)
 
@@ -51,8 +57,8 @@ class Tickets(commands.Cog):
         self.bot = bot
 
     @property
-    def db(self):
-        return self.bot.db
+    def store(self):
+        return self.bot.store
 
     # ── /ticketpanel ──────────────────────────────────────────────────────
     @app_commands.command(name="ticketpanel", description="[Admin] Post the ticket panel message.")
@@ -77,20 +83,68 @@ class Tickets(commands.Cog):
     # ── /close ────────────────────────────────────────────────────────────
     @app_commands.command(name="close", description="Close the current support ticket.")
     async def close(self, interaction: discord.Interaction):
-        ticket = await self.db.tickets.find_one({
-            "channel_id": str(interaction.channel.id),
-            "status": "open",
-        })
+        ticket = get_open_ticket(interaction.channel.id)
         if not ticket:
             await interaction.response.send_message(
                 "This channel is not an open ticket.", ephemeral=True
             )
             return
         await interaction.response.defer()
-        await close_ticket(self.db, interaction.channel, interaction.user)
+        await close_ticket(self.store, interaction.channel, interaction.user)
+
+    # ── /ticketsearch ─────────────────────────────────────────────────────
+    @app_commands.command(name="ticketsearch", description="[Staff] Search closed ticket transcripts.")
+    @app_commands.describe(
+        query="Words or \"exact phrase\" to search for",
+        member="Only tickets opened by this member",
+        since="Closed on or after this date (YYYY-MM-DD)",
+        until="Closed on or before this date (YYYY-MM-DD)",
+        page="Results page",
+    )
+    @app_commands.checks.has_permissions(manage_messages=True)
+    async def ticketsearch(self, interaction: discord.Interaction, query: str,
+                           member: discord.User = None, since: str = None,
+                           until: str = None, page: int = 1):
+        try:
+            since_dt = datetime.strptime(since, "%Y-%m-%d") if since else None
+            until_dt = datetime.strptime(until, "%Y-%m-%d") + timedelta(days=1) if until else None
+        except ValueError:
+            await interaction.response.send_message("Dates must look like `2024-01-31`.", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True)
+        results, total = await search_transcripts(
+            self.store, interaction.guild.id, query,
+            user_id=member.id if member else None,
+            since=since_dt, until=until_dt, page=page,
+        )
+        if not results:
+            await interaction.followup.send("No matching transcripts.", ephemeral=True)
+            return
+
+        pages = (total + SEARCH_PAGE_SIZE - 1) // SEARCH_PAGE_SIZE
+        embed = discord.Embed(
+            title=f"🔎 Transcripts matching \"{query[:100]}\"",
+            color=discord.Color.blurple(),
+        )
+        for i, t in enumerate(results, (max(page, 1) - 1) * SEARCH_PAGE_SIZE + 1):
+            opener = interaction.guild.get_member(int(t["user_id"]))
+            closed = f"<t:{int(t['closed_at'].timestamp())}:d>" if t.get("closed_at") else "unknown"
+            embed.add_field(
+                name=f"#{i} — {opener or t['user_id']} — closed {closed}",
+                value=f"`{t['snippet'][:900] or '(empty)'}`\nTicket ID: `{t['_id']}`",
+                inline=False,
+            )
+        embed.set_footer(text=f"Page {max(page, 1)}/{pages} • {total} match(es)")
+        await interaction.followup.send(embed=embed, ephemeral=True)
+
+    @ticketsearch.error
+    async def ticketsearch_error(self, interaction, error):
+        await interaction.response.send_message("You need Manage Messages permission.", ephemeral=True)
 
 
 async def setup(bot):
+    await load_open_tickets(bot.store, lambda guild_id: owns_guild(bot, guild_id))
     # Register persistent views so buttons work after restart
     bot.add_view(TicketOpenView())
     bot.add_view(CloseTicketView())
@@ -6,6 +6,9 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 
+from models.database import driver_name
+from services.cluster_service import CLUSTER_ID, totals
+
 
 class Utility(commands.Cog):
     def __init__(self, bot):
@@ -47,12 +50,16 @@ class Utility(commands.Cog):
         bot = self.bot
         embed = discord.Embed(title=f"ℹ️ {bot.user.name}", color=discord.Color.blurple())
         embed.set_thumbnail(url=bot.user.display_avatar.url)
-        embed.add_field(name="Servers",   value=str(len(bot.guilds)), inline=True)
-        embed.add_field(name="Users",     value=str(sum(g.member_count for g in bot.guilds)), inline=True)
+        stats = totals(bot)
+        embed.add_field(name="Servers",   value=str(stats["guilds"]), inline=True)
+        embed.add_field(name="Users",     value=str(stats["users"]), inline=True)
         embed.add_field(name="Latency",   value=f"{round(bot.latency * 1000)}ms", inline=True)
+        shard = interaction.guild.shard_id if interaction.guild else 0
+        embed.add_field(name="Shard",     value=f"{shard + 1}/{bot.shard_count} (cluster {CLUSTER_ID}, {stats['clusters']} total)", inline=True)
         embed.add_field(name="Bot ID",    value=str(bot.user.id), inline=True)
         embed.add_field(name="Library",   value="discord.py 2.x", inline=True)
-        embed.add_field(name="Database",  value="MongoDB (motor)", inline=True)
+        database = f"MongoDB ({driver_name()})" if bot.db is not None else "SQLite"
+        embed.add_field(name="Database",  value=database, inline=True)
         embed.set_footer(text="Modular Community Bot")
         await interaction.response.send_message(embed=embed)
 
@@ -81,7 +88,7 @@ class Utility(commands.Cog):
         )
         embed.add_field(
             name="🎫 Tickets",
-            value="`/ticketpanel` `/close`",
+            value="`/ticketpanel` `/close` `/ticketsearch`",
             inline=False,
         )
         embed.add_field(
@@ -96,7 +103,12 @@ class Utility(commands.Cog):
         )
         embed.add_field(
             name="🤖 Admin — Economy",
-            value="`/addcoins` `/removecoins` `/setcoins` `/reseteconomy`",
+            value="`/addcoins` `/removecoins` `/setcoins` `/reseteconomy` `/ecoaudit` `/ecoadjust` `/grantall` `/shopadd` `/shopremove`",
+            inline=False,
+        )
+        embed.add_field(
+            name="⚙️ Admin — Settings",
+            value="`/config show` `/config set` `/config reset`",
             inline=False,
         )
         embed.add_field(
@@ -10,6 +10,19 @@ load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 MONGO_URI = os.getenv("MONGO_URI")
 
+# ── Storage ────────────────────────────────────────────────────────────────
+# "mongo" (default) or "sqlite". SQLite keeps leveling, moderation, giveaways,
+# tickets and settings in one local file. The economy commands and role panels
+# (commands/economy.py, commands/autoroles.py) need MongoDB and are not loaded.
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "mongo")
+SQLITE_PATH = os.getenv("SQLITE_PATH", "bot.db")
+# MongoDB driver: "motor" (default) or "pymongo" for PyMongo's native asyncio
+# client (needs pymongo>=4.13), which avoids Motor's thread-pool hop per operation.
+MONGO_DRIVER = os.getenv("MONGO_DRIVER", "motor")
+# Leaderboards, ranks and listings may be read from replica-set secondaries lagging
+# at most this many seconds (MongoDB's minimum is 90). 0 = always read the primary.
+READ_MAX_STALENESS_SECONDS = int(os.getenv("READ_MAX_STALENESS_SECONDS", "90"))
+
 # ── Leveling ───────────────────────────────────────────────────────────────
 XP_MIN_PER_MESSAGE = 15     # Minimum XP granted per message
 XP_MAX_PER_MESSAGE = 25     # Maximum XP granted per message
@@ -36,12 +49,26 @@ CHAT_COINS_MAX = 5      # Maximum coins earned per chat message
 MAX_DAILY_CHAT_COINS = 500    # Maximum coins a user can earn from chat per day
 CURRENCY_NAME = "coins"
 CURRENCY_SYMBOL = "🪙"
+SHOP_CACHE_SECONDS = 300   # Max age of a cached shop catalog (edits via /shopadd apply instantly)
+ECONOMY_FLUSH_SECONDS = 10  # Buffered chat-coin grants and ledger entries are written this often
+LEDGER_SNAPSHOT_HOURS = 24  # How often the ledger is compacted into balance snapshots
+BANK_INTEREST_BPS = 0       # Scheduled bank interest in basis points (100 = 1%). 0 = off
+BANK_INTEREST_CAP = 10000   # Most interest one member can earn per payout
+BANK_INTEREST_HOURS = 24    # How often bank interest is paid
+ECONOMY_BULK_CHUNK = 5000   # Members per server-side update in economy-wide adjustments
 
 # ── Moderation ─────────────────────────────────────────────────────────────
 MOD_LOG_CHANNEL = 1477311063631466638      # Channel ID for moderation logs
 JOIN_LOG_CHANNEL = 1477311096661606474      # Channel ID for join/leave logs
 # Channel ID for message edit/delete logs
 MSG_LOG_CHANNEL = 1477311117633257503
+# Edit/delete logs read from the bot's own compact message cache
+MESSAGE_CACHE_BYTES_PER_GUILD = 2_000_000   # Content budget per guild (~2 MB)
+DISCORD_MAX_MESSAGES = 100    # discord.py's own Message cache (not needed for logs)
+# Log channels are written through a batching dispatcher (up to 10 embeds per message)
+LOG_FLUSH_SECONDS = 2.0       # Max time an entry waits for its batch to fill
+LOG_MIN_SEND_INTERVAL = 1.0   # Min seconds between messages to the same log channel
+LOG_MAX_PENDING = 200         # Per channel; oldest entries are dropped beyond this
 BLACKLISTED_WORDS = ["fuck", "fucking", "motherfucker", "mf", "shit", "bullshit", "bitch", "bitches", "asshole", "dick", "pussy", "bastard", "slut", "whore", "cunt", "nigger", "nigga", "faggot", "retard", "kike", "chink", "paki", "porn", "porno", "hentai", "nudes", "onlyfans", "sex", "sexy", "blowjob", "handjob", "cum", "dickpic", "boobs", "tits", "kys", "kill yourself", "go die", "hang yourself", "cut yourself", "loser", "noob", "dogshit", "trash", "stupid", "idiot"]        # List of words to auto-delete
 ANTI_LINK_ENABLED = True      # Delete links posted by non-staff users
 ANTI_SPAM_THRESHOLD = 5        # Messages within 5 seconds = spam
@@ -50,6 +77,8 @@ STAFF_ROLE_IDS = [1477310091605835869]        # Role IDs that bypass auto-mod
 # ── Tickets ────────────────────────────────────────────────────────────────
 # Category ID where ticket channels are created
 TICKET_CATEGORY_ID = 1477311539911594145
+# Channels per category before overflow categories are created (Discord max: 50)
+TICKET_CATEGORY_LIMIT = 50
 # Role ID pinged when a ticket is opened
 TICKET_STAFF_ROLE = 1477311787182456872
 # Channel where transcripts are sent on close
@@ -62,6 +91,33 @@ GIVEAWAY_EMOJI = "🎉"
 # Role ID given to every new member on join
 AUTO_JOIN_ROLE = 1477310129245520005
 
+# ── Sharding ───────────────────────────────────────────────────────────────
+# The bot always runs sharded. SHARD_COUNT = None lets Discord recommend a count.
+# `python cluster.py` spreads the shards over CLUSTER_COUNT processes (one CPU
+# core each); `python bot.py` runs every shard in one process.
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0")) or None
+CLUSTER_COUNT = int(os.getenv("CLUSTER_COUNT", "1"))
+CLUSTER_IPC_PORT = 47600        # Local port the launcher relays cluster stats on
+CLUSTER_STATS_SECONDS = 30      # How often each cluster shares its server/user counts
+
+# ── Shared cache ───────────────────────────────────────────────────────────
+# "memory" keeps automod counters and cache invalidations inside one process.
+# Use "redis" (pip install redis) when running several processes, so they share them.
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# ── Slash commands ─────────────────────────────────────────────────────────
+# Commands are only re-synced with Discord when they change (tracked in this file;
+# delete it to force a sync).
+COMMAND_SYNC_STATE = ".command_sync.json"
+# Guild IDs to sync commands to instantly instead of globally, for testing
+# (e.g. SYNC_GUILDS=123,456 in .env). Empty = global sync.
+SYNC_GUILDS = [int(g) for g in os.getenv("SYNC_GUILDS", "").split(",") if g.strip()]
+
+# ── Per-guild settings ────────────────────────────────────────────────────
+# Most values above are defaults; admins can override them per server with /config.
+GUILD_SETTINGS_REFRESH_SECONDS = 60   # How often to pick up changes from other instances
+
 # ── System Toggles ─────────────────────────────────────────────────────────
 LEVELING_ENABLED = True
 ECONOMY_ENABLED = True
@@ -5,7 +5,8 @@ from datetime import datetime
 import discord
 from discord.ext import commands
 
-import config
+from services.guild_config_service import get_settings
+from services.log_service import log_dispatcher
 
 
 class OnMemberJoin(commands.Cog):
@@ -14,9 +15,11 @@ class OnMemberJoin(commands.Cog):
 
     @commands.Cog.listener()
     async def on_member_join(self, member: discord.Member):
+        cfg = get_settings(member.guild.id)
+
         # Auto-assign join role
-        if config.AUTO_JOIN_ROLE:
-            role = member.guild.get_role(int(config.AUTO_JOIN_ROLE))
+        if cfg.AUTO_JOIN_ROLE:
+            role = member.guild.get_role(cfg.AUTO_JOIN_ROLE)
             if role:
                 try:
                     await member.add_roles(role, reason="Auto join role")
@@ -24,8 +27,8 @@ class OnMemberJoin(commands.Cog):
                     pass
 
         # Join log
-        if config.JOIN_LOG_CHANNEL:
-            ch = member.guild.get_channel(int(config.JOIN_LOG_CHANNEL))
+        if cfg.JOIN_LOG_CHANNEL:
+            ch = member.guild.get_channel(cfg.JOIN_LOG_CHANNEL)
             if ch:
                 embed = discord.Embed(
                     title="✅ Member Joined",
@@ -36,10 +39,7 @@ class OnMemberJoin(commands.Cog):
                 embed.add_field(name="User",    value=f"{member} ({member.id})", inline=False)
                 embed.add_field(name="Account", value=f"<t:{int(member.created_at.timestamp())}:R>", inline=True)
                 embed.add_field(name="Members", value=str(member.guild.member_count), inline=True)
-                try:
-                    await ch.send(embed=embed)
-                except discord.Forbidden:
-                    pass
+                log_dispatcher.enqueue(ch, embed)
 
 
 async def setup(bot):
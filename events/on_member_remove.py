@@ -5,7 +5,8 @@ from datetime import datetime
 import discord
 from discord.ext import commands
 
-import config
+from services.guild_config_service import get_settings
+from services.log_service import log_dispatcher
 
 
 class OnMemberRemove(commands.Cog):
@@ -14,9 +15,10 @@ class OnMemberRemove(commands.Cog):
 
     @commands.Cog.listener()
     async def on_member_remove(self, member: discord.Member):
-        if not config.JOIN_LOG_CHANNEL:
+        cfg = get_settings(member.guild.id)
+        if not cfg.JOIN_LOG_CHANNEL:
             return
-        ch = member.guild.get_channel(int(config.JOIN_LOG_CHANNEL))
+        ch = member.guild.get_channel(cfg.JOIN_LOG_CHANNEL)
         if not ch:
             return
 
@@ -29,10 +31,7 @@ class OnMemberRemove(commands.Cog):
         embed.add_field(name="User",    value=f"{member} ({member.id})", inline=False)
         embed.add_field(name="Joined",  value=f"<t:{int(member.joined_at.timestamp())}:R>" if member.joined_at else "Unknown", inline=True)
         embed.add_field(name="Members", value=str(member.guild.member_count), inline=True)
-        try:
-            await ch.send(embed=embed)
-        except discord.Forbidden:
-            pass
+        log_dispatcher.enqueue(ch, embed)
 
 
 async def setup(bot):
@@ -3,10 +3,11 @@
 import discord
 from discord.ext import commands
 
-import config
+from services.guild_config_service import get_settings
 from services.xp_service import process_message_xp
 from services.economy_service import process_chat_coins
 from services.moderation_service import check_automod
+from services.message_cache import message_cache
 
 
 class OnMessage(commands.Cog):
@@ -23,17 +24,22 @@ class OnMessage(commands.Cog):
         if message.type != discord.MessageType.default:
             return
 
+        # Remember content for edit/delete logs
+        message_cache.add(message)
+
         # Auto-moderation (runs first — if message deleted, skip XP)
         deleted = await check_automod(message)
         if deleted:
             return
 
+        cfg = get_settings(message.guild.id)
+
         # Grant XP
-        if config.LEVELING_ENABLED:
-            await process_message_xp(self.bot.db, message)
+        if cfg.LEVELING_ENABLED:
+            await process_message_xp(self.bot.store, message)
 
-        # Grant chat coins
-        if config.ECONOMY_ENABLED:
+        # Grant chat coins (the economy needs MongoDB)
+        if cfg.ECONOMY_ENABLED and self.bot.db is not None:
             await process_chat_coins(self.bot.db, message.author.id, message.guild.id)
 
 
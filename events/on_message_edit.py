@@ -1,68 +1,131 @@
 # events/on_message_edit.py — Log message edits and deletions.
+# Uses raw events + our own message cache, so messages that fell out of
+# discord.py's cache are still logged.
 
+import io
+from collections import Counter
 from datetime import datetime
 
 import discord
 from discord.ext import commands
 
-import config
+from services.guild_config_service import get_settings
+from services.log_service import log_dispatcher
+from services.message_cache import message_cache
 
 
 class OnMessageEdit(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
+    def _log_channel(self, guild_id: int | None):
+        if not guild_id:
+            return None
+        channel_id = get_settings(guild_id).MSG_LOG_CHANNEL
+        guild = self.bot.get_guild(guild_id)
+        return guild.get_channel(channel_id) if guild and channel_id else None
+
     @commands.Cog.listener()
-    async def on_message_edit(self, before: discord.Message, after: discord.Message):
-        if not config.MSG_LOG_CHANNEL:
+    async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent):
+        data = payload.data
+        if "content" not in data or not data.get("edited_timestamp"):
+            return  # Embed-only update — skip
+        author = data.get("author") or {}
+        if author.get("bot"):
             return
-        if before.author.bot:
+        ch = self._log_channel(payload.guild_id)
+        if not ch:
             return
-        if before.content == after.content:
-            return  # Embed-only update — skip
 
-        ch = before.guild.get_channel(int(config.MSG_LOG_CHANNEL))
-        if not ch:
+        before = message_cache.get(payload.guild_id, payload.message_id)
+        if before and before.content == data["content"]:
             return
+        author_name = before.author_name if before else author.get("username", "Unknown")
 
         embed = discord.Embed(
             title="✏️ Message Edited",
             color=discord.Color.blue(),
             timestamp=datetime.utcnow(),
         )
-        embed.add_field(name="Author",  value=f"{before.author} ({before.author.id})", inline=False)
-        embed.add_field(name="Channel", value=before.channel.mention, inline=True)
-        embed.add_field(name="Before",  value=before.content[:1024] or "(empty)", inline=False)
-        embed.add_field(name="After",   value=after.content[:1024] or "(empty)", inline=False)
-        embed.add_field(name="Jump",    value=f"[Jump to message]({after.jump_url})", inline=False)
-        try:
-            await ch.send(embed=embed)
-        except discord.Forbidden:
-            pass
+        embed.add_field(name="Author",  value=f"{author_name} ({author.get('id', 'unknown')})", inline=False)
+        embed.add_field(name="Channel", value=f"<#{payload.channel_id}>", inline=True)
+        embed.add_field(name="Before",  value=(before.content[:1024] or "(empty)") if before else "(not cached)", inline=False)
+        embed.add_field(name="After",   value=data["content"][:1024] or "(empty)", inline=False)
+        jump_url = f"https://discord.com/channels/{payload.guild_id}/{payload.channel_id}/{payload.message_id}"
+        embed.add_field(name="Jump",    value=f"[Jump to message]({jump_url})", inline=False)
+        log_dispatcher.enqueue(ch, embed)
+
+        if before:
+            message_cache.update_content(before, data["content"])
 
     @commands.Cog.listener()
-    async def on_message_delete(self, message: discord.Message):
-        if not config.MSG_LOG_CHANNEL:
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        if not payload.guild_id:
             return
-        if message.author.bot:
-            return
-        if not message.guild:
-            return
-
-        ch = message.guild.get_channel(int(config.MSG_LOG_CHANNEL))
+        message = message_cache.pop(payload.guild_id, payload.message_id)
+        if not message:
+            return  # Unknown author/content (bot messages are never cached)
+        ch = self._log_channel(payload.guild_id)
         if not ch:
             return
 
+        content = message.content[:1024]
+        if message.attachments:
+            content = f"{content}\n📎 {', '.join(message.attachments)}"[:1024].strip()
+
         embed = discord.Embed(
             title="🗑️ Message Deleted",
             color=discord.Color.red(),
             timestamp=datetime.utcnow(),
         )
-        embed.add_field(name="Author",  value=f"{message.author} ({message.author.id})", inline=False)
-        embed.add_field(name="Channel", value=message.channel.mention, inline=True)
-        embed.add_field(name="Content", value=message.content[:1024] or "(empty or attachment)", inline=False)
+        embed.add_field(name="Author",  value=f"{message.author_name} ({message.author_id})", inline=False)
+        embed.add_field(name="Channel", value=f"<#{message.channel_id}>", inline=True)
+        embed.add_field(name="Content", value=content or "(empty or attachment)", inline=False)
+        log_dispatcher.enqueue(ch, embed)
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent):
+        """One summary embed + one transcript file instead of an embed per message."""
+        if not payload.guild_id:
+            return
+        cached = [
+            m for m in (message_cache.pop(payload.guild_id, mid) for mid in sorted(payload.message_ids))
+            if m
+        ]
+        ch = self._log_channel(payload.guild_id)
+        if not ch:
+            return
+
+        embed = discord.Embed(
+            title="🗑️ Bulk Delete",
+            description=f"**{len(payload.message_ids)}** message(s) deleted in <#{payload.channel_id}>.",
+            color=discord.Color.dark_red(),
+            timestamp=datetime.utcnow(),
+        )
+        embed.add_field(name="Cached", value=f"{len(cached)} / {len(payload.message_ids)}", inline=True)
+        authors = Counter(f"{m.author_name} ({m.author_id})" for m in cached)
+        if authors:
+            embed.add_field(
+                name="Top Authors",
+                value="\n".join(f"{name} — {count}" for name, count in authors.most_common(5)),
+                inline=False,
+            )
+
+        file = None
+        if cached:
+            lines = []
+            for m in cached:
+                created = discord.utils.snowflake_time(m.id).strftime("%Y-%m-%d %H:%M:%S")
+                line = f"[{created}] {m.author_name} ({m.author_id}): {m.content}"
+                if m.attachments:
+                    line += f" [attachments: {', '.join(m.attachments)}]"
+                lines.append(line)
+            file = discord.File(
+                fp=io.BytesIO("\n".join(lines).encode("utf-8")),
+                filename=f"bulk-delete-{payload.channel_id}.txt",
+            )
         try:
-            await ch.send(embed=embed)
+            await ch.send(embed=embed, file=file) if file else await ch.send(embed=embed)
         except discord.Forbidden:
             pass
 
@@ -0,0 +1,73 @@
+# models/database.py — MongoDB client for the configured driver (config.MONGO_DRIVER).
+#
+# "motor" hands every operation to a thread pool and back. "pymongo" uses
+# PyMongo's native asyncio client, which runs on the event loop with no thread
+# hop. Collections behave the same for everything the services do except
+# aggregate(): Motor returns the cursor directly, PyMongo from a coroutine. Run
+# pipelines through aggregate() below so code works on both.
+
+import asyncio
+import inspect
+from collections import defaultdict
+
+from pymongo.read_preferences import SecondaryPreferred
+
+import config
+
+
+def connect(uri: str):
+    """Client for the configured driver. Both are lazy: no I/O until the first operation."""
+    if config.MONGO_DRIVER == "pymongo":
+        from pymongo import AsyncMongoClient
+        return AsyncMongoClient(uri)
+    import motor.motor_asyncio
+    return motor.motor_asyncio.AsyncIOMotorClient(uri)
+
+
+def driver_name() -> str:
+    return "PyMongo async" if config.MONGO_DRIVER == "pymongo" else "motor"
+
+
+async def aggregate(collection, pipeline: list[dict], length: int | None = None) -> list[dict]:
+    """Run a pipeline and return up to `length` results (all if None)."""
+    cursor = collection.aggregate(pipeline)
+    if inspect.isawaitable(cursor):
+        cursor = await cursor
+    return await cursor.to_list(length=length)
+
+
+# ── Indexes ────────────────────────────────────────────────────────────────
+# Each module that queries MongoDB declares the indexes its queries need in an
+# INDEXES manifest ({collection: [IndexModel, ...]}) beside those queries.
+# ensure_indexes() builds them at startup: one createIndexes command per
+# collection, all collections at once. Existing indexes are a no-op.
+
+async def ensure_indexes(db, *manifests: dict[str, list]):
+    by_collection = defaultdict(list)
+    for manifest in manifests:
+        for name, indexes in manifest.items():
+            by_collection[name].extend(indexes)
+    await asyncio.gather(*(db[name].create_indexes(indexes) for name, indexes in by_collection.items()))
+
+
+# ── Read routing ───────────────────────────────────────────────────────────
+# Reads go to the primary unless they are marked staleness-tolerant with
+# stale_ok(): leaderboards, rank positions and listings. Those may be answered
+# by a secondary at most READ_MAX_STALENESS_SECONDS behind, which keeps them off
+# the primary that takes the message-write traffic. Without a qualifying
+# secondary (or on a standalone server) the primary answers anyway. A user's
+# own balance, cooldowns and purchases always read from the primary.
+
+_stale_ok: dict[str, object] = {}   # {collection full name: re-routed collection}
+
+
+def stale_ok(collection):
+    """`collection` with reads routed to secondaries when allowed."""
+    if not config.READ_MAX_STALENESS_SECONDS:
+        return collection
+    routed = _stale_ok.get(collection.full_name)
+    if routed is None:
+        routed = _stale_ok[collection.full_name] = collection.with_options(
+            read_preference=SecondaryPreferred(max_staleness=config.READ_MAX_STALENESS_SECONDS)
+        )
+    return routed
@@ -0,0 +1,129 @@
+# models/id_schema.py — int64 Discord IDs in every collection besides users.
+#
+# Guild, user, channel and message IDs used to be stored as strings outside the
+# users collection (see user_model for that one). They are now written as int64:
+# 8 bytes instead of a 17-20 character string in every document and index key.
+# Documents written before that are converted by migrate(); until it finishes,
+# reads match both forms (snowflake()) and keyed writes convert the documents
+# they touch first (ensure_converted()), so an upsert never adds an int64 twin of
+# a string-ID document. IDs inside payloads (giveaway entries and winners,
+# role_id, ledger refs) stay strings.
+
+import asyncio
+import logging
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+log = logging.getLogger("bot.ids")
+
+MIGRATION_BATCH = 1000          # Documents converted per background batch
+MIGRATION_PAUSE_SECONDS = 0.5   # Breather between batches so live traffic isn't starved
+MIGRATION_RECHECK_SECONDS = 60  # How often processes not running the migration check if it finished
+
+# Collection → its Discord ID fields
+ID_FIELDS: dict[str, tuple[str, ...]] = {
+    "warnings": ("guild_id", "user_id", "moderator_id"),
+    "giveaways": ("guild_id", "channel_id", "message_id"),
+    "tickets": ("guild_id", "user_id", "channel_id"),
+    "guilds": ("guild_id",),
+    "economy_ledger": ("guild_id", "user_id"),
+    "economy_snapshots": ("guild_id", "user_id"),
+    "economy_adjustments": ("guild_id",),
+    "inventory": ("guild_id", "user_id"),
+    "shop_stock": ("guild_id",),
+    "shop_purchases": ("guild_id", "user_id"),
+}
+
+_migrating = True   # Until load_schema_state() finds the migration finished
+
+
+def migration_pending() -> bool:
+    return _migrating
+
+
+def snowflake(value) -> int | dict:
+    """Filter value for an ID field, matching string IDs too while migrating."""
+    if _migrating:
+        return {"$in": [int(value), str(value)]}
+    return int(value)
+
+
+def snowflakes(values) -> list:
+    """$in list for an ID field, with the string forms too while migrating."""
+    ids = [int(v) for v in values]
+    return ids + [str(v) for v in ids] if _migrating else ids
+
+
+async def _convert_docs(collection, docs: list[dict]) -> int:
+    """Rewrite the string IDs of `docs` as int64. Each update is guarded on the old
+    value, so it is a no-op for a document converted in the meantime."""
+    ops = []
+    for doc in docs:
+        old = {f: doc[f] for f in ID_FIELDS[collection.name] if isinstance(doc.get(f), str)}
+        if old:
+            ops.append(UpdateOne({"_id": doc["_id"], **old}, {"$set": {f: int(v) for f, v in old.items()}}))
+    if ops:
+        await collection.bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+async def ensure_converted(collection, query: dict):
+    """
+    Before a write keyed on `query` (int IDs), convert the string-ID documents it
+    is meant to match, so the write finds them and unique indexes see one key.
+    No I/O once migrated.
+    """
+    if not _migrating:
+        return
+    fields = ID_FIELDS[collection.name]
+    old = {k: str(v) if k in fields else v for k, v in query.items()}
+    docs = await collection.find(old, projection=dict.fromkeys(fields, 1)).to_list(length=None)
+    await _convert_docs(collection, docs)
+
+
+async def load_schema_state(db):
+    """Read whether the ID migration has finished. Called once at startup."""
+    global _migrating
+    meta = await db.meta.find_one({"_id": "ids_schema"})
+    _migrating = not meta or meta.get("version", 1) < 2
+
+
+async def watch_schema_state(db):
+    """
+    For processes that don't run migrate(): re-read the schema state until the
+    migrating process records v2, then drop the dual-read shim here too.
+    """
+    while _migrating:
+        await asyncio.sleep(MIGRATION_RECHECK_SECONDS)
+        await load_schema_state(db)
+    log.info("ID migration finished elsewhere; dual reads off")
+
+
+async def migrate(db):
+    """Convert every string ID to int64 in batches. Safe to run while the bot is live and to resume."""
+    global _migrating
+    if not _migrating:
+        return
+    log.info("ID migration starting")
+    converted = {}
+    for name, fields in ID_FIELDS.items():
+        collection = db[name]
+        query = {"$or": [{f: {"$type": "string"}} for f in fields]}
+        converted[name] = 0
+        while True:
+            docs = await collection.find(
+                query, projection=dict.fromkeys(fields, 1), limit=MIGRATION_BATCH,
+            ).to_list(length=MIGRATION_BATCH)
+            if not docs:
+                break
+            converted[name] += await _convert_docs(collection, docs)
+            await asyncio.sleep(MIGRATION_PAUSE_SECONDS)
+
+    await db.meta.update_one(
+        {"_id": "ids_schema"},
+        {"$set": {"version": 2, "converted": converted, "finished_at": datetime.utcnow()}},
+        upsert=True,
+    )
+    _migrating = False
+    log.info(f"ID migration finished: {converted}")
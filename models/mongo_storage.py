@@ -0,0 +1,232 @@
+# models/mongo_storage.py — Storage backed by MongoDB (the default).
+
+from datetime import datetime
+
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from models import database, user_model
+from models.id_schema import ensure_converted, snowflake, snowflakes
+from models.storage import Storage
+
+INDEXES = {
+    "warnings": [
+        IndexModel([("user_id", ASCENDING), ("guild_id", ASCENDING), ("timestamp", DESCENDING)]),
+    ],
+    "giveaways": [
+        IndexModel([("guild_id", ASCENDING), ("ended", ASCENDING)]),         # /glist
+        IndexModel([("guild_id", ASCENDING), ("message_id", ASCENDING)]),    # Enter button, /gend, /greroll
+        IndexModel([("ended", ASCENDING), ("ends_at", ASCENDING)]),          # Due giveaways
+    ],
+    "tickets": [
+        IndexModel([("user_id", ASCENDING), ("guild_id", ASCENDING)]),
+        # At most one open ticket per user, even with several bot instances running.
+        # Also serves the startup scan of open tickets.
+        IndexModel(
+            [("guild_id", ASCENDING), ("user_id", ASCENDING)],
+            unique=True,
+            partialFilterExpression={"status": "open"},
+            name="one_open_ticket_per_user",
+        ),
+        # Full-text search over closed transcripts (/ticketsearch)
+        IndexModel([("guild_id", ASCENDING), ("transcript", TEXT)], name="transcript_text"),
+        # No (channel_id, status) index: open tickets are looked up by channel in
+        # ticket_service's in-memory index, and every ticket write goes by _id.
+    ],
+    "guilds": [
+        IndexModel([("guild_id", ASCENDING)]),
+        IndexModel([("settings_version", ASCENDING)], sparse=True),          # Guilds with settings
+    ],
+}
+
+
+class MongoStorage(Storage):
+    def __init__(self, db):
+        self.db = db
+
+    # ── Users (leveling) ──────────────────────────────────────────────────
+    async def get_user(self, user_id: int, guild_id: int, *fields: str) -> dict:
+        return await user_model.get_user(self.db, user_id, guild_id, *fields)
+
+    async def record_xp(self, user_id: int, guild_id: int, xp: int, level: int, at: datetime):
+        await self.db.users.update_one(
+            await user_model.user_filter(self.db, user_id, guild_id),
+            user_model.with_defaults(
+                {"$set": {"xp": xp, "level": level, "last_xp_time": at}, "$inc": {"messages": 1}},
+                user_id, guild_id,
+            ),
+            upsert=True,
+        )
+
+    async def set_xp(self, user_id: int, guild_id: int, xp: int, level: int):
+        await self.db.users.update_one(
+            await user_model.user_filter(self.db, user_id, guild_id),
+            user_model.with_defaults(
+                {"$set": {"xp": xp, "level": level}},
+                user_id, guild_id,
+            ),
+            upsert=True,
+        )
+
+    async def reset_xp(self, user_id: int, guild_id: int):
+        await self.db.users.update_one(
+            await user_model.user_filter(self.db, user_id, guild_id),
+            user_model.with_defaults(
+                {"$set": {"xp": 0, "level": 0, "messages": 0}},
+                user_id, guild_id,
+            ),
+            upsert=True,
+        )
+
+    async def xp_rank(self, guild_id: int, xp: int) -> int:
+        return await database.stale_ok(self.db.users).count_documents(
+            {**user_model.guild_filter(guild_id), "xp": {"$gt": xp}}
+        ) + 1
+
+    async def xp_leaderboard(self, guild_id: int, limit: int = 10) -> list[dict]:
+        cursor = database.stale_ok(self.db.users).find(
+            user_model.guild_filter(guild_id), sort=[("xp", -1)], limit=limit,
+        )
+        return await cursor.to_list(length=limit)
+
+    # ── Warnings ──────────────────────────────────────────────────────────
+    async def add_warning(self, doc: dict):
+        await self.db.warnings.insert_one(doc)
+
+    async def get_warnings(self, user_id: int, guild_id: int, limit: int = 50,
+                           stale_ok: bool = False) -> list[dict]:
+        warnings = database.stale_ok(self.db.warnings) if stale_ok else self.db.warnings
+        cursor = warnings.find(
+            {"user_id": snowflake(user_id), "guild_id": snowflake(guild_id)},
+            sort=[("timestamp", -1)],
+            limit=limit,
+        )
+        return await cursor.to_list(length=limit)
+
+    async def clear_warnings(self, user_id: int, guild_id: int) -> int:
+        result = await self.db.warnings.delete_many({"user_id": snowflake(user_id), "guild_id": snowflake(guild_id)})
+        return result.deleted_count
+
+    # ── Giveaways ─────────────────────────────────────────────────────────
+    async def insert_giveaway(self, doc: dict):
+        await self.db.giveaways.insert_one(doc)
+
+    async def get_giveaway(self, giveaway_id) -> dict | None:
+        return await self.db.giveaways.find_one({"_id": giveaway_id})
+
+    async def find_giveaway(self, guild_id: int, message_id: int, ended: bool | None = None) -> dict | None:
+        query = {"message_id": snowflake(message_id), "guild_id": snowflake(guild_id)}
+        if ended is not None:
+            query["ended"] = ended
+        return await self.db.giveaways.find_one(query)
+
+    async def toggle_giveaway_entry(self, giveaway_id, user_id: str) -> dict | None:
+        # One pipeline update decides and applies the toggle, so double clicks can't race
+        return await self.db.giveaways.find_one_and_update(
+            {"_id": giveaway_id, "ended": False},
+            [{"$set": {"entries": {"$cond": [
+                {"$in": [user_id, "$entries"]},
+                {"$filter": {"input": "$entries", "cond": {"$ne": ["$$this", user_id]}}},
+                {"$concatArrays": ["$entries", [user_id]]},
+            ]}}}],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def due_giveaways(self, now: datetime) -> list[dict]:
+        cursor = self.db.giveaways.find({"ended": False, "ends_at": {"$lte": now}})
+        return await cursor.to_list(length=None)
+
+    async def active_giveaways(self, guild_id: int, limit: int = 20) -> list[dict]:
+        cursor = database.stale_ok(self.db.giveaways).find({"guild_id": snowflake(guild_id), "ended": False}, limit=limit)
+        return await cursor.to_list(length=limit)
+
+    async def finish_giveaway(self, giveaway_id, winners: list[str]):
+        await self.db.giveaways.update_one(
+            {"_id": giveaway_id},
+            {"$set": {"ended": True, "winners": winners}},
+        )
+
+    # ── Tickets ───────────────────────────────────────────────────────────
+    async def open_tickets(self) -> list[dict]:
+        # Sorting on the keys of one_open_ticket_per_user lets that partial index serve the scan
+        cursor = self.db.tickets.find({"status": "open"}, sort=[("guild_id", 1), ("user_id", 1)])
+        return await cursor.to_list(length=None)
+
+    async def insert_ticket(self, doc: dict) -> bool:
+        # An open string-ID ticket must be converted for the unique index to see it
+        await ensure_converted(
+            self.db.tickets, {"guild_id": doc["guild_id"], "user_id": doc["user_id"], "status": "open"},
+        )
+        try:
+            await self.db.tickets.insert_one(doc)
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def delete_ticket(self, ticket_id):
+        await self.db.tickets.delete_one({"_id": ticket_id})
+
+    async def set_ticket_channel(self, ticket_id, channel_id: int):
+        await self.db.tickets.update_one({"_id": ticket_id}, {"$set": {"channel_id": channel_id}})
+
+    async def close_ticket(self, ticket_id, closed_at: datetime, transcript: list[str]):
+        await self.db.tickets.update_one(
+            {"_id": ticket_id},
+            {"$set": {"status": "closed", "closed_at": closed_at, "transcript": transcript}},
+        )
+
+    async def search_tickets(self, guild_id: int, query: str, user_id: int | None, since: datetime | None,
+                             until: datetime | None, skip: int, limit: int) -> tuple[list[dict], int]:
+        # $text needs an equality match on guild_id (the text index prefix), so no dual read
+        await ensure_converted(self.db.tickets, {"guild_id": guild_id})
+        filt = {"guild_id": int(guild_id), "$text": {"$search": query}, "status": "closed"}
+        if user_id:
+            filt["user_id"] = int(user_id)
+        if since or until:
+            filt["closed_at"] = {}
+            if since:
+                filt["closed_at"]["$gte"] = since
+            if until:
+                filt["closed_at"]["$lt"] = until
+        total = await self.db.tickets.count_documents(filt)
+        cursor = self.db.tickets.find(
+            filt,
+            projection={"score": {"$meta": "textScore"}, "user_id": 1, "channel_id": 1,
+                        "created_at": 1, "closed_at": 1, "transcript": 1},
+            sort=[("score", {"$meta": "textScore"}), ("closed_at", -1)],
+            skip=skip,
+            limit=limit,
+        )
+        return await cursor.to_list(length=limit), total
+
+    # ── Guild settings ────────────────────────────────────────────────────
+    _SETTINGS_FIELDS = {"guild_id": 1, "settings": 1, "settings_version": 1}
+
+    async def guild_settings(self, guild_ids: list[int] | None = None) -> list[dict]:
+        if guild_ids is None:
+            query = {"settings_version": {"$exists": True}}
+        else:
+            query = {"guild_id": {"$in": snowflakes(guild_ids)}}
+        return await self.db.guilds.find(query, projection=self._SETTINGS_FIELDS).to_list(length=None)
+
+    async def guild_settings_versions(self) -> dict[int, int]:
+        cursor = self.db.guilds.find(
+            {"settings_version": {"$exists": True}},
+            projection={"guild_id": 1, "settings_version": 1},
+        )
+        return {int(doc["guild_id"]): doc["settings_version"] async for doc in cursor}
+
+    async def write_guild_settings(self, guild_id: int, set: dict, unset: list[str]) -> dict:
+        update = {"$inc": {"settings_version": 1}}
+        if set:
+            update["$set"] = {f"settings.{k}": v for k, v in set.items()}
+        if unset:
+            update["$unset"] = {f"settings.{k}": "" for k in unset}
+        await ensure_converted(self.db.guilds, {"guild_id": guild_id})
+        return await self.db.guilds.find_one_and_update(
+            {"guild_id": int(guild_id)},
+            update,
+            projection=self._SETTINGS_FIELDS,
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
@@ -0,0 +1,374 @@
+# models/sqlite_storage.py — Storage in an embedded SQLite file, for single-server setups.
+#
+# One connection in WAL mode, owned by a dedicated thread. Every call is shipped to
+# that thread, which also serializes writes, so read-modify-write steps (like a
+# giveaway entry toggle) are atomic without extra locking.
+
+import asyncio
+import json
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from models.storage import Storage
+
+# Discord ID columns outside users are TEXT, as databases created before IDs became
+# ints have them. Ints bound to a TEXT column are stored and compared as text, and
+# the row → document functions below turn them back into ints.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    guild_id     INTEGER NOT NULL,
+    user_id      INTEGER NOT NULL,
+    xp           INTEGER NOT NULL DEFAULT 0,
+    level        INTEGER NOT NULL DEFAULT 0,
+    messages     INTEGER NOT NULL DEFAULT 0,
+    last_xp_time TEXT,
+    created_at   TEXT NOT NULL,
+    PRIMARY KEY (guild_id, user_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS users_guild_xp ON users (guild_id, xp DESC);
+
+CREATE TABLE IF NOT EXISTS warnings (
+    id           INTEGER PRIMARY KEY,
+    guild_id     TEXT NOT NULL,
+    user_id      TEXT NOT NULL,
+    reason       TEXT,
+    moderator_id TEXT,
+    timestamp    TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS warnings_user ON warnings (guild_id, user_id, timestamp);
+
+CREATE TABLE IF NOT EXISTS giveaways (
+    id            INTEGER PRIMARY KEY,
+    guild_id      TEXT NOT NULL,
+    channel_id    TEXT NOT NULL,
+    message_id    TEXT NOT NULL,
+    prize         TEXT NOT NULL,
+    winners_count INTEGER NOT NULL,
+    ends_at       TEXT NOT NULL,
+    ended         INTEGER NOT NULL DEFAULT 0,
+    required_role TEXT,
+    min_level     INTEGER NOT NULL DEFAULT 0,
+    bonus_entries TEXT NOT NULL DEFAULT '{}',
+    entries       TEXT NOT NULL DEFAULT '[]',
+    winners       TEXT NOT NULL DEFAULT '[]'
+);
+CREATE INDEX IF NOT EXISTS giveaways_message ON giveaways (guild_id, message_id);
+CREATE INDEX IF NOT EXISTS giveaways_running ON giveaways (ended, ends_at);
+
+CREATE TABLE IF NOT EXISTS tickets (
+    id         INTEGER PRIMARY KEY,
+    guild_id   TEXT NOT NULL,
+    user_id    TEXT NOT NULL,
+    channel_id TEXT,
+    status     TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    closed_at  TEXT,
+    transcript TEXT NOT NULL DEFAULT '[]'
+);
+CREATE UNIQUE INDEX IF NOT EXISTS one_open_ticket_per_user ON tickets (guild_id, user_id) WHERE status = 'open';
+CREATE INDEX IF NOT EXISTS tickets_closed ON tickets (guild_id, status, closed_at);
+
+CREATE TABLE IF NOT EXISTS guilds (
+    guild_id         TEXT PRIMARY KEY,
+    settings         TEXT NOT NULL DEFAULT '{}',
+    settings_version INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def _ts(value: datetime | None) -> str | None:
+    # Fixed width, so text comparison in SQL orders like the datetimes do
+    return value.isoformat(timespec="microseconds") if value else None
+
+
+def _dt(value: str | None) -> datetime | None:
+    return datetime.fromisoformat(value) if value else None
+
+
+def _int(value) -> int | None:
+    return int(value) if value is not None else None
+
+
+def _user(row) -> dict:
+    return {
+        "_id": {"guild_id": row["guild_id"], "user_id": row["user_id"]},
+        "guild_id": row["guild_id"], "user_id": row["user_id"],
+        "xp": row["xp"], "level": row["level"], "messages": row["messages"],
+        "last_xp_time": _dt(row["last_xp_time"]), "created_at": _dt(row["created_at"]),
+    }
+
+
+def _warning(row) -> dict:
+    return {
+        "_id": row["id"], "guild_id": int(row["guild_id"]), "user_id": int(row["user_id"]),
+        "reason": row["reason"], "moderator_id": _int(row["moderator_id"]), "timestamp": _dt(row["timestamp"]),
+    }
+
+
+def _giveaway(row) -> dict | None:
+    if row is None:
+        return None
+    return {
+        "_id": row["id"], "guild_id": int(row["guild_id"]), "channel_id": int(row["channel_id"]),
+        "message_id": int(row["message_id"]), "prize": row["prize"], "winners_count": row["winners_count"],
+        "ends_at": _dt(row["ends_at"]), "ended": bool(row["ended"]), "required_role": row["required_role"],
+        "min_level": row["min_level"], "bonus_entries": json.loads(row["bonus_entries"]),
+        "entries": json.loads(row["entries"]), "winners": json.loads(row["winners"]),
+    }
+
+
+def _ticket(row) -> dict:
+    return {
+        "_id": row["id"], "guild_id": int(row["guild_id"]), "user_id": int(row["user_id"]),
+        "channel_id": _int(row["channel_id"]), "status": row["status"], "created_at": _dt(row["created_at"]),
+        "closed_at": _dt(row["closed_at"]), "transcript": json.loads(row["transcript"]),
+    }
+
+
+class SQLiteStorage(Storage):
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: sqlite3.Connection | None = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _open(self):
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")   # Safe with WAL; fsync at checkpoints only
+        self._conn.executescript(_SCHEMA)
+
+    async def open(self):
+        await self._run(self._open)
+
+    async def close(self):
+        if self._conn:
+            await self._run(self._conn.close)
+            self._conn = None
+        self._executor.shutdown(wait=False)
+
+    def _query(self, sql: str, params=()) -> list:
+        return self._conn.execute(sql, params).fetchall()
+
+    def _write(self, sql: str, params=()) -> sqlite3.Cursor:
+        with self._conn:
+            return self._conn.execute(sql, params)
+
+    # ── Users (leveling) ──────────────────────────────────────────────────
+    def _get_user(self, user_id: int, guild_id: int) -> dict:
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO users (guild_id, user_id, created_at) VALUES (?, ?, ?)",
+                (guild_id, user_id, _ts(datetime.utcnow())),
+            )
+        row = self._conn.execute(
+            "SELECT * FROM users WHERE guild_id = ? AND user_id = ?", (guild_id, user_id)
+        ).fetchone()
+        return _user(row)
+
+    async def get_user(self, user_id: int, guild_id: int, *fields: str) -> dict:
+        # Rows are narrow, so the whole row is returned whatever `fields` asks for
+        return await self._run(self._get_user, int(user_id), int(guild_id))
+
+    _UPSERT_USER = (
+        "INSERT INTO users (guild_id, user_id, xp, level, messages, last_xp_time, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (guild_id, user_id) DO UPDATE SET "
+    )
+
+    async def record_xp(self, user_id: int, guild_id: int, xp: int, level: int, at: datetime):
+        await self._run(self._write, self._UPSERT_USER +
+                        "xp = excluded.xp, level = excluded.level, "
+                        "last_xp_time = excluded.last_xp_time, messages = messages + 1",
+                        (int(guild_id), int(user_id), xp, level, 1, _ts(at), _ts(datetime.utcnow())))
+
+    async def set_xp(self, user_id: int, guild_id: int, xp: int, level: int):
+        await self._run(self._write, self._UPSERT_USER + "xp = excluded.xp, level = excluded.level",
+                        (int(guild_id), int(user_id), xp, level, 0, None, _ts(datetime.utcnow())))
+
+    async def reset_xp(self, user_id: int, guild_id: int):
+        await self._run(self._write, self._UPSERT_USER + "xp = 0, level = 0, messages = 0",
+                        (int(guild_id), int(user_id), 0, 0, 0, None, _ts(datetime.utcnow())))
+
+    async def xp_rank(self, guild_id: int, xp: int) -> int:
+        rows = await self._run(self._query, "SELECT COUNT(*) FROM users WHERE guild_id = ? AND xp > ?",
+                               (int(guild_id), xp))
+        return rows[0][0] + 1
+
+    async def xp_leaderboard(self, guild_id: int, limit: int = 10) -> list[dict]:
+        rows = await self._run(self._query, "SELECT * FROM users WHERE guild_id = ? ORDER BY xp DESC LIMIT ?",
+                               (int(guild_id), limit))
+        return [_user(r) for r in rows]
+
+    # ── Warnings ──────────────────────────────────────────────────────────
+    async def add_warning(self, doc: dict):
+        cur = await self._run(self._write,
+                              "INSERT INTO warnings (guild_id, user_id, reason, moderator_id, timestamp) "
+                              "VALUES (?, ?, ?, ?, ?)",
+                              (doc["guild_id"], doc["user_id"], doc["reason"], doc["moderator_id"],
+                               _ts(doc["timestamp"])))
+        doc["_id"] = cur.lastrowid
+
+    async def get_warnings(self, user_id: int, guild_id: int, limit: int = 50,
+                           stale_ok: bool = False) -> list[dict]:
+        rows = await self._run(self._query,
+                               "SELECT * FROM warnings WHERE guild_id = ? AND user_id = ? "
+                               "ORDER BY timestamp DESC LIMIT ?",
+                               (str(guild_id), str(user_id), limit))
+        return [_warning(r) for r in rows]
+
+    async def clear_warnings(self, user_id: int, guild_id: int) -> int:
+        cur = await self._run(self._write, "DELETE FROM warnings WHERE guild_id = ? AND user_id = ?",
+                              (str(guild_id), str(user_id)))
+        return cur.rowcount
+
+    # ── Giveaways ─────────────────────────────────────────────────────────
+    async def insert_giveaway(self, doc: dict):
+        cur = await self._run(self._write,
+                              "INSERT INTO giveaways (guild_id, channel_id, message_id, prize, winners_count, "
+                              "ends_at, ended, required_role, min_level, bonus_entries, entries, winners) "
+                              "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                              (doc["guild_id"], doc["channel_id"], doc["message_id"], doc["prize"],
+                               doc["winners_count"], _ts(doc["ends_at"]), int(doc["ended"]),
+                               doc["required_role"], doc["min_level"], json.dumps(doc["bonus_entries"]),
+                               json.dumps(doc["entries"]), json.dumps(doc["winners"])))
+        doc["_id"] = cur.lastrowid
+
+    async def get_giveaway(self, giveaway_id) -> dict | None:
+        rows = await self._run(self._query, "SELECT * FROM giveaways WHERE id = ?", (giveaway_id,))
+        return _giveaway(rows[0]) if rows else None
+
+    async def find_giveaway(self, guild_id: int, message_id: int, ended: bool | None = None) -> dict | None:
+        sql, params = "SELECT * FROM giveaways WHERE guild_id = ? AND message_id = ?", [str(guild_id), str(message_id)]
+        if ended is not None:
+            sql += " AND ended = ?"
+            params.append(int(ended))
+        rows = await self._run(self._query, sql + " LIMIT 1", params)
+        return _giveaway(rows[0]) if rows else None
+
+    def _toggle_entry(self, giveaway_id, user_id: str) -> dict | None:
+        with self._conn:
+            row = self._conn.execute(
+                "SELECT * FROM giveaways WHERE id = ? AND ended = 0", (giveaway_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            giveaway = _giveaway(row)
+            entries = giveaway["entries"]
+            if user_id in entries:
+                entries.remove(user_id)
+            else:
+                entries.append(user_id)
+            self._conn.execute("UPDATE giveaways SET entries = ? WHERE id = ?", (json.dumps(entries), giveaway_id))
+        return giveaway
+
+    async def toggle_giveaway_entry(self, giveaway_id, user_id: str) -> dict | None:
+        return await self._run(self._toggle_entry, giveaway_id, user_id)
+
+    async def due_giveaways(self, now: datetime) -> list[dict]:
+        rows = await self._run(self._query, "SELECT * FROM giveaways WHERE ended = 0 AND ends_at <= ?", (_ts(now),))
+        return [_giveaway(r) for r in rows]
+
+    async def active_giveaways(self, guild_id: int, limit: int = 20) -> list[dict]:
+        rows = await self._run(self._query, "SELECT * FROM giveaways WHERE guild_id = ? AND ended = 0 LIMIT ?",
+                               (str(guild_id), limit))
+        return [_giveaway(r) for r in rows]
+
+    async def finish_giveaway(self, giveaway_id, winners: list[str]):
+        await self._run(self._write, "UPDATE giveaways SET ended = 1, winners = ? WHERE id = ?",
+                        (json.dumps(winners), giveaway_id))
+
+    # ── Tickets ───────────────────────────────────────────────────────────
+    async def open_tickets(self) -> list[dict]:
+        rows = await self._run(self._query, "SELECT * FROM tickets WHERE status = 'open'")
+        return [_ticket(r) for r in rows]
+
+    async def insert_ticket(self, doc: dict) -> bool:
+        try:
+            cur = await self._run(self._write,
+                                  "INSERT INTO tickets (guild_id, user_id, channel_id, status, created_at, "
+                                  "closed_at, transcript) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                  (doc["guild_id"], doc["user_id"], doc["channel_id"], doc["status"],
+                                   _ts(doc["created_at"]), _ts(doc["closed_at"]), json.dumps(doc["transcript"])))
+        except sqlite3.IntegrityError:
+            return False
+        doc["_id"] = cur.lastrowid
+        return True
+
+    async def delete_ticket(self, ticket_id):
+        await self._run(self._write, "DELETE FROM tickets WHERE id = ?", (ticket_id,))
+
+    async def set_ticket_channel(self, ticket_id, channel_id: int):
+        await self._run(self._write, "UPDATE tickets SET channel_id = ? WHERE id = ?", (channel_id, ticket_id))
+
+    async def close_ticket(self, ticket_id, closed_at: datetime, transcript: list[str]):
+        await self._run(self._write,
+                        "UPDATE tickets SET status = 'closed', closed_at = ?, transcript = ? WHERE id = ?",
+                        (_ts(closed_at), json.dumps(transcript), ticket_id))
+
+    async def search_tickets(self, guild_id: int, query: str, user_id: int | None, since: datetime | None,
+                             until: datetime | None, skip: int, limit: int) -> tuple[list[dict], int]:
+        # No text index here: every word must appear, "-word" must not; newest first
+        where, params = ["guild_id = ?", "status = 'closed'"], [str(guild_id)]
+        for term in query.replace('"', " ").lower().split():
+            negate = term.startswith("-")
+            term = term.lstrip("-")
+            if term:
+                where.append(f"instr(lower(transcript), ?) {'=' if negate else '>'} 0")
+                params.append(term)
+        if user_id:
+            where.append("user_id = ?")
+            params.append(str(user_id))
+        if since:
+            where.append("closed_at >= ?")
+            params.append(_ts(since))
+        if until:
+            where.append("closed_at < ?")
+            params.append(_ts(until))
+        clause = " AND ".join(where)
+        total = (await self._run(self._query, f"SELECT COUNT(*) FROM tickets WHERE {clause}", params))[0][0]
+        rows = await self._run(self._query,
+                               f"SELECT * FROM tickets WHERE {clause} ORDER BY closed_at DESC LIMIT ? OFFSET ?",
+                               params + [limit, skip])
+        return [_ticket(r) for r in rows], total
+
+    # ── Guild settings ────────────────────────────────────────────────────
+    @staticmethod
+    def _settings_doc(row) -> dict:
+        return {"guild_id": int(row["guild_id"]), "settings": json.loads(row["settings"]),
+                "settings_version": row["settings_version"]}
+
+    async def guild_settings(self, guild_ids: list[int] | None = None) -> list[dict]:
+        if guild_ids is None:
+            rows = await self._run(self._query, "SELECT * FROM guilds")
+        else:
+            marks = ", ".join("?" * len(guild_ids))
+            rows = await self._run(self._query, f"SELECT * FROM guilds WHERE guild_id IN ({marks})",
+                                   [str(g) for g in guild_ids])
+        return [self._settings_doc(r) for r in rows]
+
+    async def guild_settings_versions(self) -> dict[int, int]:
+        rows = await self._run(self._query, "SELECT guild_id, settings_version FROM guilds")
+        return {int(r["guild_id"]): r["settings_version"] for r in rows}
+
+    def _write_settings(self, guild_id: str, set: dict, unset: list[str]) -> dict:
+        with self._conn:
+            row = self._conn.execute("SELECT * FROM guilds WHERE guild_id = ?", (guild_id,)).fetchone()
+            settings = json.loads(row["settings"]) if row else {}
+            settings.update(set)
+            for key in unset:
+                settings.pop(key, None)
+            version = (row["settings_version"] if row else 0) + 1
+            self._conn.execute(
+                "INSERT INTO guilds (guild_id, settings, settings_version) VALUES (?, ?, ?) "
+                "ON CONFLICT (guild_id) DO UPDATE SET settings = excluded.settings, "
+                "settings_version = excluded.settings_version",
+                (guild_id, json.dumps(settings), version),
+            )
+        return {"guild_id": int(guild_id), "settings": settings, "settings_version": version}
+
+    async def write_guild_settings(self, guild_id: int, set: dict, unset: list[str]) -> dict:
+        return await self._run(self._write_settings, str(guild_id), set, unset)
@@ -0,0 +1,142 @@
+# models/storage.py — Storage interface for users (leveling), warnings, giveaways,
+#                     tickets and guild settings.
+#
+# Services for those features talk to a Storage object (bot.store) instead of raw
+# collections, so they run on MongoDB or on an embedded SQLite file. Documents go
+# in and come out shaped like the MongoDB documents: int Discord IDs (payloads such
+# as giveaway entries hold strings), datetimes as datetime, "_id" as the record's
+# primary key. Until models/id_schema.py's migration finishes, MongoDB can still
+# return string IDs from older documents.
+# The economy (ledger, shop, inventory, bulk adjustments) and the role panels
+# stay MongoDB-only: bot.py doesn't load those cogs on SQLite.
+
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+import config
+
+
+class Storage(ABC):
+    """Backend-neutral data access. See MongoStorage and SQLiteStorage."""
+
+    async def open(self):
+        """Connect and create indexes/tables."""
+
+    async def close(self):
+        """Release connections."""
+
+    # ── Users (leveling) ──────────────────────────────────────────────────
+    @abstractmethod
+    async def get_user(self, user_id: int, guild_id: int, *fields: str) -> dict:
+        """Fetch a user, creating it with defaults if missing. Fields limit what is loaded."""
+
+    @abstractmethod
+    async def record_xp(self, user_id: int, guild_id: int, xp: int, level: int, at: datetime):
+        """Store XP gained from a message: new totals, cooldown start, +1 message."""
+
+    @abstractmethod
+    async def set_xp(self, user_id: int, guild_id: int, xp: int, level: int):
+        ...
+
+    @abstractmethod
+    async def reset_xp(self, user_id: int, guild_id: int):
+        """Zero XP, level and message count."""
+
+    @abstractmethod
+    async def xp_rank(self, guild_id: int, xp: int) -> int:
+        """1-based rank of a member with `xp` in the guild. May be slightly stale."""
+
+    @abstractmethod
+    async def xp_leaderboard(self, guild_id: int, limit: int = 10) -> list[dict]:
+        """May be slightly stale."""
+
+    # ── Warnings ──────────────────────────────────────────────────────────
+    @abstractmethod
+    async def add_warning(self, doc: dict):
+        ...
+
+    @abstractmethod
+    async def get_warnings(self, user_id: int, guild_id: int, limit: int = 50,
+                           stale_ok: bool = False) -> list[dict]:
+        """Newest first. `stale_ok` allows a slightly stale answer (e.g. from a secondary)."""
+
+    @abstractmethod
+    async def clear_warnings(self, user_id: int, guild_id: int) -> int:
+        """Delete a member's warnings; returns how many there were."""
+
+    # ── Giveaways ─────────────────────────────────────────────────────────
+    @abstractmethod
+    async def insert_giveaway(self, doc: dict):
+        """Insert a giveaway and set doc["_id"]."""
+
+    @abstractmethod
+    async def get_giveaway(self, giveaway_id) -> dict | None:
+        ...
+
+    @abstractmethod
+    async def find_giveaway(self, guild_id: int, message_id: int, ended: bool | None = None) -> dict | None:
+        ...
+
+    @abstractmethod
+    async def toggle_giveaway_entry(self, giveaway_id, user_id: str) -> dict | None:
+        """Atomically add or remove an entry on a running giveaway. Returns it afterwards."""
+
+    @abstractmethod
+    async def due_giveaways(self, now: datetime) -> list[dict]:
+        """Running giveaways whose end time has passed."""
+
+    @abstractmethod
+    async def active_giveaways(self, guild_id: int, limit: int = 20) -> list[dict]:
+        """May be slightly stale."""
+
+    @abstractmethod
+    async def finish_giveaway(self, giveaway_id, winners: list[str]):
+        ...
+
+    # ── Tickets ───────────────────────────────────────────────────────────
+    @abstractmethod
+    async def open_tickets(self) -> list[dict]:
+        ...
+
+    @abstractmethod
+    async def insert_ticket(self, doc: dict) -> bool:
+        """Insert an open ticket and set doc["_id"]. False if the user already has one open."""
+
+    @abstractmethod
+    async def delete_ticket(self, ticket_id):
+        ...
+
+    @abstractmethod
+    async def set_ticket_channel(self, ticket_id, channel_id: int):
+        ...
+
+    @abstractmethod
+    async def close_ticket(self, ticket_id, closed_at: datetime, transcript: list[str]):
+        ...
+
+    @abstractmethod
+    async def search_tickets(self, guild_id: int, query: str, user_id: int | None, since: datetime | None,
+                             until: datetime | None, skip: int, limit: int) -> tuple[list[dict], int]:
+        """Closed tickets matching `query`, best match first. Returns (page, total)."""
+
+    # ── Guild settings ────────────────────────────────────────────────────
+    @abstractmethod
+    async def guild_settings(self, guild_ids: list[int] | None = None) -> list[dict]:
+        """{guild_id, settings, settings_version} for guilds with settings (or just `guild_ids`)."""
+
+    @abstractmethod
+    async def guild_settings_versions(self) -> dict[int, int]:
+        ...
+
+    @abstractmethod
+    async def write_guild_settings(self, guild_id: int, set: dict, unset: list[str]) -> dict:
+        """Change settings overrides, bump settings_version, return the new settings doc."""
+
+
+def open_storage(db=None) -> Storage:
+    """The backend chosen by STORAGE_BACKEND. `db` is the MongoDB database for "mongo"."""
+    if config.STORAGE_BACKEND == "sqlite":
+        from models.sqlite_storage import SQLiteStorage
+        return SQLiteStorage(config.SQLITE_PATH)
+    from models.mongo_storage import MongoStorage
+    return MongoStorage(db)
@@ -1,13 +1,46 @@
-# models/user_model.py — Helper functions for the users collection.
+# models/user_model.py — Defaults, keys and lookups for the users collection.
+#
+# Schema v2: a user's _id is {"guild_id": int64, "user_id": int64}, so the
+# primary key index is the (guild, user) lookup index. guild_id and user_id are
+# also kept as top-level int64 fields for the guild-scoped leaderboard indexes.
+# v1 documents (ObjectId _id, string IDs) are moved over by migrate_to_v2(); until
+# that finishes, every lookup and write moves the user it touches first.
 
+import asyncio
+import logging
+import time
+from collections import defaultdict
 from datetime import datetime
 
+from pymongo import ASCENDING, DESCENDING, DeleteOne, IndexModel, ReturnDocument, UpdateOne
+from pymongo.errors import OperationFailure
 
-def default_user(user_id: str, guild_id: str) -> dict:
-    """Returns a fresh user document with all default values."""
+from models.database import aggregate
+
+log = logging.getLogger("bot.users")
+
+MIGRATION_BATCH = 1000          # v1 documents moved per background batch
+MIGRATION_PAUSE_SECONDS = 0.5   # Breather between batches so live traffic isn't starved
+MIGRATION_RECHECK_SECONDS = 60  # How often processes not running the migration check if it finished
+
+# No (guild_id, user_id) index: that pair is the _id
+INDEXES = {
+    "users": [
+        IndexModel([("guild_id", ASCENDING), ("xp", DESCENDING)]),          # XP leaderboard, rank
+        IndexModel([("guild_id", ASCENDING), ("balance", DESCENDING)]),     # /baltop
+        IndexModel([("guild_id", ASCENDING), ("bank", DESCENDING)]),
+        IndexModel([("guild_id", ASCENDING), ("net_worth", DESCENDING)]),
+        IndexModel([("guild_id", ASCENDING), ("_id", ASCENDING)]),          # Chunked bulk adjustments
+        IndexModel([("daily_chat_reset", ASCENDING)]),                      # Chat-coin counters at startup
+    ],
+}
+
+
+def default_user(user_id: int, guild_id: int) -> dict:
+    """Returns a fresh user document with all default values (the _id comes from user_key)."""
     return {
-        "user_id": user_id,
-        "guild_id": guild_id,
+        "user_id": int(user_id),
+        "guild_id": int(guild_id),
         # Leveling
         "xp": 0,
         "level": 0,
@@ -16,23 +49,260 @@ def default_user(user_id: str, guild_id: str) -> dict:
         # Economy
         "balance": 0,
         "bank": 0,
+        "net_worth": 0,        # balance + bank, maintained with every change
         "last_daily": None,
         "last_work": None,
         "daily_chat_coins": 0,
         "daily_chat_reset": datetime.utcnow().date().isoformat(),
-        # Inventory
-        "inventory": [],
         # Meta
         "created_at": datetime.utcnow(),
     }
 
 
-async def get_or_create_user(db, user_id: int, guild_id: int) -> dict:
-    """Fetch a user document, creating it with defaults if it doesn't exist."""
-    uid, gid = str(user_id), str(guild_id)
-    user = await db.users.find_one({"user_id": uid, "guild_id": gid})
-    if not user:
-        doc = default_user(uid, gid)
-        await db.users.insert_one(doc)
-        user = await db.users.find_one({"user_id": uid, "guild_id": gid})
-    return user
+def user_key(user_id: int, guild_id: int) -> dict:
+    """Filter for one user's document. Field order matters: it is an _id match."""
+    return {"_id": {"guild_id": int(guild_id), "user_id": int(user_id)}}
+
+
+def with_defaults(update: dict, user_id: int, guild_id: int) -> dict:
+    """
+    An upsert on user_key() only inserts the _id and the fields the update
+    touches. Add a $setOnInsert of every other default field, so a new user gets
+    a complete document (with the top-level IDs the guild indexes need).
+    """
+    touched = {path.split(".")[0] for fields in update.values() for path in fields}
+    defaults = {k: v for k, v in default_user(user_id, guild_id).items() if k not in touched}
+    return {**update, "$setOnInsert": defaults}
+
+
+def fill_defaults(user_id: int, guild_id: int) -> dict:
+    """with_defaults() for a pipeline update: a stage setting each missing field to its default."""
+    return {"$set": {
+        k: {"$ifNull": [f"${k}", {"$literal": v}]}
+        for k, v in default_user(user_id, guild_id).items()
+    }}
+
+
+# ── Schema v1 → v2 transition ──────────────────────────────────────────────
+
+_migrating = True   # Until load_schema_state() finds the migration finished
+
+
+def migration_pending() -> bool:
+    return _migrating
+
+
+def guild_filter(guild_id: int) -> dict:
+    """Filter for all users of a guild, matching v1 documents too while migrating."""
+    if _migrating:
+        return {"guild_id": {"$in": [int(guild_id), str(guild_id)]}}
+    return {"guild_id": int(guild_id)}
+
+
+def _to_v2(doc: dict) -> dict:
+    doc = {k: v for k, v in doc.items() if k != "_id"}
+    doc["user_id"], doc["guild_id"] = int(doc["user_id"]), int(doc["guild_id"])
+    return doc
+
+
+async def _move_docs(db, docs: list[dict]):
+    """
+    Copy v1 documents to their v2 key, then delete the originals. Nothing writes
+    to v1 documents any more, so the copy can't miss an update, and $setOnInsert
+    leaves a v2 document that already exists untouched.
+    """
+    if not docs:
+        return
+    await db.users.bulk_write([
+        UpdateOne(user_key(d["user_id"], d["guild_id"]), {"$setOnInsert": _to_v2(d)}, upsert=True)
+        for d in docs
+    ], ordered=False)
+    await db.users.bulk_write([DeleteOne({"_id": d["_id"]}) for d in docs], ordered=False)
+
+
+async def ensure_migrated(db, pairs):
+    """Move the given (user_id, guild_id) pairs to v2 if they are still v1. No I/O once migrated."""
+    if not _migrating:
+        return
+    by_guild = defaultdict(list)
+    for user_id, guild_id in pairs:
+        by_guild[str(guild_id)].append(str(user_id))
+    for gid, uids in by_guild.items():
+        docs = await db.users.find({"guild_id": gid, "user_id": {"$in": uids}}).to_list(length=None)
+        await _move_docs(db, docs)
+
+
+async def user_filter(db, user_id: int, guild_id: int) -> dict:
+    """user_key() for a write, making sure the user has been migrated first."""
+    await ensure_migrated(db, [(user_id, guild_id)])
+    return user_key(user_id, guild_id)
+
+
+async def load_schema_state(db):
+    """Read whether the v2 migration has finished. Called once at startup."""
+    global _migrating
+    meta = await db.meta.find_one({"_id": "users_schema"})
+    _migrating = not meta or meta.get("version", 1) < 2
+
+
+async def watch_schema_state(db):
+    """
+    For processes that don't run migrate_to_v2(): re-read the schema state until
+    the migrating process records v2, then drop the dual-read shim here too.
+    """
+    while _migrating:
+        await asyncio.sleep(MIGRATION_RECHECK_SECONDS)
+        await load_schema_state(db)
+    log.info("Users v2 migration finished elsewhere; dual reads off")
+
+
+async def repair_partial_users(db):
+    """
+    Complete v2 documents that earlier upserts created with only the fields they
+    wrote (no top-level IDs, so invisible to the guild indexes). Runs once.
+    """
+    if await db.meta.find_one({"_id": "partial_users_repair"}):
+        return
+    result = await db.users.update_many(
+        {"user_id": {"$exists": False}, "_id.user_id": {"$exists": True}},
+        [{"$set": {"user_id": "$_id.user_id", "guild_id": "$_id.guild_id"}},
+         fill_defaults(0, 0)],   # IDs are set by the first stage, so the 0s never apply
+    )
+    await db.meta.update_one({"_id": "partial_users_repair"}, {"$set": {"done": True}}, upsert=True)
+    if result.modified_count:
+        log.info(f"Completed {result.modified_count} partial user document(s)")
+
+
+async def _measure(db, key_of) -> dict:
+    """Index size and median single-user lookup latency, for the migration log."""
+    stats = await db.command("collStats", "users")
+    sample = await aggregate(db.users, [{"$sample": {"size": 50}}], length=50)
+    timings = []
+    for doc in sample:
+        start = time.perf_counter()
+        await db.users.find_one(key_of(doc), projection={"_id": 1})
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "docs": stats.get("count", 0),
+        "index_bytes": stats.get("totalIndexSize", 0),
+        "index_sizes": stats.get("indexSizes", {}),
+        "lookup_ms_p50": round(timings[len(timings) // 2], 3) if timings else None,
+    }
+
+
+async def migrate_to_v2(db):
+    """
+    Move every v1 user document to v2 in batches, then drop the old
+    (user_id, guild_id) index. Safe to run while the bot is live and to resume.
+    """
+    global _migrating
+    if not _migrating:
+        return
+    before = await _measure(db, lambda d: {"user_id": d["user_id"], "guild_id": d["guild_id"]})
+    log.info(f"Users v2 migration starting: {before}")
+
+    moved = 0
+    while True:
+        docs = await db.users.find(
+            {"user_id": {"$type": "string"}}, limit=MIGRATION_BATCH,
+        ).to_list(length=MIGRATION_BATCH)
+        if not docs:
+            break
+        await _move_docs(db, docs)
+        moved += len(docs)
+        await asyncio.sleep(MIGRATION_PAUSE_SECONDS)
+
+    try:
+        await db.users.drop_index("user_id_1_guild_id_1")
+    except OperationFailure as e:
+        if e.code != 27:   # IndexNotFound: already dropped (e.g. by another instance)
+            raise
+    after = await _measure(db, lambda d: {"_id": d["_id"]})
+    await db.meta.update_one(
+        {"_id": "users_schema"},
+        {"$set": {"version": 2, "migrated": moved, "before": before, "after": after,
+                  "finished_at": datetime.utcnow()}},
+        upsert=True,
+    )
+    _migrating = False
+    log.info(f"Users v2 migration finished, {moved} document(s) moved: {after}")
+
+
+# ── Repository ─────────────────────────────────────────────────────────────
+# get_user() calls made in the same event-loop tick are answered together: the
+# same (guild, user) is fetched once however many callers ask, and the whole
+# batch is a single _id $in query. Missing users are created with a
+# $setOnInsert upsert. Callers share the returned dict, so treat it as read-only.
+
+class _UserLoader:
+    __slots__ = ("db", "pending", "fields", "scheduled")
+
+    def __init__(self, db):
+        self.db = db
+        self.pending: dict[tuple[int, int], asyncio.Future] = {}
+        self.fields: set[str] | None = set()
+        self.scheduled = False
+
+    def load(self, uid: int, gid: int, fields: tuple[str, ...]) -> asyncio.Future:
+        if not self.pending:
+            self.fields = set()
+        # One projection per batch: the union of what every caller asked for
+        if not fields:
+            self.fields = None
+        elif self.fields is not None:
+            self.fields.update(fields)
+
+        future = self.pending.get((uid, gid))
+        if future is None:
+            future = self.pending[(uid, gid)] = asyncio.get_running_loop().create_future()
+        if not self.scheduled:
+            self.scheduled = True
+            # Runs after everything already scheduled for this tick has had its say
+            asyncio.create_task(self.dispatch())
+        return future
+
+    async def dispatch(self):
+        batch, self.pending, self.scheduled = self.pending, {}, False
+        # Captured before the first await; later calls start a new batch
+        projection = None
+        if self.fields is not None:
+            projection = dict.fromkeys(self.fields, 1) | {"user_id": 1, "guild_id": 1}
+
+        docs = {}
+        try:
+            await ensure_migrated(self.db, batch)   # Dual-read shim: no-op after the migration
+            keys = [user_key(uid, gid)["_id"] for uid, gid in batch]
+            query = {"_id": keys[0] if len(keys) == 1 else {"$in": keys}}
+            async for doc in self.db.users.find(query, projection=projection):
+                docs[(doc["_id"]["user_id"], doc["_id"]["guild_id"])] = doc
+            for uid, gid in batch.keys() - docs.keys():
+                docs[(uid, gid)] = await self.db.users.find_one_and_update(
+                    user_key(uid, gid),
+                    {"$setOnInsert": default_user(uid, gid)},
+                    projection=projection,
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER,
+                )
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(docs[key])
+
+
+_loaders: dict[int, _UserLoader] = {}
+
+
+async def get_user(db, user_id: int, guild_id: int, *fields: str) -> dict:
+    """
+    Fetch a user document, creating it with defaults if it doesn't exist.
+    Pass field names to load only those, e.g. get_user(db, uid, gid, "xp", "level").
+    """
+    loader = _loaders.get(id(db))
+    if loader is None:
+        loader = _loaders[id(db)] = _UserLoader(db)
+    return await loader.load(int(user_id), int(guild_id), fields)
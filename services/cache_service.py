@@ -0,0 +1,179 @@
+# services/cache_service.py — Counters, rate limits and cache invalidation shared
+#                             between bot processes.
+#
+# With CACHE_BACKEND = "memory" everything lives in this process, which is all a
+# single process needs. With "redis" the same calls go to a Redis server, so
+# several processes (clusters, replicas) count and rate-limit together and hear
+# each other's invalidations. Callers use the shared_cache singleton either way.
+
+import asyncio
+import logging
+import secrets
+import time
+from collections import defaultdict, deque
+
+import config
+
+log = logging.getLogger("bot.cache")
+
+KEY_PREFIX = "bot:"
+_SWEEP_EVERY = 1000   # Memory backend: drop expired keys every N calls
+_RESUBSCRIBE_SECONDS = 5   # Redis backend: pause before resubscribing after a lost connection
+
+
+class _MemoryBackend:
+    def __init__(self):
+        self.counters: dict[str, tuple[int, float]] = {}   # {key: (value, expires_at)}
+        self.windows: dict[str, tuple[float, deque]] = {}   # {key: (window, hit times)}
+        self.calls = 0
+
+    def _sweep(self):
+        self.calls += 1
+        if self.calls % _SWEEP_EVERY:
+            return
+        now = time.monotonic()
+        for key in [k for k, (_, exp) in self.counters.items() if exp <= now]:
+            del self.counters[key]
+        for key in [k for k, (w, hits) in self.windows.items() if not hits or hits[-1] <= now - w]:
+            del self.windows[key]
+
+    async def incr(self, key: str, ttl: float) -> int:
+        self._sweep()
+        now = time.monotonic()
+        value, expires = self.counters.get(key, (0, 0.0))
+        if expires <= now:
+            value, expires = 0, now + ttl
+        self.counters[key] = (value + 1, expires)
+        return value + 1
+
+    async def window_hits(self, key: str, window: float) -> int:
+        self._sweep()
+        now = time.monotonic()
+        _, hits = self.windows.setdefault(key, (window, deque()))
+        hits.append(now)
+        while hits[0] <= now - window:
+            hits.popleft()
+        return len(hits)
+
+    async def publish(self, channel: str, message: str, dispatch):
+        dispatch(channel, message)
+
+    async def close(self):
+        pass
+
+
+class _RedisBackend:
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis   # Only needed for this backend
+        except ImportError:
+            raise RuntimeError('CACHE_BACKEND is "redis" but the redis package is missing: pip install redis') from None
+        self.redis = redis.from_url(url, decode_responses=True)
+        self.pubsub = self.redis.pubsub()
+        self.listener: asyncio.Task | None = None
+
+    async def incr(self, key: str, ttl: float) -> int:
+        # The TTL starts with the first increment, like the memory backend
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(key, 0, ex=max(1, round(ttl)), nx=True)
+            pipe.incr(key)
+            _, value = await pipe.execute()
+        return value
+
+    async def window_hits(self, key: str, window: float) -> int:
+        # Sorted set of hit times: trim, add, count in one MULTI
+        now = time.time()
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zremrangebyscore(key, 0, now - window)
+            pipe.zadd(key, {f"{now}:{secrets.token_hex(4)}": now})
+            pipe.zcard(key)
+            pipe.expire(key, max(1, round(window)) + 1)
+            _, _, count, _ = await pipe.execute()
+        return count
+
+    async def listen(self, channels: list[str], dispatch):
+        await self.pubsub.subscribe(*channels)
+        self.listener = asyncio.create_task(self._listen(channels, dispatch), name="cache pub/sub")
+        self.listener.add_done_callback(self._listener_done)
+
+    async def _listen(self, channels: list[str], dispatch):
+        # A dropped connection must not end cross-process invalidation for good:
+        # resubscribe on a fresh connection and carry on
+        while True:
+            try:
+                async for message in self.pubsub.listen():
+                    if message["type"] == "message":
+                        dispatch(message["channel"], message["data"])
+                return   # Closed by close()
+            except Exception as e:
+                log.warning(f"Cache pub/sub connection lost, resubscribing: {e}")
+            while True:
+                await asyncio.sleep(_RESUBSCRIBE_SECONDS)
+                try:
+                    await self.pubsub.aclose()
+                    self.pubsub = self.redis.pubsub()
+                    await self.pubsub.subscribe(*channels)
+                    break
+                except Exception as e:
+                    log.warning(f"Cache pub/sub resubscribe failed, retrying: {e}")
+            log.info("Cache pub/sub resubscribed")
+
+    @staticmethod
+    def _listener_done(task: asyncio.Task):
+        if not task.cancelled() and task.exception():
+            log.error("Cache pub/sub listener stopped; invalidations from other processes are lost",
+                      exc_info=task.exception())
+
+    async def publish(self, channel: str, message: str, dispatch):
+        await self.redis.publish(channel, message)   # Comes back to us through listen()
+
+    async def close(self):
+        if self.listener:
+            self.listener.cancel()
+        await self.pubsub.aclose()
+        await self.redis.aclose()
+
+
+class SharedCache:
+    def __init__(self):
+        self._backend = _MemoryBackend()
+        self._handlers: dict[str, list] = defaultdict(list)
+
+    async def connect(self):
+        """Switch to the configured backend. Called once at startup, before any traffic."""
+        if config.CACHE_BACKEND != "redis":
+            return
+        backend = _RedisBackend(config.REDIS_URL)
+        await backend.redis.ping()
+        await backend.listen([KEY_PREFIX + c for c in self._handlers], self._dispatch)
+        self._backend = backend
+        log.info("Shared cache: Redis")
+
+    async def close(self):
+        await self._backend.close()
+
+    async def incr(self, key: str, ttl: float) -> int:
+        """Atomically add 1 to a counter and return it. The counter resets `ttl` seconds after it started."""
+        return await self._backend.incr(KEY_PREFIX + key, ttl)
+
+    async def window_hits(self, key: str, window: float) -> int:
+        """Record a hit and return how many hits `key` had in the last `window` seconds (sliding)."""
+        return await self._backend.window_hits(KEY_PREFIX + key, window)
+
+    def subscribe(self, channel: str, handler):
+        """Call handler(message) for every message published on `channel`, by any process.
+        Subscribe at import time, before connect()."""
+        self._handlers[channel].append(handler)
+
+    async def publish(self, channel: str, message: str):
+        await self._backend.publish(KEY_PREFIX + channel, message, self._dispatch)
+
+    def _dispatch(self, channel: str, message: str):
+        for handler in self._handlers.get(channel.removeprefix(KEY_PREFIX), []):
+            try:
+                handler(message)
+            except Exception as e:
+                log.error(f"Cache handler for {channel} failed: {e}")
+
+
+shared_cache = SharedCache()
@@ -0,0 +1,87 @@
+# services/cluster_service.py — This process's share of the shards, and cross-cluster stats.
+#
+# cluster.py starts one bot process per shard range and tells it which shards it
+# runs through CLUSTER_ID / SHARD_IDS. All of a guild's events arrive on one
+# shard, so in-memory state keyed by guild (spam tracker, chat-coin counters,
+# open-ticket index, caches) is split between clusters without coordination.
+# Background jobs that scan shared collections must act only on guilds this
+# process owns (owns_guild()).
+#
+# Each cluster reports its server and user counts to the launcher, which relays
+# them to all the others, so /botinfo and the presence can show totals.
+
+import asyncio
+import json
+import logging
+import os
+
+import config
+
+log = logging.getLogger("bot.cluster")
+
+CLUSTER_ID = int(os.getenv("CLUSTER_ID", "0"))
+SHARD_IDS = [int(s) for s in os.getenv("SHARD_IDS", "").split(",") if s.strip()] or None
+IS_WORKER = "CLUSTER_ID" in os.environ   # Started by cluster.py
+
+_clusters: dict[int, dict] = {}   # {cluster_id: {"guilds", "users"}} last reported by other clusters
+
+
+def owns_guild(bot, guild_id: int) -> bool:
+    """Whether this process runs the shard that guild_id lives on."""
+    if not bot.shard_ids or not bot.shard_count:
+        return True   # All shards in this process
+    return (int(guild_id) >> 22) % bot.shard_count in bot.shard_ids
+
+
+def local_stats(bot) -> dict:
+    return {"guilds": len(bot.guilds), "users": sum(g.member_count or 0 for g in bot.guilds)}
+
+
+def totals(bot) -> dict:
+    """Servers, users and clusters across every cluster (this one counted live)."""
+    stats = local_stats(bot)
+    for cluster_id, other in _clusters.items():
+        if cluster_id != CLUSTER_ID:
+            stats["guilds"] += other["guilds"]
+            stats["users"] += other["users"]
+    stats["clusters"] = 1 + sum(1 for c in _clusters if c != CLUSTER_ID)
+    return stats
+
+
+async def _report(bot, writer: asyncio.StreamWriter):
+    while True:
+        message = {"cluster": CLUSTER_ID, **local_stats(bot)}
+        writer.write(json.dumps(message).encode() + b"\n")
+        await writer.drain()
+        await asyncio.sleep(config.CLUSTER_STATS_SECONDS)
+
+
+async def _listen(bot, reader: asyncio.StreamReader):
+    while line := await reader.readline():
+        message = json.loads(line)
+        cluster_id = message.pop("cluster")
+        if _clusters.get(cluster_id) != message:
+            _clusters[cluster_id] = message
+            await bot.update_presence()
+    raise ConnectionError("launcher closed the connection")
+
+
+async def run_ipc(bot):
+    """Share stats with the other clusters through the launcher. Reconnects if cut off."""
+    if not IS_WORKER:
+        return
+    await bot.wait_until_ready()
+    while not bot.is_closed():
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", config.CLUSTER_IPC_PORT)
+        except OSError:
+            await asyncio.sleep(5)
+            continue
+        jobs = [asyncio.create_task(_report(bot, writer)), asyncio.create_task(_listen(bot, reader))]
+        done, pending = await asyncio.wait(jobs, return_when=asyncio.FIRST_EXCEPTION)
+        for job in pending:
+            job.cancel()
+        writer.close()
+        for job in done:
+            log.warning(f"Cluster IPC connection lost: {job.exception()}")
+        await asyncio.sleep(5)
@@ -1,119 +1,200 @@
 # services/economy_service.py — All economy/currency logic.
 
+import asyncio
+import logging
 import random
-from datetime import datetime, date
+import time
+from datetime import datetime, date, timedelta
+
+from bson import ObjectId
+from pymongo import ASCENDING, IndexModel, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
 
 import config
-from models.user_model import get_or_create_user
+from models.database import stale_ok
+from models.id_schema import ensure_converted, snowflake
+from models.user_model import (
+    default_user, ensure_migrated, fill_defaults, get_user, guild_filter, migration_pending, user_filter,
+    user_key, with_defaults,
+)
+from services import inventory_service as inventory
+from services import ledger_service as ledger
+from services.cache_service import shared_cache
+from services.guild_config_service import get_settings
+
+log = logging.getLogger("bot.economy")
+
+INDEXES = {
+    "shop_stock": [IndexModel([("guild_id", ASCENDING), ("item_id", ASCENDING)], unique=True)],
+    "shop_purchases": [
+        IndexModel([("guild_id", ASCENDING), ("user_id", ASCENDING), ("item_id", ASCENDING)], unique=True),
+    ],
+    "guilds": [IndexModel([("shop_items.id", ASCENDING)], sparse=True)],   # Guilds with a shop
+}
+
+
+# net_worth (= balance + bank) is kept in the same update as every balance/bank
+# change, so /baltop can rank by total wealth straight off an index.
+
+async def backfill_net_worth(db):
+    """One-time: compute net_worth for users created before the field existed."""
+    if await db.meta.find_one({"_id": "net_worth_backfill"}):
+        return
+    result = await db.users.update_many(
+        {"net_worth": {"$exists": False}},
+        [{"$set": {"net_worth": {"$add": [{"$ifNull": ["$balance", 0]}, {"$ifNull": ["$bank", 0]}]}}}],
+    )
+    await db.meta.update_one({"_id": "net_worth_backfill"}, {"$set": {"done": True}}, upsert=True)
+    log.info(f"Backfilled net_worth on {result.modified_count} user(s).")
 
 
 async def get_balance(db, user_id: int, guild_id: int) -> dict:
-    user = await get_or_create_user(db, user_id, guild_id)
+    user = await get_user(db, user_id, guild_id, "balance", "bank")
     return {"balance": user["balance"], "bank": user["bank"]}
 
 
-async def add_coins(db, user_id: int, guild_id: int, amount: int):
+async def richest(db, guild_id: int, field: str = "net_worth", limit: int = 10) -> list[dict]:
+    """Top members by "net_worth", "balance" or "bank", richest first. May be slightly stale."""
+    cursor = stale_ok(db.users).find(guild_filter(guild_id), sort=[(field, -1)], limit=limit)
+    return await cursor.to_list(length=limit)
+
+
+async def add_coins(db, user_id: int, guild_id: int, amount: int,
+                    reason: str = "admin_add", ref: str | None = None):
     await db.users.update_one(
-        {"user_id": str(user_id), "guild_id": str(guild_id)},
-        {"$inc": {"balance": amount}},
+        await user_filter(db, user_id, guild_id),
+        with_defaults({"$inc": {"balance": amount, "net_worth": amount}}, user_id, guild_id),
         upsert=True,
     )
+    await ledger.record(db, guild_id, user_id, reason, balance=amount, ref=ref)
 
 
-async def remove_coins(db, user_id: int, guild_id: int, amount: int) -> bool:
-    """Remove coins from wallet. Returns False if insufficient funds."""
-    user = await get_or_create_user(db, user_id, guild_id)
-    if user["balance"] < amount:
-        return False
-    await db.users.update_one(
-        {"user_id": str(user_id), "guild_id": str(guild_id)},
-        {"$inc": {"balance": -amount}},
+async def remove_coins(db, user_id: int, guild_id: int, amount: int,
+                       reason: str = "admin_remove", ref: str | None = None) -> bool:
+    """Remove coins from wallet. Returns False if insufficient funds.
+    The balance check and the debit are one conditional update, so concurrent
+    debits can never take the wallet below zero."""
+    result = await db.users.update_one(
+        {**await user_filter(db, user_id, guild_id), "balance": {"$gte": amount}},
+        {"$inc": {"balance": -amount, "net_worth": -amount}},
     )
+    if not result.matched_count:
+        return False
+    await ledger.record(db, guild_id, user_id, reason, balance=-amount, ref=ref)
     return True
 
 
 async def set_coins(db, user_id: int, guild_id: int, amount: int):
-    await db.users.update_one(
-        {"user_id": str(user_id), "guild_id": str(guild_id)},
-        {"$set": {"balance": amount}},
+    before = await db.users.find_one_and_update(
+        await user_filter(db, user_id, guild_id),
+        [fill_defaults(user_id, guild_id), {"$set": {
+            "balance": amount,
+            "net_worth": {"$add": [amount, "$bank"]},
+        }}],
+        projection={"balance": 1},
         upsert=True,
+        return_document=ReturnDocument.BEFORE,
+    )
+    old = before.get("balance", 0) if before else 0
+    await ledger.record(db, guild_id, user_id, "admin_set", balance=amount - old)
+
+
+async def reset_economy(db, user_id: int, guild_id: int):
+    """Zero a member's wallet, bank and inventory."""
+    before = await db.users.find_one_and_update(
+        await user_filter(db, user_id, guild_id),
+        {"$set": {"balance": 0, "bank": 0, "net_worth": 0, "last_daily": None, "last_work": None}},
+        projection={"balance": 1, "bank": 1},
+        return_document=ReturnDocument.BEFORE,
     )
+    await inventory.clear(db, guild_id, user_id)
+    if before:
+        await ledger.record(db, guild_id, user_id, "admin_reset",
+                            balance=-before.get("balance", 0), bank=-before.get("bank", 0))
 
 
 async def deposit(db, user_id: int, guild_id: int, amount: int) -> tuple[bool, str]:
-    user = await get_or_create_user(db, user_id, guild_id)
     if amount <= 0:
         return False, "Amount must be positive."
-    if user["balance"] < amount:
-        return False, f"You only have {user['balance']} {config.CURRENCY_NAME} in your wallet."
-    await db.users.update_one(
-        {"user_id": str(user_id), "guild_id": str(guild_id)},
+    result = await db.users.update_one(
+        {**await user_filter(db, user_id, guild_id), "balance": {"$gte": amount}},
         {"$inc": {"balance": -amount, "bank": amount}},
     )
+    if not result.matched_count:
+        bal = await get_balance(db, user_id, guild_id)
+        return False, f"You only have {bal['balance']} {config.CURRENCY_NAME} in your wallet."
+    await ledger.record(db, guild_id, user_id, "deposit", balance=-amount, bank=amount)
     return True, f"Deposited {amount} {config.CURRENCY_NAME} into your bank."
 
 
 async def withdraw(db, user_id: int, guild_id: int, amount: int) -> tuple[bool, str]:
-    user = await get_or_create_user(db, user_id, guild_id)
     if amount <= 0:
         return False, "Amount must be positive."
-    if user["bank"] < amount:
-        return False, f"You only have {user['bank']} {config.CURRENCY_NAME} in your bank."
-    await db.users.update_one(
-        {"user_id": str(user_id), "guild_id": str(guild_id)},
+    result = await db.users.update_one(
+        {**await user_filter(db, user_id, guild_id), "bank": {"$gte": amount}},
         {"$inc": {"balance": amount, "bank": -amount}},
     )
+    if not result.matched_count:
+        bal = await get_balance(db, user_id, guild_id)
+        return False, f"You only have {bal['bank']} {config.CURRENCY_NAME} in your bank."
+    await ledger.record(db, guild_id, user_id, "withdraw", balance=amount, bank=-amount)
     return True, f"Withdrew {amount} {config.CURRENCY_NAME} from your bank."
 
 
 async def pay(db, sender_id: int, receiver_id: int, guild_id: int, amount: int) -> tuple[bool, str]:
     if amount <= 0:
         return False, "Amount must be positive."
-    sender = await get_or_create_user(db, sender_id, guild_id)
-    if sender["balance"] < amount:
-        return False, f"You only have {sender['balance']} {config.CURRENCY_NAME}."
-    await db.users.update_one(
-        {"user_id": str(sender_id), "guild_id": str(guild_id)},
-        {"$inc": {"balance": -amount}},
-    )
-    await db.users.update_one(
-        {"user_id": str(receiver_id), "guild_id": str(guild_id)},
-        {"$inc": {"balance": amount}},
-        upsert=True,
-    )
+    if not await remove_coins(db, sender_id, guild_id, amount, reason="pay_out", ref=str(receiver_id)):
+        bal = await get_balance(db, sender_id, guild_id)
+        return False, f"You only have {bal['balance']} {config.CURRENCY_NAME}."
+    try:
+        await add_coins(db, receiver_id, guild_id, amount, reason="pay_in", ref=str(sender_id))
+    except Exception:
+        # Credit failed — refund the sender so no coins are destroyed
+        await add_coins(db, sender_id, guild_id, amount, reason="refund", ref="pay")
+        raise
     return True, f"Paid {amount} {config.CURRENCY_NAME}."
 
 
 async def claim_daily(db, user_id: int, guild_id: int) -> tuple[bool, str, int]:
     """Returns (success, message, seconds_remaining)."""
-    user = await get_or_create_user(db, user_id, guild_id)
+    cfg = get_settings(guild_id)
+    user = await get_user(db, user_id, guild_id, "last_daily")
     now = datetime.utcnow()
     if user["last_daily"]:
         elapsed = (now - user["last_daily"]).total_seconds()
-        remaining = config.DAILY_COOLDOWN - elapsed
+        remaining = cfg.DAILY_COOLDOWN - elapsed
         if remaining > 0:
             hours, rem = divmod(int(remaining), 3600)
             mins = rem // 60
             return False, f"Come back in **{hours}h {mins}m**.", int(remaining)
-    await db.users.update_one(
-        {"user_id": str(user_id), "guild_id": str(guild_id)},
-        {"$inc": {"balance": config.DAILY_AMOUNT}, "$set": {"last_daily": now}},
-        upsert=True,
+    # Re-check the cooldown in the update itself so two quick clicks can't both claim
+    ready_since = now - timedelta(seconds=cfg.DAILY_COOLDOWN)
+    result = await db.users.update_one(
+        {
+            **user_key(user_id, guild_id),
+            "$or": [{"last_daily": None}, {"last_daily": {"$lte": ready_since}}],
+        },
+        {"$inc": {"balance": cfg.DAILY_AMOUNT, "net_worth": cfg.DAILY_AMOUNT}, "$set": {"last_daily": now}},
     )
-    return True, f"You claimed your daily **{config.DAILY_AMOUNT} {config.CURRENCY_NAME}**!", 0
+    if not result.matched_count:
+        return False, "You already claimed your daily reward.", cfg.DAILY_COOLDOWN
+    await ledger.record(db, guild_id, user_id, "daily", balance=cfg.DAILY_AMOUNT)
+    return True, f"You claimed your daily **{cfg.DAILY_AMOUNT} {config.CURRENCY_NAME}**!", 0
 
 
 async def do_work(db, user_id: int, guild_id: int) -> tuple[bool, str, int]:
     """Returns (success, message, seconds_remaining)."""
-    user = await get_or_create_user(db, user_id, guild_id)
+    cfg = get_settings(guild_id)
+    user = await get_user(db, user_id, guild_id, "last_work")
     now = datetime.utcnow()
     if user["last_work"]:
         elapsed = (now - user["last_work"]).total_seconds()
-        remaining = config.WORK_COOLDOWN - elapsed
+        remaining = cfg.WORK_COOLDOWN - elapsed
         if remaining > 0:
             mins = int(remaining // 60)
             return False, f"You're tired. Come back in **{mins}m**.", int(remaining)
-    earned = random.randint(config.WORK_MIN, config.WORK_MAX)
+    earned = random.randint(cfg.WORK_MIN, cfg.WORK_MAX)
     jobs = [
         f"You delivered pizzas and earned **{earned} {config.CURRENCY_NAME}**! 🍕",
         f"You coded all night and earned **{earned} {config.CURRENCY_NAME}**! 💻",
@@ -121,71 +202,456 @@ async def do_work(db, user_id: int, guild_id: int) -> tuple[bool, str, int]:
         f"You mined crypto and earned **{earned} {config.CURRENCY_NAME}**! ⛏️",
         f"You designed logos and earned **{earned} {config.CURRENCY_NAME}**! 🎨",
     ]
-    await db.users.update_one(
-        {"user_id": str(user_id), "guild_id": str(guild_id)},
-        {"$inc": {"balance": earned}, "$set": {"last_work": now}},
-        upsert=True,
+    ready_since = now - timedelta(seconds=cfg.WORK_COOLDOWN)
+    result = await db.users.update_one(
+        {
+            **user_key(user_id, guild_id),
+            "$or": [{"last_work": None}, {"last_work": {"$lte": ready_since}}],
+        },
+        {"$inc": {"balance": earned, "net_worth": earned}, "$set": {"last_work": now}},
     )
+    if not result.matched_count:
+        return False, "You're already working. Come back later.", cfg.WORK_COOLDOWN
+    await ledger.record(db, guild_id, user_id, "work", balance=earned)
     return True, random.choice(jobs), 0
 
 
+# ── Chat coins ─────────────────────────────────────────────────────────────
+# Today's chat-coin totals per (guild_id, user_id), kept in memory and reset in bulk
+# when the date changes. Capped users are turned away without touching the DB, and
+# grants are persisted in batches by flush_chat_coins().
+_chat_day: str = date.today().isoformat()
+_chat_today: dict[tuple[int, int], int] = {}
+_chat_pending: dict[tuple[int, int], int] = {}   # Granted but not yet written
+_chat_retry: list[tuple[dict, str, dict]] = []   # Failed writes (grants, day, totals), retried as they were
+
+
+async def load_chat_counters(db):
+    """Seed today's counters from the DB (after a restart). Called once at startup."""
+    global _chat_day
+    _chat_day = date.today().isoformat()
+    _chat_today.clear()
+    cursor = db.users.find(
+        {"daily_chat_reset": _chat_day, "daily_chat_coins": {"$gt": 0}},
+        projection={"guild_id": 1, "user_id": 1, "daily_chat_coins": 1},
+    )
+    async for user in cursor:
+        _chat_today[(int(user["guild_id"]), int(user["user_id"]))] = user["daily_chat_coins"]
+
+
 async def process_chat_coins(db, user_id: int, guild_id: int):
     """Award small coins per message with a daily cap."""
-    if not config.ECONOMY_ENABLED:
+    global _chat_day, _chat_today, _chat_pending
+    cfg = get_settings(guild_id)
+    if not cfg.ECONOMY_ENABLED:
         return
-    user = await get_or_create_user(db, user_id, guild_id)
+
+    # New day: swap in fresh tables and write out what is left of yesterday
     today = date.today().isoformat()
+    if today != _chat_day:
+        old = (_chat_pending, _chat_day, _chat_today)
+        _chat_day, _chat_today, _chat_pending = today, {}, {}
+        if old[0]:
+            _spawn(_write_chat_grants(db, *old))
+
+    key = (guild_id, user_id)
+    current = _chat_today.get(key, 0)
+    if current >= cfg.MAX_DAILY_CHAT_COINS:
+        return
+
+    earned = random.randint(cfg.CHAT_COINS_MIN, cfg.CHAT_COINS_MAX)
+    _chat_today[key] = current + earned
+    _chat_pending[key] = _chat_pending.get(key, 0) + earned
 
-    # Reset daily cap if it's a new day
-    updates = {}
-    if user.get("daily_chat_reset") != today:
-        updates["daily_chat_coins"] = 0
-        updates["daily_chat_reset"] = today
-        current_chat_coins = 0
-    else:
-        current_chat_coins = user.get("daily_chat_coins", 0)
 
-    if current_chat_coins >= config.MAX_DAILY_CHAT_COINS:
+async def flush_chat_coins(db):
+    """Persist buffered chat-coin grants with one bulk write (plus any earlier write that failed)."""
+    global _chat_pending
+    retries = _chat_retry[:]
+    _chat_retry.clear()
+    for batch in retries:
+        await _write_chat_grants(db, *batch)
+    if not _chat_pending:
         return
+    grants, _chat_pending = _chat_pending, {}
+    await _write_chat_grants(db, grants, _chat_day, _chat_today)
 
-    earned = random.randint(config.CHAT_COINS_MIN, config.CHAT_COINS_MAX)
-    updates_set = {"$inc": {"balance": earned, "daily_chat_coins": earned}}
-    if updates:
-        updates_set["$set"] = updates
 
-    await db.users.update_one(
-        {"user_id": str(user_id), "guild_id": str(guild_id)},
-        updates_set,
-        upsert=True,
+async def _write_chat_grants(db, grants: dict, day: str, totals: dict):
+    # Keep a failed batch for the next flush with its own day, rather than losing
+    # the coins or counting yesterday's grants against today's cap
+    def retry_later(e: Exception):
+        _chat_retry.append((grants, day, totals))
+        log.warning(f"Chat coin flush failed, {len(grants)} grant(s) will be retried: {e}")
+
+    try:
+        await ensure_migrated(db, [(uid, gid) for gid, uid in grants])
+    except Exception as e:
+        retry_later(e)
+        return
+    ops = []
+    for (gid, uid), coins in grants.items():
+        update = {"$inc": {"balance": coins, "net_worth": coins}}
+        # A past day's counter is dead once the date changes; writing it could
+        # overwrite today's
+        if day == _chat_day:
+            update["$set"] = {"daily_chat_coins": totals.get((gid, uid), coins), "daily_chat_reset": day}
+        ops.append(UpdateOne(user_key(uid, gid), with_defaults(update, uid, gid), upsert=True))
+    try:
+        await db.users.bulk_write(ops, ordered=False)
+    except Exception as e:
+        retry_later(e)
+        return
+    # One ledger entry per user per flush instead of one per message
+    for (gid, uid), coins in grants.items():
+        ledger.queue(gid, uid, "chat", balance=coins)
+
+
+# ── Economy-wide adjustments ───────────────────────────────────────────────
+# Interest, taxes and mass grants run as pipeline updates on the server — one
+# update_many per ECONOMY_BULK_CHUNK members instead of one round trip each.
+# Each update first stores its deltas in "_adj" (tagged with the adjustment ID)
+# and then applies them, so the ledger can pick up exactly what was changed.
+
+def _apply_pipeline(adj_id: ObjectId, balance_delta, bank_delta) -> list:
+    return [
+        {"$set": {"_adj": {"id": adj_id, "balance": balance_delta, "bank": bank_delta}}},
+        {"$set": {
+            "balance": {"$add": [{"$ifNull": ["$balance", 0]}, "$_adj.balance"]},
+            "bank": {"$add": [{"$ifNull": ["$bank", 0]}, "$_adj.bank"]},
+            "net_worth": {"$add": [{"$ifNull": ["$net_worth", 0]}, "$_adj.balance", "$_adj.bank"]},
+        }},
+    ]
+
+
+def _rate_delta(field: str, rate: float, cap: int | None):
+    """bank × rate (or wallet × rate), rounded toward zero and optionally capped."""
+    delta = {"$toLong": {"$trunc": {"$multiply": [f"${field}", rate]}}}
+    if cap is not None:
+        delta = {"$max": [-cap, {"$min": [cap, delta]}]}
+    return delta
+
+
+async def _update_in_chunks(db, guild_id: int, query: dict, pipeline: list):
+    """update_many over a guild's users in _id ranges of ECONOMY_BULK_CHUNK docs."""
+    base = {**guild_filter(guild_id), **query}
+    after = None
+    while True:
+        chunk_filter = dict(base)
+        if after is not None:
+            chunk_filter["_id"] = {"$gt": after}
+        # The last _id of this chunk, found off the (guild_id, _id) index
+        bound = await db.users.find(
+            chunk_filter, projection={"_id": 1}, sort=[("_id", 1)],
+            skip=config.ECONOMY_BULK_CHUNK - 1, limit=1,
+        ).to_list(length=1)
+        if bound:
+            chunk_filter["_id"] = {**chunk_filter.get("_id", {}), "$lte": bound[0]["_id"]}
+        await db.users.update_many(chunk_filter, pipeline)
+        if not bound:
+            return
+        after = bound[0]["_id"]
+
+
+async def apply_rate(db, guild_id: int, field: str, rate: float, cap: int | None = None,
+                     reason: str | None = None, by: int | None = None) -> dict:
+    """
+    Change every member's wallet or bank by `rate` (0.01 = +1%, -0.02 = -2%).
+    Positive rates on the bank are interest; negative rates are inflation control.
+    Returns the summary recorded in the ledger.
+    """
+    adj_id = ObjectId()
+    delta = _rate_delta(field, rate, cap)
+    pipeline = _apply_pipeline(
+        adj_id,
+        delta if field == "balance" else 0,
+        delta if field == "bank" else 0,
+    )
+    # Members with nothing in that account can't change, so they are skipped
+    await _update_in_chunks(db, guild_id, {field: {"$gt": 0}}, pipeline)
+    reason = reason or ("interest" if field == "bank" and rate > 0 else f"{field}_rate")
+    return await ledger.record_adjustment(db, guild_id, adj_id, reason, {
+        "field": field, "rate": rate, "cap": cap, "by": str(by) if by else None,
+    })
+
+
+async def grant_all(db, guild_id: int, amount: int, user_ids: list[int] | None = None,
+                    reason: str = "grant", by: int | None = None) -> dict:
+    """
+    Add `amount` to the wallet of every member in the guild, or of `user_ids`
+    (e.g. the members of a role). Returns the summary recorded in the ledger.
+    """
+    adj_id = ObjectId()
+    pipeline = _apply_pipeline(adj_id, amount, 0)
+    details = {"amount": amount, "by": str(by) if by else None}
+    if user_ids is None:
+        await _update_in_chunks(db, guild_id, {}, pipeline)
+        return await ledger.record_adjustment(db, guild_id, adj_id, reason, details)
+
+    chunk = config.ECONOMY_BULK_CHUNK
+    for i in range(0, len(user_ids), chunk):
+        uids = user_ids[i:i + chunk]
+        # Members who never chatted have no document yet — create them first
+        await db.users.bulk_write([
+            UpdateOne(user_key(uid, guild_id), {"$setOnInsert": default_user(uid, guild_id)}, upsert=True)
+            for uid in uids
+        ], ordered=False)
+        keys = [user_key(uid, guild_id)["_id"] for uid in uids]
+        await db.users.update_many({"_id": {"$in": keys}}, pipeline)
+    return await ledger.record_adjustment(db, guild_id, adj_id, reason, details)
+
+
+async def pay_scheduled_interest(db, guild_id: int) -> dict | None:
+    """
+    Pay BANK_INTEREST_BPS interest if it is due for this guild. The due check is
+    a conditional update on a meta document, so only one instance pays each period.
+    """
+    cfg = get_settings(guild_id)
+    if not cfg.ECONOMY_ENABLED or cfg.BANK_INTEREST_BPS <= 0 or migration_pending():
+        return None
+    now = datetime.utcnow()
+    # A few minutes of slack so loop jitter doesn't push a payout a whole period back
+    due_since = now - timedelta(hours=config.BANK_INTEREST_HOURS) + timedelta(minutes=5)
+    claim = await db.meta.find_one_and_update(
+        {"_id": f"interest:{guild_id}", "last_paid": {"$lte": due_since}},
+        {"$set": {"last_paid": now}},
+    )
+    if claim is None:
+        # Either not due yet, or this guild has never been paid
+        try:
+            await db.meta.insert_one({"_id": f"interest:{guild_id}", "last_paid": now})
+        except DuplicateKeyError:
+            return None
+    return await apply_rate(db, guild_id, "bank", cfg.BANK_INTEREST_BPS / 10_000, cfg.BANK_INTEREST_CAP)
+
+
+# ── Shop catalog cache ─────────────────────────────────────────────────────
+# {guild_id: (loaded_at, items, {item_id: item})}. Dropped whenever the catalog is
+# edited through the bot, in every process; SHOP_CACHE_SECONDS bounds staleness after manual DB edits.
+_shop_cache: dict[int, tuple[float, list, dict]] = {}
+
+
+def _cache_shop(guild_id: int, items: list):
+    _shop_cache[int(guild_id)] = (time.monotonic(), items, {i["id"]: i for i in items})
+
+
+def invalidate_shop(guild_id: int):
+    _shop_cache.pop(int(guild_id), None)
+
+
+# Other processes announce their shop edits here
+shared_cache.subscribe("shop", invalidate_shop)
+
+
+async def _shop_changed(guild_id: int):
+    invalidate_shop(guild_id)
+    await shared_cache.publish("shop", str(guild_id))
+
+
+def cached_shop(guild_id: int) -> list | None:
+    """Shop items straight from the cache (possibly stale), or None if not loaded.
+    Never touches the database, so it is safe for autocomplete."""
+    cached = _shop_cache.get(int(guild_id))
+    return cached[1] if cached else None
+
+
+async def load_shops(db):
+    """Warm the cache for every guild that has a shop. Called once at startup."""
+    cursor = db.guilds.find(
+        {"shop_items.id": {"$exists": True}},
+        projection={"guild_id": 1, "shop_items": 1},
     )
+    async for guild in cursor:
+        _cache_shop(guild["guild_id"], guild["shop_items"])
 
 
 async def get_shop(db, guild_id: int) -> list:
-    guild = await db.guilds.find_one({"guild_id": str(guild_id)})
-    if not guild:
-        return []
-    return guild.get("shop_items", [])
+    cached = _shop_cache.get(int(guild_id))
+    if cached and time.monotonic() - cached[0] < config.SHOP_CACHE_SECONDS:
+        return cached[1]
+    guild = await db.guilds.find_one({"guild_id": snowflake(guild_id)}, projection={"shop_items": 1})
+    items = guild.get("shop_items", []) if guild else []
+    _cache_shop(guild_id, items)
+    return items
+
+
+async def get_shop_item(db, guild_id: int, item_id: str) -> dict | None:
+    await get_shop(db, guild_id)
+    return _shop_cache[int(guild_id)][2].get(item_id)
+
+
+async def add_shop_item(db, guild_id: int, item: dict):
+    """Add an item to the shop, replacing any item with the same ID.
+    An item with "stock" (re)starts its stock counter at that number."""
+    query = {"guild_id": int(guild_id)}
+    await ensure_converted(db.guilds, query)
+    # Replace in place or append, one write either way, so a reader never sees the item missing
+    while True:
+        replaced = await db.guilds.update_one(
+            {**query, "shop_items.id": item["id"]}, {"$set": {"shop_items.$": item}},
+        )
+        if replaced.matched_count:
+            break
+        # $ne: if a concurrent add of the same ID got in first, this matches nothing
+        pushed = await db.guilds.update_one(
+            {**query, "shop_items.id": {"$ne": item["id"]}}, {"$push": {"shop_items": item}},
+        )
+        if pushed.matched_count:
+            break
+        # No guild document yet; if there is one after all, the next pass replaces the item
+        created = await db.guilds.update_one(query, {"$setOnInsert": {"shop_items": [item]}}, upsert=True)
+        if created.upserted_id is not None:
+            break
+    await set_stock(db, guild_id, item["id"], item.get("stock"))
+    await _shop_changed(guild_id)
+
+
+async def remove_shop_item(db, guild_id: int, item_id: str) -> bool:
+    result = await db.guilds.update_one(
+        {"guild_id": snowflake(guild_id)},
+        {"$pull": {"shop_items": {"id": item_id}}},
+    )
+    await set_stock(db, guild_id, item_id, None)
+    await _shop_changed(guild_id)
+    return result.modified_count > 0
+
+
+_background: set[asyncio.Task] = set()   # Referenced until done, so they aren't garbage-collected
+
+
+def _spawn(coro):
+    task = asyncio.create_task(coro)
+    _background.add(task)
+    task.add_done_callback(_background_done)
+
+
+def _background_done(task: asyncio.Task):
+    _background.discard(task)
+    if not task.cancelled() and task.exception():
+        log.error("Economy background job failed", exc_info=task.exception())
+
+
+_shop_refreshing: set[int] = set()   # Guilds with a background reload in flight
+
+
+def refresh_shop_soon(db, guild_id: int):
+    """Reload a guild's shop in the background if it is missing or stale.
+    One reload per guild at a time, however many autocomplete keystrokes ask."""
+    guild_id = int(guild_id)
+    cached = _shop_cache.get(guild_id)
+    if cached and time.monotonic() - cached[0] < config.SHOP_CACHE_SECONDS:
+        return
+    if guild_id in _shop_refreshing:
+        return
+    _shop_refreshing.add(guild_id)
+    _spawn(_refresh_shop(db, guild_id))
+
+
+async def _refresh_shop(db, guild_id: int):
+    try:
+        await get_shop(db, guild_id)
+    finally:
+        _shop_refreshing.discard(guild_id)
+
+
+# ── Limited stock and purchase limits ──────────────────────────────────────
+# Stock lives in shop_stock ({guild_id, item_id, remaining}), one small document per
+# limited item, so a launch-day rush contends on that document alone. Per-user
+# counts live in shop_purchases. Both are claimed with conditional updates before
+# the coins are taken, and handed back if a later step fails.
+
+async def set_stock(db, guild_id: int, item_id: str, stock: int | None):
+    """Set how many copies of an item are left. None removes the limit."""
+    if stock is None:
+        await db.shop_stock.delete_one({"guild_id": snowflake(guild_id), "item_id": item_id})
+    else:
+        query = {"guild_id": int(guild_id), "item_id": item_id}
+        await ensure_converted(db.shop_stock, query)
+        await db.shop_stock.update_one(query, {"$set": {"remaining": stock}}, upsert=True)
+
+
+async def get_stock(db, guild_id: int) -> dict[str, int]:
+    """{item_id: remaining} for a guild's limited items."""
+    cursor = db.shop_stock.find({"guild_id": snowflake(guild_id)}, projection={"item_id": 1, "remaining": 1})
+    return {doc["item_id"]: doc["remaining"] async for doc in cursor}
+
+
+async def _claim_stock(db, guild_id: int, item_id: str) -> bool:
+    result = await db.shop_stock.update_one(
+        {"guild_id": snowflake(guild_id), "item_id": item_id, "remaining": {"$gt": 0}},
+        {"$inc": {"remaining": -1}},
+    )
+    return result.modified_count > 0
+
+
+async def _release_stock(db, guild_id: int, item_id: str):
+    await db.shop_stock.update_one(
+        {"guild_id": snowflake(guild_id), "item_id": item_id},
+        {"$inc": {"remaining": 1}},
+    )
+
+
+async def _claim_purchase(db, user_id: int, guild_id: int, item_id: str, limit: int) -> bool:
+    # Upsert with a "below the limit" filter: a user at the limit doesn't match,
+    # so the upsert collides with the unique index instead of adding another.
+    query = {"guild_id": int(guild_id), "user_id": int(user_id), "item_id": item_id}
+    await ensure_converted(db.shop_purchases, query)
+    try:
+        await db.shop_purchases.update_one(
+            {**query, "count": {"$lt": limit}},
+            {"$inc": {"count": 1}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+async def _release_purchase(db, user_id: int, guild_id: int, item_id: str):
+    await db.shop_purchases.update_one(
+        {"guild_id": snowflake(guild_id), "user_id": snowflake(user_id), "item_id": item_id, "count": {"$gt": 0}},
+        {"$inc": {"count": -1}},
+    )
 
 
 async def buy_item(db, user_id: int, guild_id: int, item_id: str) -> tuple[bool, str]:
-    shop = await get_shop(db, guild_id)
-    item = next((i for i in shop if i["id"] == item_id), None)
+    item = await get_shop_item(db, guild_id, item_id)
     if not item:
         return False, "Item not found in the shop."
-    removed = await remove_coins(db, user_id, guild_id, item["price"])
+    limited = item.get("stock") is not None
+    per_user = item.get("per_user_limit")
+
+    # Cheapest rejection first: during a drop most buyers lose the race for stock
+    if limited and not await _claim_stock(db, guild_id, item["id"]):
+        return False, "Sold out!"
+    if per_user and not await _claim_purchase(db, user_id, guild_id, item["id"], per_user):
+        if limited:
+            await _release_stock(db, guild_id, item["id"])
+        return False, f"You can only buy **{item['name']}** {per_user} time(s)."
+
+    async def release_claims():
+        if limited:
+            await _release_stock(db, guild_id, item["id"])
+        if per_user:
+            await _release_purchase(db, user_id, guild_id, item["id"])
+
+    try:
+        removed = await remove_coins(db, user_id, guild_id, item["price"], reason="purchase", ref=item["id"])
+    except Exception:
+        await release_claims()
+        raise
     if not removed:
+        await release_claims()
         return False, f"You don't have enough {config.CURRENCY_NAME}."
 
-    inv_entry = {"item_id": item["id"], "name": item["name"], "type": item["type"]}
-    if item.get("duration_hours"):
-        from datetime import timedelta
-        inv_entry["expires"] = datetime.utcnow() + timedelta(hours=item["duration_hours"])
-    else:
-        inv_entry["expires"] = None
-
-    await db.users.update_one(
-        {"user_id": str(user_id), "guild_id": str(guild_id)},
-        {"$push": {"inventory": inv_entry}},
-        upsert=True,
-    )
+    duration = timedelta(hours=item["duration_hours"]) if item.get("duration_hours") else None
+    try:
+        await inventory.add_item(
+            db, guild_id, user_id, item["id"], item["name"], item["type"],
+            role_id=item.get("role_id"), duration=duration,
+        )
+    except Exception:
+        await add_coins(db, user_id, guild_id, item["price"], reason="refund", ref=item["id"])
+        await release_claims()
+        raise
     return True, item
@@ -26,15 +26,15 @@ def parse_duration(duration_str: str) -> datetime | None:
     return datetime.utcnow() + delta
 
 
-async def create_giveaway(db, guild_id: int, channel_id: int, message_id: int,
+async def create_giveaway(store, guild_id: int, channel_id: int, message_id: int,
                            prize: str, winners_count: int, ends_at: datetime,
                            required_role: int | None = None,
                            min_level: int = 0,
                            bonus_entries: dict | None = None) -> dict:
     doc = {
-        "guild_id": str(guild_id),
-        "channel_id": str(channel_id),
-        "message_id": str(message_id),
+        "guild_id": int(guild_id),
+        "channel_id": int(channel_id),
+        "message_id": int(message_id),
         "prize": prize,
         "winners_count": winners_count,
         "ends_at": ends_at,
@@ -45,25 +45,18 @@ async def create_giveaway(db, guild_id: int, channel_id: int, message_id: int,
         "entries": [],
         "winners": [],
     }
-    await db.giveaways.insert_one(doc)
+    await store.insert_giveaway(doc)
     return doc
 
 
-async def toggle_entry(db, giveaway_id, user_id: str) -> tuple[bool, str]:
-    """Add or remove a user from entries. Returns (entered, message)."""
-    giveaway = await db.giveaways.find_one({"_id": giveaway_id})
-    if not giveaway or giveaway["ended"]:
-        return False, "This giveaway has ended."
+async def toggle_entry(store, giveaway_id, user_id: str) -> tuple[bool, str, dict | None]:
+    """Add or remove a user from entries. Returns (entered, message, updated giveaway)."""
+    giveaway = await store.toggle_giveaway_entry(giveaway_id, user_id)
+    if not giveaway:
+        return False, "This giveaway has ended.", None
     if user_id in giveaway["entries"]:
-        await db.giveaways.update_one(
-            {"_id": giveaway_id}, {"$pull": {"entries": user_id}}
-        )
-        return False, "You've left the giveaway."
-    else:
-        await db.giveaways.update_one(
-            {"_id": giveaway_id}, {"$addToSet": {"entries": user_id}}
-        )
-        return True, "You've entered the giveaway!"
+        return True, "You've entered the giveaway!", giveaway
+    return False, "You've left the giveaway.", giveaway
 
 
 def pick_winners(giveaway: dict, member_roles: dict[str, list[str]], count: int | None = None) -> list[str]:
@@ -98,10 +91,8 @@ def pick_winners(giveaway: dict, member_roles: dict[str, list[str]], count: int
     return winners
 
 
-async def end_giveaway(db, giveaway: dict, guild: discord.Guild) -> list[str]:
+async def end_giveaway(store, giveaway: dict, guild: discord.Guild) -> list[str]:
     """Mark giveaway ended, pick winners, update embed, return winner IDs."""
-    from bson import ObjectId
-
     # Build role map for bonus entries
     member_roles: dict[str, list[str]] = {}
     for uid in giveaway["entries"]:
@@ -110,8 +101,5 @@ async def end_giveaway(db, giveaway: dict, guild: discord.Guild) -> list[str]:
             member_roles[uid] = [str(r.id) for r in member.roles]
 
     winners = pick_winners(giveaway, member_roles)
-    await db.giveaways.update_one(
-        {"_id": giveaway["_id"]},
-        {"$set": {"ended": True, "winners": winners}},
-    )
+    await store.finish_giveaway(giveaway["_id"], winners)
     return winners
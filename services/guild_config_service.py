@@ -0,0 +1,246 @@
+# services/guild_config_service.py — Per-guild settings with an in-process cache.
+#
+# Overrides live in the guild document under "settings" and fall back to the
+# defaults in config.py. Every change bumps "settings_version", which is how
+# other bot instances notice they need to reload a guild.
+
+import re
+
+import config
+
+
+# Setting name (as in config.py) → kind. The kind decides how values are parsed
+# and normalized: ID lists become frozensets for O(1) membership checks.
+SETTINGS: dict[str, str] = {
+    # Leveling
+    "XP_MIN_PER_MESSAGE": "int",
+    "XP_MAX_PER_MESSAGE": "int",
+    "XP_COOLDOWN_SECONDS": "int",
+    "XP_IGNORED_CHANNELS": "id_set",
+    "LEVEL_ROLES": "level_roles",
+    "STACK_LEVEL_ROLES": "bool",
+    "LEVEL_UP_CHANNEL": "id",
+    # Economy
+    "DAILY_AMOUNT": "int",
+    "DAILY_COOLDOWN": "int",
+    "WORK_MIN": "int",
+    "WORK_MAX": "int",
+    "WORK_COOLDOWN": "int",
+    "CHAT_COINS_MIN": "int",
+    "CHAT_COINS_MAX": "int",
+    "MAX_DAILY_CHAT_COINS": "int",
+    "BANK_INTEREST_BPS": "int",
+    "BANK_INTEREST_CAP": "int",
+    # Moderation
+    "MOD_LOG_CHANNEL": "id",
+    "JOIN_LOG_CHANNEL": "id",
+    "MSG_LOG_CHANNEL": "id",
+    "BLACKLISTED_WORDS": "words",
+    "ANTI_LINK_ENABLED": "bool",
+    "ANTI_SPAM_THRESHOLD": "int",
+    "STAFF_ROLE_IDS": "id_set",
+    # Tickets
+    "TICKET_CATEGORY_ID": "id",
+    "TICKET_STAFF_ROLE": "id",
+    "TICKET_LOG_CHANNEL": "id",
+    # Auto roles
+    "AUTO_JOIN_ROLE": "id",
+    # System toggles
+    "LEVELING_ENABLED": "bool",
+    "ECONOMY_ENABLED": "bool",
+    "GIVEAWAYS_ENABLED": "bool",
+    "TICKETS_ENABLED": "bool",
+    "MODERATION_ENABLED": "bool",
+    "AUTOROLES_ENABLED": "bool",
+}
+
+_ID_PATTERN = re.compile(r"\d{15,20}")
+
+# Allowed range of each "int" setting, inclusive
+BOUNDS: dict[str, tuple[int, int]] = {
+    "XP_MIN_PER_MESSAGE": (0, 10_000),
+    "XP_MAX_PER_MESSAGE": (0, 10_000),
+    "XP_COOLDOWN_SECONDS": (0, 86_400),
+    "DAILY_AMOUNT": (0, 1_000_000_000),
+    "DAILY_COOLDOWN": (0, 30 * 86_400),
+    "WORK_MIN": (0, 1_000_000_000),
+    "WORK_MAX": (0, 1_000_000_000),
+    "WORK_COOLDOWN": (0, 30 * 86_400),
+    "CHAT_COINS_MIN": (0, 1_000_000),
+    "CHAT_COINS_MAX": (0, 1_000_000),
+    "MAX_DAILY_CHAT_COINS": (0, 1_000_000_000),
+    "BANK_INTEREST_BPS": (0, 10_000),
+    "BANK_INTEREST_CAP": (0, 1_000_000_000),
+    "ANTI_SPAM_THRESHOLD": (2, 100),
+}
+
+# (min setting, max setting) pairs fed to random.randint, so min must not exceed max
+PAIRS = [
+    ("XP_MIN_PER_MESSAGE", "XP_MAX_PER_MESSAGE"),
+    ("WORK_MIN", "WORK_MAX"),
+    ("CHAT_COINS_MIN", "CHAT_COINS_MAX"),
+]
+
+
+def _normalize(kind: str, value):
+    """Convert a stored or default value to its in-memory form."""
+    if kind == "int":
+        return int(value)
+    if kind == "bool":
+        return bool(value)
+    if kind == "id":
+        return int(value) if value else None
+    if kind == "id_set":
+        return frozenset(int(v) for v in value or ())
+    if kind == "words":
+        return tuple(str(w).lower() for w in value or ())
+    if kind == "level_roles":
+        return {int(lvl): int(rid) for lvl, rid in (value or {}).items()}
+    raise ValueError(f"Unknown setting kind: {kind}")
+
+
+def _to_storage(kind: str, value):
+    """Convert a normalized value to something MongoDB can store."""
+    if kind == "id":
+        return str(value) if value else None
+    if kind == "id_set":
+        return [str(v) for v in sorted(value)]
+    if kind == "words":
+        return list(value)
+    if kind == "level_roles":
+        return {str(lvl): str(rid) for lvl, rid in value.items()}
+    return value
+
+
+class GuildSettings:
+    """One guild's effective settings. Attribute names match config.py."""
+    __slots__ = tuple(SETTINGS) + ("version", "overrides")
+
+    def __init__(self, overrides: dict, version: int = 0):
+        for name, kind in SETTINGS.items():
+            key = name.lower()
+            raw = overrides[key] if key in overrides else getattr(config, name)
+            setattr(self, name, _normalize(kind, raw))
+        self.version = version
+        self.overrides = frozenset(k.upper() for k in overrides if k.upper() in SETTINGS)
+
+
+_defaults: GuildSettings | None = None
+_cache: dict[int, GuildSettings] = {}
+
+
+def get_settings(guild_id: int) -> GuildSettings:
+    """Settings for a guild. Pure dict lookup — safe on hot paths."""
+    global _defaults
+    settings = _cache.get(guild_id)
+    if settings is not None:
+        return settings
+    if _defaults is None:
+        _defaults = GuildSettings({})
+    return _defaults
+
+
+def _cache_doc(doc: dict):
+    _cache[int(doc["guild_id"])] = GuildSettings(doc.get("settings") or {}, doc.get("settings_version", 0))
+
+
+async def load_all(store):
+    """Load every guild with overrides into the cache. Called once at startup."""
+    _cache.clear()
+    for doc in await store.guild_settings():
+        _cache_doc(doc)
+
+
+async def refresh(store):
+    """Reload guilds whose settings_version changed (e.g. edited by another instance)."""
+    stale = [
+        guild_id for guild_id, version in (await store.guild_settings_versions()).items()
+        if (cached := _cache.get(int(guild_id))) is None or cached.version != version
+    ]
+    if not stale:
+        return
+    for doc in await store.guild_settings(stale):
+        _cache_doc(doc)
+
+
+async def update_setting(store, guild_id: int, name: str, value):
+    """Store an override for one setting. `value` must already be normalized."""
+    kind = SETTINGS[name]
+    _cache_doc(await store.write_guild_settings(guild_id, {name.lower(): _to_storage(kind, value)}, []))
+
+
+async def reset_setting(store, guild_id: int, name: str):
+    """Drop an override so the setting falls back to config.py."""
+    _cache_doc(await store.write_guild_settings(guild_id, {}, [name.lower()]))
+
+
+def parse_setting(name: str, raw: str):
+    """Parse user input for a setting. Raises ValueError with a readable message."""
+    kind = SETTINGS[name]
+    raw = raw.strip()
+    if kind == "int":
+        try:
+            value = int(raw)
+        except ValueError:
+            raise ValueError("Expected a whole number.")
+        low, high = BOUNDS[name]
+        if not low <= value <= high:
+            raise ValueError(f"Expected a number from {low:,} to {high:,}.")
+        return value
+    if kind == "bool":
+        if raw.lower() in ("true", "yes", "on", "1", "enable", "enabled"):
+            return True
+        if raw.lower() in ("false", "no", "off", "0", "disable", "disabled"):
+            return False
+        raise ValueError("Expected `on` or `off`.")
+    if kind == "id":
+        if raw.lower() in ("none", "off", ""):
+            return None
+        match = _ID_PATTERN.search(raw)
+        if not match:
+            raise ValueError("Expected a channel/role mention or ID, or `none`.")
+        return int(match.group())
+    if kind == "id_set":
+        return frozenset(int(m) for m in _ID_PATTERN.findall(raw))
+    if kind == "words":
+        return tuple(w.strip().lower() for w in raw.split(",") if w.strip())
+    if kind == "level_roles":
+        roles = {}
+        for pair in filter(None, (p.strip() for p in raw.split(","))):
+            level, _, role = pair.partition(":")
+            match = _ID_PATTERN.search(role)
+            if not level.strip().isdigit() or not match:
+                raise ValueError("Expected `level:role` pairs, e.g. `5:@Regular, 10:@Veteran`.")
+            roles[int(level)] = int(match.group())
+        return roles
+    raise ValueError(f"Unknown setting kind: {kind}")
+
+
+def default_setting(name: str):
+    """The config.py value of a setting, normalized."""
+    return _normalize(SETTINGS[name], getattr(config, name))
+
+
+def check_setting(guild_id: int, name: str, value):
+    """Check a parsed value against the guild's other effective settings before
+    storing it. Raises ValueError with a readable message."""
+    current = get_settings(guild_id)
+    for low, high in PAIRS:
+        if name == low and value > getattr(current, high):
+            raise ValueError(f"**{low}** can't be above **{high}** ({getattr(current, high)}).")
+        if name == high and value < getattr(current, low):
+            raise ValueError(f"**{high}** can't be below **{low}** ({getattr(current, low)}).")
+
+
+def format_setting(name: str, value) -> str:
+    """Human-readable value for /config show."""
+    kind = SETTINGS[name]
+    if kind == "id":
+        return f"`{value}`" if value else "none"
+    if kind == "id_set":
+        return ", ".join(f"`{v}`" for v in sorted(value)) or "none"
+    if kind == "words":
+        return f"{len(value)} word(s)"
+    if kind == "level_roles":
+        return ", ".join(f"{lvl}→`{rid}`" for lvl, rid in sorted(value.items())) or "none"
+    return f"`{value}`"
@@ -0,0 +1,127 @@
+# services/inventory_service.py — Member inventories, one document per (guild, user, item).
+#
+# Buying or receiving an item again stacks onto the same document: quantity goes
+# up and a timed item's expiry is pushed back by another duration. Keeping this
+# out of the users collection keeps user documents small and fixed-size.
+
+import logging
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, IndexModel
+
+from models.database import aggregate
+from models.id_schema import ensure_converted, snowflake
+
+log = logging.getLogger("bot.inventory")
+
+INVENTORY_PAGE_SIZE = 10
+
+INDEXES = {
+    "inventory": [
+        # Also the $merge key of migrate_embedded_inventories(), so it must exist first
+        IndexModel([("guild_id", ASCENDING), ("user_id", ASCENDING), ("item_id", ASCENDING)], unique=True),
+        IndexModel([("expires", ASCENDING)]),   # take_expired()
+    ],
+}
+
+
+async def add_item(db, guild_id: int, user_id: int, item_id: str, name: str, type: str,
+                   role_id: str | None = None, duration: timedelta | None = None, quantity: int = 1):
+    """Give a member an item, stacking onto any copy they already hold."""
+    now = datetime.utcnow()
+    fields = {
+        "name": name,
+        "type": type,
+        "quantity": {"$add": [{"$ifNull": ["$quantity", 0]}, quantity]},
+        "acquired_at": {"$ifNull": ["$acquired_at", now]},
+    }
+    if role_id:
+        fields["role_id"] = str(role_id)
+    if duration:
+        # Extend from the current expiry if it is still running, otherwise from now
+        fields["expires"] = {"$add": [{"$max": ["$expires", now]}, int(duration.total_seconds() * 1000)]}
+    else:
+        fields["expires"] = None
+    query = {"guild_id": int(guild_id), "user_id": int(user_id), "item_id": item_id}
+    await ensure_converted(db.inventory, query)
+    await db.inventory.update_one(
+        query,
+        [{"$set": fields}],
+        upsert=True,
+    )
+
+
+async def get_page(db, guild_id: int, user_id: int, page: int = 1) -> tuple[list, int]:
+    """One page of a member's items (sorted by item ID) and their total item count."""
+    query = {"guild_id": snowflake(guild_id), "user_id": snowflake(user_id)}
+    total = await db.inventory.count_documents(query)
+    cursor = db.inventory.find(
+        query,
+        sort=[("item_id", 1)],
+        skip=(page - 1) * INVENTORY_PAGE_SIZE,
+        limit=INVENTORY_PAGE_SIZE,
+    )
+    return await cursor.to_list(length=INVENTORY_PAGE_SIZE), total
+
+
+async def clear(db, guild_id: int, user_id: int):
+    await db.inventory.delete_many({"guild_id": snowflake(guild_id), "user_id": snowflake(user_id)})
+
+
+async def take_expired(db, now: datetime, owned=None) -> list[dict]:
+    """
+    Remove and return items whose expiry has passed (found via the expires index).
+    Each delete re-checks the expiry, so an item renewed in the meantime stays.
+    `owned(guild_id)` limits this to guilds the caller handles (the rest are left
+    for the cluster that runs them).
+    """
+    expired = []
+    async for item in db.inventory.find({"expires": {"$lte": now}}):
+        if owned and not owned(item["guild_id"]):
+            continue
+        result = await db.inventory.delete_one({"_id": item["_id"], "expires": {"$lte": now}})
+        if result.deleted_count:
+            expired.append(item)
+    return expired
+
+
+async def migrate_embedded_inventories(db):
+    """
+    One-time: move the old users.inventory arrays into the inventory collection.
+    Duplicate entries are folded into a quantity, keeping the latest expiry.
+    """
+    if await db.meta.find_one({"_id": "inventory_migration"}):
+        return
+    await aggregate(db.users, [
+        {"$match": {"inventory.0": {"$exists": True}}},
+        {"$unwind": "$inventory"},
+        {"$group": {
+            "_id": {
+                "guild_id": {"$toLong": "$guild_id"},
+                "user_id": {"$toLong": "$user_id"},
+                "item_id": "$inventory.item_id",
+            },
+            "name": {"$last": "$inventory.name"},
+            "type": {"$last": "$inventory.type"},
+            "role_id": {"$max": "$inventory.role_id"},
+            "quantity": {"$sum": 1},
+            "expires": {"$max": "$inventory.expires"},
+        }},
+        {"$project": {
+            "_id": 0,
+            "guild_id": "$_id.guild_id",
+            "user_id": "$_id.user_id",
+            "item_id": "$_id.item_id",
+            "name": 1, "type": 1, "role_id": 1, "quantity": 1, "expires": 1,
+            "acquired_at": {"$literal": datetime.utcnow()},
+        }},
+        {"$merge": {
+            "into": "inventory",
+            "on": ["guild_id", "user_id", "item_id"],
+            "whenMatched": "keepExisting",
+            "whenNotMatched": "insert",
+        }},
+    ])
+    result = await db.users.update_many({"inventory": {"$exists": True}}, {"$unset": {"inventory": ""}})
+    await db.meta.update_one({"_id": "inventory_migration"}, {"$set": {"done": True}}, upsert=True)
+    log.info(f"Moved inventories of {result.modified_count} user(s) to the inventory collection.")
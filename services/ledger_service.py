@@ -0,0 +1,216 @@
+# services/ledger_service.py — Append-only economy ledger and balance snapshots.
+#
+# Every balance change is one entry: {guild_id, user_id, reason, balance, bank, ts}
+# where balance/bank are the deltas applied to the wallet and the bank.
+# Periodic compaction folds entries into per-user snapshots, so a balance at any
+# point in time is "latest snapshot before it + the entries after that snapshot".
+
+import logging
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import BulkWriteError
+
+from models.database import aggregate
+from models.id_schema import migration_pending, snowflake
+
+log = logging.getLogger("bot.ledger")
+
+INDEXES = {
+    "economy_ledger": [
+        IndexModel([("guild_id", ASCENDING), ("user_id", ASCENDING), ("ts", DESCENDING)]),
+        IndexModel([("ts", ASCENDING)]),      # Compaction window
+    ],
+    "economy_snapshots": [
+        IndexModel([("guild_id", ASCENDING), ("user_id", ASCENDING), ("at", DESCENDING)]),
+    ],
+}
+
+# Buffered entries from high-volume sources (chat coins), written by flush()
+_pending: list[dict] = []
+
+# Entries can reach the DB up to one flush interval late (and from other
+# instances), so compaction never folds in the most recent few minutes.
+COMPACTION_LAG = timedelta(minutes=5)
+
+
+def _entry(guild_id: int, user_id: int, reason: str, balance: int = 0, bank: int = 0,
+           ref: str | None = None) -> dict:
+    doc = {
+        "guild_id": int(guild_id),
+        "user_id": int(user_id),
+        "reason": reason,
+        "balance": balance,
+        "bank": bank,
+        "ts": datetime.utcnow(),
+    }
+    if ref:
+        doc["ref"] = ref
+    return doc
+
+
+async def record(db, guild_id: int, user_id: int, reason: str, balance: int = 0, bank: int = 0,
+                 ref: str | None = None):
+    """Write one ledger entry now."""
+    if balance or bank:
+        await db.economy_ledger.insert_one(_entry(guild_id, user_id, reason, balance, bank, ref))
+
+
+def queue(guild_id: int, user_id: int, reason: str, balance: int = 0, bank: int = 0):
+    """Buffer a ledger entry; it is written in bulk by the next flush()."""
+    if balance or bank:
+        _pending.append(_entry(guild_id, user_id, reason, balance, bank))
+
+
+async def flush(db):
+    """Write all buffered entries with a single insert_many."""
+    if not _pending:
+        return
+    batch = _pending[:]
+    _pending.clear()
+    try:
+        await db.economy_ledger.insert_many(batch, ordered=False)
+    except BulkWriteError as e:
+        # Entries already carry their _id, so a retried entry that did land shows
+        # up as a duplicate key — only re-queue the ones that really failed.
+        failed = {err["index"] for err in e.details.get("writeErrors", []) if err.get("code") != 11000}
+        _pending.extend(batch[i] for i in failed)
+        log.warning(f"Ledger flush: {len(failed)} entr(ies) will be retried")
+    except Exception as e:
+        _pending[:0] = batch
+        log.warning(f"Ledger flush failed, {len(batch)} entr(ies) will be retried: {e}")
+
+
+async def record_adjustment(db, guild_id: int, adj_id, reason: str, details: dict) -> dict:
+    """
+    Record an economy-wide adjustment. Every affected user document carries the
+    deltas in "_adj", so the per-user entries are copied into the ledger by one
+    server-side $merge and the totals are summed the same way. The summary goes
+    to economy_adjustments; returns it.
+    """
+    now = datetime.utcnow()
+    match = {"$match": {"guild_id": int(guild_id), "_adj.id": adj_id}}
+    await aggregate(db.users, [
+        match,
+        {"$project": {
+            "_id": 0, "guild_id": 1, "user_id": 1,
+            "reason": {"$literal": reason},
+            "balance": "$_adj.balance", "bank": "$_adj.bank",
+            "ts": {"$literal": now}, "ref": {"$literal": str(adj_id)},
+        }},
+        {"$merge": {"into": "economy_ledger", "whenNotMatched": "insert"}},
+    ])
+    totals = await aggregate(db.users, [
+        match,
+        {"$group": {
+            "_id": None, "members": {"$sum": 1},
+            "balance": {"$sum": "$_adj.balance"}, "bank": {"$sum": "$_adj.bank"},
+        }},
+    ], length=1)
+    summary = {
+        "_id": adj_id, "guild_id": int(guild_id), "reason": reason, "ts": now,
+        "members": 0, "balance": 0, "bank": 0, **details,
+    }
+    if totals:
+        summary.update(members=totals[0]["members"], balance=totals[0]["balance"], bank=totals[0]["bank"])
+    await db.economy_adjustments.insert_one(summary)
+    return summary
+
+
+# ── Snapshots ──────────────────────────────────────────────────────────────
+
+async def compact(db):
+    """
+    Fold ledger entries since the last compaction into new per-user snapshots.
+    Runs entirely server-side with an aggregation that $merges into economy_snapshots.
+    The first run seeds opening snapshots from current balances, so balances
+    that pre-date the ledger are accounted for. Those balances already include
+    every entry so far, so the seed is stamped with the time it was read and
+    later runs fold in only entries after it.
+    """
+    meta = await db.meta.find_one({"_id": "ledger_snapshots"})
+
+    if not meta:
+        seeded_at = datetime.utcnow()
+        await aggregate(db.users, [
+            {"$project": {
+                "_id": 0, "at": {"$literal": seeded_at},
+                "guild_id": {"$toLong": "$guild_id"}, "user_id": {"$toLong": "$user_id"},
+                "balance": {"$ifNull": ["$balance", 0]}, "bank": {"$ifNull": ["$bank", 0]},
+            }},
+            {"$merge": {"into": "economy_snapshots", "whenNotMatched": "insert"}},
+        ])
+        await db.meta.update_one(
+            {"_id": "ledger_snapshots"}, {"$set": {"last_compacted": seeded_at}}, upsert=True
+        )
+        log.info("Ledger: seeded opening balance snapshots.")
+        return
+
+    # Until every entry has int IDs, one member's entries would be folded into two snapshots
+    if migration_pending():
+        return
+    until = datetime.utcnow() - COMPACTION_LAG
+    since = meta["last_compacted"]
+    if until <= since:
+        return
+    await aggregate(db.economy_ledger, [
+        {"$match": {"ts": {"$gt": since, "$lte": until}}},
+        {"$group": {
+            "_id": {"guild_id": "$guild_id", "user_id": "$user_id"},
+            "balance": {"$sum": "$balance"},
+            "bank": {"$sum": "$bank"},
+        }},
+        {"$lookup": {
+            "from": "economy_snapshots",
+            "let": {"g": "$_id.guild_id", "u": "$_id.user_id"},
+            "pipeline": [
+                {"$match": {"$expr": {"$and": [
+                    {"$eq": ["$guild_id", "$$g"]}, {"$eq": ["$user_id", "$$u"]},
+                ]}}},
+                {"$sort": {"at": -1}},
+                {"$limit": 1},
+            ],
+            "as": "prev",
+        }},
+        {"$project": {
+            "_id": 0,
+            "guild_id": "$_id.guild_id",
+            "user_id": "$_id.user_id",
+            "at": {"$literal": until},
+            "balance": {"$add": ["$balance", {"$ifNull": [{"$first": "$prev.balance"}, 0]}]},
+            "bank": {"$add": ["$bank", {"$ifNull": [{"$first": "$prev.bank"}, 0]}]},
+        }},
+        {"$merge": {"into": "economy_snapshots", "whenNotMatched": "insert"}},
+    ])
+    await db.meta.update_one({"_id": "ledger_snapshots"}, {"$set": {"last_compacted": until}})
+
+
+async def balance_at(db, guild_id: int, user_id: int, at: datetime) -> dict:
+    """Rebuild a user's wallet and bank at a point in time: {"balance", "bank"}."""
+    gid, uid = snowflake(guild_id), snowflake(user_id)
+    snap = await db.economy_snapshots.find_one(
+        {"guild_id": gid, "user_id": uid, "at": {"$lte": at}},
+        sort=[("at", -1)],
+    )
+    balance = snap["balance"] if snap else 0
+    bank = snap["bank"] if snap else 0
+    ts_filter = {"$lte": at}
+    if snap:
+        ts_filter["$gt"] = snap["at"]
+    totals = await aggregate(db.economy_ledger, [
+        {"$match": {"guild_id": gid, "user_id": uid, "ts": ts_filter}},
+        {"$group": {"_id": None, "balance": {"$sum": "$balance"}, "bank": {"$sum": "$bank"}}},
+    ], length=1)
+    if totals:
+        balance += totals[0]["balance"]
+        bank += totals[0]["bank"]
+    return {"balance": balance, "bank": bank}
+
+
+async def recent_entries(db, guild_id: int, user_id: int, limit: int = 10) -> list:
+    cursor = db.economy_ledger.find(
+        {"guild_id": snowflake(guild_id), "user_id": snowflake(user_id)},
+        sort=[("ts", -1)],
+        limit=limit,
+    )
+    return await cursor.to_list(length=limit)
@@ -0,0 +1,142 @@
+# services/log_service.py — Coalescing log dispatcher shared by every log channel.
+
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime
+
+import discord
+
+import config
+
+log = logging.getLogger("bot.logs")
+
+MAX_EMBEDS_PER_MESSAGE = 10   # Discord limits
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+
+
+class _ChannelBuffer:
+    __slots__ = ("channel", "embeds", "dropped", "full", "task", "last_send")
+
+    def __init__(self, channel: discord.abc.Messageable):
+        self.channel = channel
+        self.embeds: deque[discord.Embed] = deque()
+        self.dropped = 0                 # Entries discarded since the last send
+        self.full = asyncio.Event()      # Set once a whole message worth is queued
+        self.task: asyncio.Task | None = None
+        self.last_send = 0.0
+
+
+class LogDispatcher:
+    """
+    Buffers log embeds per channel and sends them up to 10 (and 6000 characters)
+    per message. A batch Discord rejects is split in half and retried, so one
+    bad embed costs only itself.
+    A batch Discord fails to take (5xx) goes back to the front of the queue.
+    A channel flushes when a full batch is queued or LOG_FLUSH_SECONDS after its
+    first pending entry, and never more often than LOG_MIN_SEND_INTERVAL.
+    If more than LOG_MAX_PENDING entries pile up, the oldest are dropped and the
+    next message carries a note saying how many were lost.
+    """
+
+    def __init__(self):
+        self._buffers: dict[int, _ChannelBuffer] = {}
+        self._closing = False
+
+    def enqueue(self, channel: discord.abc.Messageable, embed: discord.Embed):
+        buf = self._buffers.get(channel.id)
+        if buf is None:
+            buf = self._buffers[channel.id] = _ChannelBuffer(channel)
+        buf.channel = channel
+
+        if len(buf.embeds) >= config.LOG_MAX_PENDING:
+            buf.embeds.popleft()
+            buf.dropped += 1
+        buf.embeds.append(embed)
+        if len(buf.embeds) >= MAX_EMBEDS_PER_MESSAGE:
+            buf.full.set()
+
+        if buf.task is None or buf.task.done():
+            buf.task = asyncio.create_task(self._drain(buf))
+
+    async def _drain(self, buf: _ChannelBuffer):
+        while buf.embeds:
+            # Wait for a full batch or the time threshold, whichever comes first
+            if not self._closing:
+                try:
+                    await asyncio.wait_for(buf.full.wait(), timeout=config.LOG_FLUSH_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+            await self._send_batch(buf)
+
+    async def _send_batch(self, buf: _ChannelBuffer):
+        batch, chars = [], 0
+        if buf.dropped:
+            note = discord.Embed(
+                description=f"⚠️ {buf.dropped} log entr{'y' if buf.dropped == 1 else 'ies'} "
+                            "skipped — this log channel is overloaded.",
+                color=discord.Color.dark_grey(),
+                timestamp=datetime.utcnow(),
+            )
+            batch.append(note)
+            chars += len(note)
+            buf.dropped = 0
+        while buf.embeds and len(batch) < MAX_EMBEDS_PER_MESSAGE:
+            size = len(buf.embeds[0])
+            if batch and chars + size > MAX_EMBED_CHARS_PER_MESSAGE:
+                break
+            batch.append(buf.embeds.popleft())
+            chars += size
+        if len(buf.embeds) < MAX_EMBEDS_PER_MESSAGE:
+            buf.full.clear()
+        await self._send(buf, batch)
+
+    async def _send(self, buf: _ChannelBuffer, batch: list[discord.Embed]):
+        # Per-channel pacing so a busy channel can't burn through the rate limit
+        loop = asyncio.get_running_loop()
+        wait = buf.last_send + config.LOG_MIN_SEND_INTERVAL - loop.time()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        try:
+            await buf.channel.send(embeds=batch)
+        except (discord.Forbidden, discord.NotFound) as e:
+            # The channel itself is the problem; retrying won't help
+            log.warning(f"Dropped {len(batch)} log embed(s) for channel {buf.channel.id}: {e}")
+        except discord.HTTPException as e:
+            if e.status >= 500 and not self._closing:
+                # Discord's side: send the same batch again on the next round
+                self._requeue(buf, batch)
+                log.warning(f"Log send to channel {buf.channel.id} failed, will retry: {e}")
+            elif e.status in (400, 413) and len(batch) > 1:
+                # Rejected payload: split it so only the bad embed is lost
+                buf.last_send = loop.time()
+                half = len(batch) // 2
+                await self._send(buf, batch[:half])
+                await self._send(buf, batch[half:])
+                return
+            else:
+                log.warning(f"Dropped {len(batch)} log embed(s) for channel {buf.channel.id}: {e}")
+        buf.last_send = loop.time()
+
+    def _requeue(self, buf: _ChannelBuffer, batch: list[discord.Embed]):
+        buf.embeds.extendleft(reversed(batch))
+        while len(buf.embeds) > config.LOG_MAX_PENDING:
+            buf.embeds.popleft()
+            buf.dropped += 1
+        if len(buf.embeds) >= MAX_EMBEDS_PER_MESSAGE:
+            buf.full.set()
+
+    async def flush_all(self):
+        """Send everything still buffered. Called on shutdown."""
+        self._closing = True
+        await asyncio.gather(*(self._flush(buf) for buf in list(self._buffers.values())))
+
+    async def _flush(self, buf: _ChannelBuffer):
+        if buf.task and not buf.task.done():
+            buf.full.set()
+            await buf.task   # Mid-send: let it finish; it drains the rest without waiting
+        while buf.embeds or buf.dropped:
+            await self._send_batch(buf)
+
+
+log_dispatcher = LogDispatcher()
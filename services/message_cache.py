@@ -0,0 +1,88 @@
+# services/message_cache.py — Compact per-guild message content cache for edit/delete logs.
+
+from collections import OrderedDict
+
+import discord
+
+import config
+
+# Rough fixed cost of one record (object, slots, ints, dict entry) on top of its strings
+_RECORD_OVERHEAD = 200
+
+
+class CachedMessage:
+    __slots__ = ("id", "guild_id", "channel_id", "author_id", "author_name", "content", "attachments")
+
+    def __init__(self, id: int, guild_id: int, channel_id: int, author_id: int,
+                 author_name: str, content: str, attachments: tuple[str, ...] = ()):
+        self.id = id
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.author_id = author_id
+        self.author_name = author_name
+        self.content = content
+        self.attachments = attachments
+
+    @classmethod
+    def from_message(cls, message: discord.Message) -> "CachedMessage":
+        return cls(
+            message.id, message.guild.id, message.channel.id, message.author.id,
+            str(message.author), message.content,
+            tuple(a.filename for a in message.attachments),
+        )
+
+    def size(self) -> int:
+        return (_RECORD_OVERHEAD + len(self.content) + len(self.author_name)
+                + sum(len(a) for a in self.attachments))
+
+
+class _GuildRing:
+    __slots__ = ("messages", "bytes")
+
+    def __init__(self):
+        self.messages: OrderedDict[int, CachedMessage] = OrderedDict()
+        self.bytes = 0
+
+
+class MessageCache:
+    """
+    Ring buffer of recent messages per guild, bounded by MESSAGE_CACHE_BYTES_PER_GUILD.
+    Oldest messages are evicted first. Only what the logs need is kept, so it holds
+    far more history than discord.py's cache of full Message objects.
+    """
+
+    def __init__(self):
+        self._guilds: dict[int, _GuildRing] = {}
+
+    def add(self, message: discord.Message):
+        record = CachedMessage.from_message(message)
+        ring = self._guilds.get(record.guild_id)
+        if ring is None:
+            ring = self._guilds[record.guild_id] = _GuildRing()
+        ring.messages[record.id] = record
+        ring.bytes += record.size()
+        while ring.bytes > config.MESSAGE_CACHE_BYTES_PER_GUILD and ring.messages:
+            _, old = ring.messages.popitem(last=False)
+            ring.bytes -= old.size()
+
+    def get(self, guild_id: int, message_id: int) -> CachedMessage | None:
+        ring = self._guilds.get(guild_id)
+        return ring.messages.get(message_id) if ring else None
+
+    def pop(self, guild_id: int, message_id: int) -> CachedMessage | None:
+        ring = self._guilds.get(guild_id)
+        if not ring:
+            return None
+        record = ring.messages.pop(message_id, None)
+        if record:
+            ring.bytes -= record.size()
+        return record
+
+    def update_content(self, record: CachedMessage, content: str):
+        ring = self._guilds.get(record.guild_id)
+        if ring and record.id in ring.messages:
+            ring.bytes += len(content) - len(record.content)
+        record.content = content
+
+
+message_cache = MessageCache()
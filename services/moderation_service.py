@@ -2,50 +2,44 @@
 
 import re
 from datetime import datetime
-from collections import defaultdict, deque
 
 import discord
 
-import config
+from services.cache_service import shared_cache
+from services.guild_config_service import get_settings
+from services.log_service import log_dispatcher
 
-
-# In-memory spam tracker: {(guild_id, user_id): deque of timestamps}
-_spam_tracker: dict[tuple, deque] = defaultdict(lambda: deque(maxlen=10))
+SPAM_WINDOW_SECONDS = 5
 URL_PATTERN = re.compile(r"https?://\S+|www\.\S+", re.IGNORECASE)
 
 
-async def add_warning(db, user_id: int, guild_id: int, reason: str, moderator_id: int) -> dict:
+async def add_warning(store, user_id: int, guild_id: int, reason: str, moderator_id: int) -> dict:
     doc = {
-        "user_id": str(user_id),
-        "guild_id": str(guild_id),
+        "user_id": int(user_id),
+        "guild_id": int(guild_id),
         "reason": reason,
-        "moderator_id": str(moderator_id),
+        "moderator_id": int(moderator_id),
         "timestamp": datetime.utcnow(),
     }
-    await db.warnings.insert_one(doc)
+    await store.add_warning(doc)
     return doc
 
 
-async def get_warnings(db, user_id: int, guild_id: int) -> list:
-    cursor = db.warnings.find(
-        {"user_id": str(user_id), "guild_id": str(guild_id)},
-        sort=[("timestamp", -1)],
-    )
-    return await cursor.to_list(length=50)
+async def get_warnings(store, user_id: int, guild_id: int, stale_ok: bool = False) -> list:
+    """Newest first. Pass stale_ok=True for display-only reads that may lag a little."""
+    return await store.get_warnings(user_id, guild_id, limit=50, stale_ok=stale_ok)
 
 
-async def clear_warnings(db, user_id: int, guild_id: int) -> int:
-    result = await db.warnings.delete_many(
-        {"user_id": str(user_id), "guild_id": str(guild_id)}
-    )
-    return result.deleted_count
+async def clear_warnings(store, user_id: int, guild_id: int) -> int:
+    return await store.clear_warnings(user_id, guild_id)
 
 
 def is_staff(member: discord.Member) -> bool:
     """Check if member has a staff role or is an admin."""
     if member.guild_permissions.administrator:
         return True
-    return any(r.id in config.STAFF_ROLE_IDS for r in member.roles)
+    staff_roles = get_settings(member.guild.id).STAFF_ROLE_IDS
+    return any(r.id in staff_roles for r in member.roles)
 
 
 async def check_automod(message: discord.Message) -> bool:
@@ -53,7 +47,8 @@ async def check_automod(message: discord.Message) -> bool:
     Run auto-moderation checks. Returns True if message was deleted.
     Checks: blacklisted words, anti-link, anti-spam.
     """
-    if not config.MODERATION_ENABLED:
+    cfg = get_settings(message.guild.id)
+    if not cfg.MODERATION_ENABLED:
         return False
     if is_staff(message.author):
         return False
@@ -61,8 +56,8 @@ async def check_automod(message: discord.Message) -> bool:
     content_lower = message.content.lower()
 
     # Blacklisted words
-    for word in config.BLACKLISTED_WORDS:
-        if word.lower() in content_lower:
+    for word in cfg.BLACKLISTED_WORDS:   # Already lowercased
+        if word in content_lower:
             try:
                 await message.delete()
                 await message.channel.send(
@@ -74,7 +69,7 @@ async def check_automod(message: discord.Message) -> bool:
             return True
 
     # Anti-link
-    if config.ANTI_LINK_ENABLED and URL_PATTERN.search(message.content):
+    if cfg.ANTI_LINK_ENABLED and URL_PATTERN.search(message.content):
         try:
             await message.delete()
             await message.channel.send(
@@ -85,14 +80,11 @@ async def check_automod(message: discord.Message) -> bool:
             pass
         return True
 
-    # Anti-spam
-    key = (message.guild.id, message.author.id)
-    now = datetime.utcnow().timestamp()
-    tracker = _spam_tracker[key]
-    tracker.append(now)
-
-    recent = [t for t in tracker if now - t <= 5]
-    if len(recent) >= config.ANTI_SPAM_THRESHOLD:
+    # Anti-spam: messages in a sliding window, counted across all bot processes
+    recent = await shared_cache.window_hits(
+        f"spam:{message.guild.id}:{message.author.id}", SPAM_WINDOW_SECONDS
+    )
+    if recent >= cfg.ANTI_SPAM_THRESHOLD:
         try:
             await message.delete()
             await message.author.timeout(
@@ -113,16 +105,14 @@ async def check_automod(message: discord.Message) -> bool:
 async def send_mod_log(guild: discord.Guild, action: str, target: discord.User,
                        moderator: discord.Member, reason: str, color: discord.Color):
     """Post a moderation action embed to the mod log channel."""
-    if not config.MOD_LOG_CHANNEL:
+    channel_id = get_settings(guild.id).MOD_LOG_CHANNEL
+    if not channel_id:
         return
-    ch = guild.get_channel(int(config.MOD_LOG_CHANNEL))
+    ch = guild.get_channel(channel_id)
     if not ch:
         return
     embed = discord.Embed(title=f"🔨 {action}", color=color, timestamp=datetime.utcnow())
     embed.add_field(name="User", value=f"{target} ({target.id})", inline=True)
     embed.add_field(name="Moderator", value=f"{moderator} ({moderator.id})", inline=True)
     embed.add_field(name="Reason", value=reason or "No reason provided", inline=False)
-    try:
-        await ch.send(embed=embed)
-    except discord.Forbidden:
-        pass
+    log_dispatcher.enqueue(ch, embed)
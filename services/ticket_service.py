@@ -1,66 +1,223 @@
 # services/ticket_service.py — Ticket creation, closing, and transcript export.
 
+import asyncio
+from collections import defaultdict
 from datetime import datetime
 
 import discord
 
 import config
+from services.guild_config_service import get_settings
 
 
-async def create_ticket(db, guild: discord.Guild, user: discord.Member) -> tuple[discord.TextChannel | None, str | None]:
+# In-memory index of open tickets, loaded at startup and kept current on open/close.
+# The partial unique index on (guild_id, user_id) where status == "open" backs it
+# up across instances.
+# Keys are ints even for tickets still stored with string IDs (see models/id_schema.py).
+_open_by_user: dict[tuple[int, int], dict] = {}   # {(guild_id, user_id): ticket}
+_open_by_channel: dict[int, dict] = {}            # {channel_id: ticket}
+_closing: set[int] = set()                        # Channel IDs with a close in progress
+
+
+def _index_ticket(ticket: dict):
+    _open_by_user[(int(ticket["guild_id"]), int(ticket["user_id"]))] = ticket
+    if ticket.get("channel_id"):
+        _open_by_channel[int(ticket["channel_id"])] = ticket
+
+
+def _unindex_ticket(ticket: dict):
+    _open_by_user.pop((int(ticket["guild_id"]), int(ticket["user_id"])), None)
+    if ticket.get("channel_id"):
+        _open_by_channel.pop(int(ticket["channel_id"]), None)
+
+
+async def load_open_tickets(store, owned=None):
+    """Rebuild the open-ticket index from the database. Called once at startup.
+    `owned(guild_id)` limits it to this cluster's guilds."""
+    _open_by_user.clear()
+    _open_by_channel.clear()
+    for ticket in await store.open_tickets():
+        if owned is None or owned(ticket["guild_id"]):
+            _index_ticket(ticket)
+
+
+def get_open_ticket(channel_id: int) -> dict | None:
+    """Return the open ticket for a channel, or None. No database access."""
+    return _open_by_channel.get(int(channel_id))
+
+
+# ── Category pool ──────────────────────────────────────────────────────────
+# Discord caps a category at 50 channels, so tickets are spread over the configured
+# category plus numbered overflow categories ("Tickets 2", "Tickets 3", ...).
+# Counts are tracked in memory; the guild is only scanned once to seed them.
+_category_counts: dict[int, dict[int, int]] = {}   # {guild_id: {category_id: channels}}
+_category_locks: dict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+
+def _discover_category_pool(guild: discord.Guild, base: discord.CategoryChannel) -> dict[int, int]:
+    """Seed the pool from the guild cache: the base category and its overflow siblings."""
+    pool = {base.id: len(base.channels)}
+    prefix = f"{base.name} "
+    for cat in guild.categories:
+        suffix = cat.name[len(prefix):]
+        if cat.id != base.id and cat.name.startswith(prefix) and suffix.isdigit():
+            pool[cat.id] = len(cat.channels)
+    return pool
+
+
+async def _reserve_category(guild: discord.Guild) -> tuple[discord.CategoryChannel | None, str | None]:
+    """Pick the least-loaded ticket category, creating an overflow one if all are full.
+    The returned category already counts the new channel. Returns (category, error_message)."""
+    base_id = get_settings(guild.id).TICKET_CATEGORY_ID
+    if not base_id:
+        return None, None
+    base = guild.get_channel(base_id)
+    if not base:
+        return None, None
+
+    async with _category_locks[guild.id]:
+        pool = _category_counts.get(guild.id)
+        if pool is None or base.id not in pool:
+            pool = _category_counts[guild.id] = _discover_category_pool(guild, base)
+
+        while True:
+            open_slots = [(count, cid) for cid, count in pool.items() if count < config.TICKET_CATEGORY_LIMIT]
+            if not open_slots:
+                break
+            _, cid = min(open_slots)
+            category = guild.get_channel(cid)
+            if category:
+                pool[cid] += 1
+                return category, None
+            pool.pop(cid)  # Deleted behind our back
+
+        # Every category is full — create the next overflow category
+        taken = {guild.get_channel(cid).name for cid in pool if guild.get_channel(cid)}
+        n = 2
+        while f"{base.name} {n}" in taken:
+            n += 1
+        try:
+            category = await guild.create_category(
+                name=f"{base.name} {n}",
+                overwrites=base.overwrites,
+                reason="Ticket categories full",
+            )
+        except discord.HTTPException:
+            return None, "All ticket categories are full. Please try again later."
+        pool[category.id] = 1
+        return category, None
+
+
+async def _release_category(guild: discord.Guild, category_id: int | None):
+    """Give back a ticket slot. Empty overflow categories are deleted."""
+    pool = _category_counts.get(guild.id)
+    if pool is None or category_id not in pool:
+        return
+    async with _category_locks[guild.id]:
+        pool[category_id] = max(0, pool[category_id] - 1)
+        is_overflow = category_id != get_settings(guild.id).TICKET_CATEGORY_ID
+        if not is_overflow or pool[category_id] > 0:
+            return
+        pool.pop(category_id)
+
+    category = guild.get_channel(category_id)
+    if category and not category.channels:
+        try:
+            await category.delete(reason="Ticket overflow category empty")
+        except discord.HTTPException:
+            pass
+
+
+class _TicketAborted(Exception):
+    """Ends create_ticket() early with a message for the user, through its cleanup."""
+
+
+async def create_ticket(store, guild: discord.Guild, user: discord.Member) -> tuple[discord.TextChannel | None, str | None]:
     """Create a ticket channel. Returns (channel, error_message)."""
     # Check for existing open ticket
-    existing = await db.tickets.find_one({
-        "user_id": str(user.id),
-        "guild_id": str(guild.id),
-        "status": "open",
-    })
+    existing = _open_by_user.get((guild.id, user.id))
     if existing:
+        if not existing.get("channel_id"):
+            return None, "Your ticket is already being created."
         ch = guild.get_channel(int(existing["channel_id"]))
         return None, f"You already have an open ticket: {ch.mention if ch else '#deleted-channel'}."
 
-    # Resolve category
-    category = None
-    if config.TICKET_CATEGORY_ID:
-        category = guild.get_channel(int(config.TICKET_CATEGORY_ID))
-
-    # Build permission overwrites
-    overwrites = {
-        guild.default_role: discord.PermissionOverwrite(read_messages=False),
-        user: discord.PermissionOverwrite(
-            read_messages=True, send_messages=True, attach_files=True, embed_links=True
-        ),
-        guild.me: discord.PermissionOverwrite(
-            read_messages=True, send_messages=True, manage_channels=True, manage_messages=True
-        ),
-    }
-    if config.TICKET_STAFF_ROLE:
-        staff_role = guild.get_role(int(config.TICKET_STAFF_ROLE))
-        if staff_role:
-            overwrites[staff_role] = discord.PermissionOverwrite(
-                read_messages=True, send_messages=True
-            )
-
-    try:
-        channel = await guild.create_text_channel(
-            name=f"ticket-{user.name}",
-            overwrites=overwrites,
-            category=category,
-            topic=f"Support ticket for {user} (ID: {user.id})",
-        )
-    except discord.Forbidden:
-        return None, "I don't have permission to create channels."
-
-    # Save to DB
-    await db.tickets.insert_one({
-        "guild_id": str(guild.id),
-        "user_id": str(user.id),
-        "channel_id": str(channel.id),
+    # Reserve the slot before the first await so a double click can't open two tickets
+    ticket = {
+        "guild_id": guild.id,
+        "user_id": user.id,
+        "channel_id": None,
         "status": "open",
         "created_at": datetime.utcnow(),
         "closed_at": None,
         "transcript": [],
-    })
+    }
+    _index_ticket(ticket)
+    inserted, category, channel, rescan = False, None, None, False
+    try:
+        if not await store.insert_ticket(ticket):
+            # Another instance already holds an open ticket for this user
+            raise _TicketAborted("You already have an open ticket.")
+        inserted = True
+
+        # Resolve category
+        category, error = await _reserve_category(guild)
+        if error:
+            raise _TicketAborted(error)
+
+        # Build permission overwrites
+        overwrites = {
+            guild.default_role: discord.PermissionOverwrite(read_messages=False),
+            user: discord.PermissionOverwrite(
+                read_messages=True, send_messages=True, attach_files=True, embed_links=True
+            ),
+            guild.me: discord.PermissionOverwrite(
+                read_messages=True, send_messages=True, manage_channels=True, manage_messages=True
+            ),
+        }
+        cfg = get_settings(guild.id)
+        if cfg.TICKET_STAFF_ROLE:
+            staff_role = guild.get_role(cfg.TICKET_STAFF_ROLE)
+            if staff_role:
+                overwrites[staff_role] = discord.PermissionOverwrite(
+                    read_messages=True, send_messages=True
+                )
+
+        try:
+            channel = await guild.create_text_channel(
+                name=f"ticket-{user.name}",
+                overwrites=overwrites,
+                category=category,
+                topic=f"Support ticket for {user} (ID: {user.id})",
+            )
+        except discord.Forbidden:
+            raise _TicketAborted("I don't have permission to create channels.")
+        except discord.HTTPException:
+            # Counts drifted (e.g. channels moved by hand) — rescan on the next open
+            rescan = True
+            raise _TicketAborted("I couldn't create your ticket channel. Please try again.")
+
+        # Attach the channel to the reserved ticket
+        await store.set_ticket_channel(ticket["_id"], channel.id)
+        ticket["channel_id"] = channel.id
+        _index_ticket(ticket)
+    except BaseException as e:
+        # Whatever went wrong (cancellation included), give back everything reserved so far
+        _unindex_ticket(ticket)
+        if inserted:
+            await store.delete_ticket(ticket["_id"])
+        if channel:
+            try:
+                await channel.delete(reason="Ticket creation failed")
+            except discord.HTTPException:
+                pass
+        if category:
+            await _release_category(guild, category.id)
+        if rescan:
+            _category_counts.pop(guild.id, None)
+        if isinstance(e, _TicketAborted):
+            return None, str(e)
+        raise
 
     # Welcome embed
     embed = discord.Embed(
@@ -79,8 +236,8 @@ async def create_ticket(db, guild: discord.Guild, user: discord.Member) -> tuple
     view.add_item(close_btn)
 
     staff_ping = ""
-    if config.TICKET_STAFF_ROLE:
-        staff_role = guild.get_role(int(config.TICKET_STAFF_ROLE))
+    if cfg.TICKET_STAFF_ROLE:
+        staff_role = guild.get_role(cfg.TICKET_STAFF_ROLE)
         if staff_role:
             staff_ping = staff_role.mention
 
@@ -88,38 +245,37 @@ async def create_ticket(db, guild: discord.Guild, user: discord.Member) -> tuple
     return channel, None
 
 
-async def close_ticket(db, channel: discord.TextChannel, closer: discord.Member) -> str:
+async def close_ticket(store, channel: discord.TextChannel, closer: discord.Member) -> str:
     """Close a ticket: export transcript, archive channel, update DB."""
-    ticket = await db.tickets.find_one({
-        "channel_id": str(channel.id),
-        "status": "open",
-    })
+    ticket = get_open_ticket(channel.id)
     if not ticket:
         return "No open ticket found for this channel."
+    # A second close click is a no-op while the first is still running
+    if channel.id in _closing:
+        return "This ticket is already closing."
+    _closing.add(channel.id)
+    try:
+        # Build transcript
+        messages = []
+        async for msg in channel.history(limit=500, oldest_first=True):
+            messages.append(
+                f"[{msg.created_at.strftime('%Y-%m-%d %H:%M:%S')}] "
+                f"{msg.author} ({msg.author.id}): {msg.content}"
+            )
 
-    # Build transcript
-    messages = []
-    async for msg in channel.history(limit=500, oldest_first=True):
-        messages.append(
-            f"[{msg.created_at.strftime('%Y-%m-%d %H:%M:%S')}] "
-            f"{msg.author} ({msg.author.id}): {msg.content}"
-        )
-
-    transcript_text = "\n".join(messages)
-    now = datetime.utcnow()
-
-    await db.tickets.update_one(
-        {"_id": ticket["_id"]},
-        {"$set": {
-            "status": "closed",
-            "closed_at": now,
-            "transcript": messages,
-        }},
-    )
+        transcript_text = "\n".join(messages)
+        now = datetime.utcnow()
+
+        await store.close_ticket(ticket["_id"], now, messages)
+    finally:
+        _closing.discard(channel.id)
+    # Only now: if anything above failed, the ticket is still open and closable
+    _unindex_ticket(ticket)
 
     # Send transcript to log channel
-    if config.TICKET_LOG_CHANNEL:
-        log_ch = channel.guild.get_channel(int(config.TICKET_LOG_CHANNEL))
+    log_channel_id = get_settings(channel.guild.id).TICKET_LOG_CHANNEL
+    if log_channel_id:
+        log_ch = channel.guild.get_channel(log_channel_id)
         if log_ch:
             guild = channel.guild
             opener = guild.get_member(int(ticket["user_id"]))
@@ -128,7 +284,7 @@ async def close_ticket(db, channel: discord.TextChannel, closer: discord.Member)
                 color=discord.Color.red(),
                 timestamp=now,
             )
-            embed.add_field(name="Opened by", value=str(opener) if opener else ticket["user_id"])
+            embed.add_field(name="Opened by", value=str(opener) if opener else str(ticket["user_id"]))
             embed.add_field(name="Closed by", value=str(closer))
             embed.add_field(name="Duration", value=str(now - ticket["created_at"]).split(".")[0])
 
@@ -146,5 +302,39 @@ async def close_ticket(db, channel: discord.TextChannel, closer: discord.Member)
         await channel.delete(reason=f"Ticket closed by {closer}")
     except discord.Forbidden:
         pass
+    else:
+        await _release_category(channel.guild, channel.category_id)
 
     return "Ticket closed."
+
+
+# ── Transcript search ──────────────────────────────────────────────────────
+# On MongoDB this is backed by the (guild_id, transcript text) index, which is
+# updated in place when close_ticket writes a transcript — no rebuild step.
+# SQLite matches words without ranking, newest first.
+SEARCH_PAGE_SIZE = 5
+
+
+def _matching_line(transcript: list[str], query: str) -> str:
+    """First transcript line containing any search term, for the result snippet."""
+    terms = [t.lower() for t in query.replace('"', " ").split() if not t.startswith("-")]
+    for line in transcript:
+        lower = line.lower()
+        if any(t in lower for t in terms):
+            return line
+    return transcript[0] if transcript else ""
+
+
+async def search_transcripts(store, guild_id: int, query: str, user_id: int | None = None,
+                             since: datetime | None = None, until: datetime | None = None,
+                             page: int = 1) -> tuple[list[dict], int]:
+    """Full-text search over closed tickets. Returns (page_results, total_matches).
+    Each result has the ticket fields plus 'snippet'."""
+    results, total = await store.search_tickets(
+        guild_id, query, user_id, since, until,
+        skip=(max(page, 1) - 1) * SEARCH_PAGE_SIZE,
+        limit=SEARCH_PAGE_SIZE,
+    )
+    for doc in results:
+        doc["snippet"] = _matching_line(doc.pop("transcript", []), query)
+    return results, total
@@ -5,8 +5,7 @@ from datetime import datetime
 
 import discord
 
-import config
-from models.user_model import get_or_create_user
+from services.guild_config_service import get_settings
 
 
 def xp_for_level(level: int) -> int:
@@ -35,45 +34,35 @@ def make_progress_bar(current: int, total: int, length: int = 10) -> str:
     return "█" * filled + "░" * (length - filled)
 
 
-async def process_message_xp(db, message: discord.Message):
+async def process_message_xp(store, message: discord.Message):
     """Called on every non-bot message. Handles cooldown, XP grant, level-up."""
-    if not config.LEVELING_ENABLED:
+    cfg = get_settings(message.guild.id)
+    if not cfg.LEVELING_ENABLED:
         return
-    if message.channel.id in config.XP_IGNORED_CHANNELS:
+    if message.channel.id in cfg.XP_IGNORED_CHANNELS:
         return
 
-    user = await get_or_create_user(db, message.author.id, message.guild.id)
+    user = await store.get_user(message.author.id, message.guild.id, "xp", "level", "last_xp_time")
     now = datetime.utcnow()
 
     # Cooldown check
     if user["last_xp_time"]:
         elapsed = (now - user["last_xp_time"]).total_seconds()
-        if elapsed < config.XP_COOLDOWN_SECONDS:
+        if elapsed < cfg.XP_COOLDOWN_SECONDS:
             return
 
-    xp_gain  = random.randint(config.XP_MIN_PER_MESSAGE, config.XP_MAX_PER_MESSAGE)
+    xp_gain  = random.randint(cfg.XP_MIN_PER_MESSAGE, cfg.XP_MAX_PER_MESSAGE)
     new_xp   = user["xp"] + xp_gain
     new_level = calculate_level(new_xp)
     old_level = user["level"]
 
-    await db.users.update_one(
-        {"user_id": str(message.author.id), "guild_id": str(message.guild.id)},
-        {
-            "$set": {
-                "xp": new_xp,
-                "level": new_level,
-                "last_xp_time": now,
-            },
-            "$inc": {"messages": 1},
-        },
-        upsert=True,
-    )
+    await store.record_xp(message.author.id, message.guild.id, new_xp, new_level, now)
 
     if new_level > old_level:
-        await handle_level_up(db, message, new_level)
+        await handle_level_up(message, new_level)
 
 
-async def handle_level_up(db, message: discord.Message, new_level: int):
+async def handle_level_up(message: discord.Message, new_level: int):
     """Send a level-up message and assign any role rewards."""
     embed = discord.Embed(
         title="⬆️ Level Up!",
@@ -82,8 +71,10 @@ async def handle_level_up(db, message: discord.Message, new_level: int):
     )
     embed.set_thumbnail(url=message.author.display_avatar.url)
 
+    cfg = get_settings(message.guild.id)
+
     # Send to configured channel or DM
-    channel_id = config.LEVEL_UP_CHANNEL
+    channel_id = cfg.LEVEL_UP_CHANNEL
     try:
         if channel_id:
             ch = message.guild.get_channel(int(channel_id))
@@ -95,14 +86,14 @@ async def handle_level_up(db, message: discord.Message, new_level: int):
         pass  # DMs closed — silently skip
 
     # Role reward
-    role_id = config.LEVEL_ROLES.get(new_level)
+    role_id = cfg.LEVEL_ROLES.get(new_level)
     if role_id:
         role = message.guild.get_role(role_id)
         if role:
             try:
-                if not config.STACK_LEVEL_ROLES:
+                if not cfg.STACK_LEVEL_ROLES:
                     # Remove all previous level roles
-                    for lvl, rid in config.LEVEL_ROLES.items():
+                    for lvl, rid in cfg.LEVEL_ROLES.items():
                         if lvl < new_level:
                             old_role = message.guild.get_role(rid)
                             if old_role and old_role in message.author.roles:
@@ -0,0 +1,121 @@
+# tests/conftest.py — Shared fixtures: MongoDB stand-ins and fresh service state.
+#
+# "db" is an in-memory mongomock-motor database. Set MONGO_TEST_URI to a real
+# server (a throwaway one: each test creates and drops its own database) to also
+# run the tests that need server features mongomock lacks, like partial indexes,
+# $text search and explain(). "racy_db" is for concurrency tests: calls on it
+# really interleave, on mongomock and on the server.
+
+import asyncio
+import functools
+import inspect
+import os
+import uuid
+from contextlib import asynccontextmanager
+
+import pytest
+from mongomock.collection import BulkOperationBuilder
+from mongomock_motor import AsyncCommandCursor, AsyncCursor, AsyncMongoMockClient, AsyncMongoMockCollection
+
+from models import database, id_schema, user_model
+from services import economy_service, guild_config_service, ticket_service
+
+MONGO_TEST_URI = os.getenv("MONGO_TEST_URI")
+
+# mongomock's with_options() hands back its synchronous collection. Like a
+# standalone server, the stand-in answers every read preference from the primary.
+AsyncMongoMockCollection.with_options = lambda self, **options: self
+
+# Current PyMongo passes sort= to the bulk builder, which mongomock doesn't take
+_add_update, _add_replace = BulkOperationBuilder.add_update, BulkOperationBuilder.add_replace
+BulkOperationBuilder.add_update = lambda self, *args, sort=None, **kwargs: _add_update(self, *args, **kwargs)
+BulkOperationBuilder.add_replace = lambda self, *args, sort=None, **kwargs: _add_replace(self, *args, **kwargs)
+
+
+@pytest.fixture(autouse=True)
+def fresh_state():
+    """The services keep per-process state in module globals; every test starts clean."""
+    user_model._loaders.clear()
+    database._stale_ok.clear()
+    economy_service._shop_cache.clear()
+    economy_service._shop_refreshing.clear()
+    economy_service._chat_today.clear()
+    economy_service._chat_pending.clear()
+    economy_service._chat_retry.clear()
+    guild_config_service._cache.clear()
+    guild_config_service._defaults = None
+    ticket_service._open_by_user.clear()
+    ticket_service._open_by_channel.clear()
+    ticket_service._closing.clear()
+    ticket_service._category_counts.clear()
+    yield
+
+
+async def _v2(db):
+    """Mark the users and ID migrations as finished, like a current deployment."""
+    await db.meta.insert_many([{"_id": "users_schema", "version": 2}, {"_id": "ids_schema", "version": 2}])
+    await user_model.load_schema_state(db)
+    await id_schema.load_schema_state(db)
+    return db
+
+
+async def mock_db():
+    return await _v2(AsyncMongoMockClient()["discord_bot"])
+
+
+@asynccontextmanager
+async def server_database():
+    """A fresh database on MONGO_TEST_URI, dropped afterwards. Skips without one."""
+    if not MONGO_TEST_URI:
+        pytest.skip("MONGO_TEST_URI not set")
+    client = database.connect(MONGO_TEST_URI)
+    name = f"bot_test_{uuid.uuid4().hex[:8]}"
+    try:
+        yield await _v2(client[name])
+    finally:
+        await client.drop_database(name)
+        result = client.close()
+        if inspect.isawaitable(result):
+            await result
+
+
+@pytest.fixture
+async def db():
+    return await mock_db()
+
+
+@pytest.fixture
+async def server_db():
+    async with server_database() as db:
+        yield db
+
+
+def _yield_first(method):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        await asyncio.sleep(0)
+        return await method(*args, **kwargs)
+    return wrapper
+
+
+def interleave_mongomock(monkeypatch):
+    """
+    mongomock answers without ever yielding, so gathered calls run one after
+    another and a read-then-write race can't happen. Make every collection and
+    cursor call yield to the event loop first, as a network round trip would.
+    """
+    for cls in (AsyncMongoMockCollection, AsyncCursor, AsyncCommandCursor):
+        for klass in cls.__mro__:
+            for name, method in list(vars(klass).items()):
+                if inspect.iscoroutinefunction(method):
+                    monkeypatch.setattr(klass, name, _yield_first(method))
+
+
+@pytest.fixture(params=["mongomock", "mongodb"])
+async def racy_db(request, monkeypatch):
+    if request.param == "mongomock":
+        interleave_mongomock(monkeypatch)
+        yield await mock_db()
+    else:
+        async with server_database() as db:
+            yield db
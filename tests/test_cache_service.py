@@ -0,0 +1,125 @@
+# tests/test_cache_service.py — SharedCache on both backends. "redis" runs against
+# fakeredis, with two SharedCache instances on one fake server standing in for
+# two bot processes.
+
+import asyncio
+import sys
+
+import fakeredis
+import pytest
+import redis.asyncio
+
+import config
+from services import cache_service
+from services.cache_service import KEY_PREFIX, SharedCache
+
+
+@pytest.fixture
+def redis_server(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(redis.asyncio, "from_url",
+                        lambda url, **kwargs: fakeredis.FakeAsyncRedis(server=server, **kwargs))
+    return server
+
+
+@pytest.fixture(params=["memory", "redis"])
+def backend(request, monkeypatch, redis_server):
+    monkeypatch.setattr(config, "CACHE_BACKEND", request.param)
+    return request.param
+
+
+@pytest.fixture
+async def open_cache(backend):
+    """Connect a new SharedCache ("process"), subscribing handlers first like the services do."""
+    opened = []
+
+    async def open_cache(**handlers) -> SharedCache:
+        cache = SharedCache()
+        for channel, handler in handlers.items():
+            cache.subscribe(channel, handler)
+        await cache.connect()
+        opened.append(cache)
+        return cache
+
+    yield open_cache
+    for cache in opened:
+        await cache.close()
+
+
+async def _eventually(check, timeout: float = 2.0):
+    """Wait for a pub/sub message to make its way through the listener task."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not check() and loop.time() < deadline:
+        await asyncio.sleep(0.01)
+    assert check()
+
+
+async def test_incr_resets_after_ttl(open_cache):
+    cache = await open_cache()
+    assert [await cache.incr("cmd:1", ttl=1) for _ in range(3)] == [1, 2, 3]
+    assert await cache.incr("cmd:2", ttl=1) == 1
+    await asyncio.sleep(1.2)
+    assert await cache.incr("cmd:1", ttl=1) == 1
+
+
+async def test_window_hits_slide(open_cache):
+    cache = await open_cache()
+    assert await cache.window_hits("spam:1", window=1) == 1
+    assert await cache.window_hits("spam:1", window=1) == 2
+    await asyncio.sleep(0.6)
+    assert await cache.window_hits("spam:1", window=1) == 3
+    await asyncio.sleep(0.6)
+    # The first two hits have left the window, the third hasn't
+    assert await cache.window_hits("spam:1", window=1) == 2
+
+
+async def test_publish_reaches_own_handlers(open_cache):
+    received = []
+    cache = await open_cache(shop=received.append)
+    await cache.publish("shop", "42")
+    await _eventually(lambda: received == ["42"])
+
+
+@pytest.mark.parametrize("backend", ["redis"], indirect=True)   # The memory backend is per process
+async def test_redis_processes_share_counters(open_cache):
+    a, b = await open_cache(), await open_cache()
+    assert await a.incr("cmd:1", ttl=60) == 1
+    assert await b.incr("cmd:1", ttl=60) == 2
+    assert await a.window_hits("spam:1", window=60) == 1
+    assert await b.window_hits("spam:1", window=60) == 2
+    assert await a._backend.redis.ttl(KEY_PREFIX + "cmd:1") > 0
+
+
+@pytest.mark.parametrize("backend", ["redis"], indirect=True)   # The memory backend is per process
+async def test_redis_invalidation_reaches_other_processes(open_cache):
+    heard_a, heard_b = [], []
+    a = await open_cache(shop=heard_a.append)
+    b = await open_cache(shop=heard_b.append, other=heard_b.append)
+    await a.publish("shop", "42")
+    await b.publish("other", "7")
+    await _eventually(lambda: heard_a == ["42"] and heard_b == ["42", "7"])
+
+
+@pytest.mark.parametrize("backend", ["redis"], indirect=True)
+async def test_redis_listener_resubscribes_after_a_dropped_connection(open_cache, redis_server, monkeypatch):
+    monkeypatch.setattr(cache_service, "_RESUBSCRIBE_SECONDS", 0.05)
+    heard = []
+    a, b = await open_cache(), await open_cache(shop=heard.append)
+
+    redis_server.connected = False
+    await asyncio.sleep(0.2)
+    redis_server.connected = True
+    await _eventually(lambda: b._backend.pubsub.subscribed)
+    await asyncio.sleep(0.1)
+
+    await a.publish("shop", "42")
+    await _eventually(lambda: heard == ["42"])
+    assert not b._backend.listener.done()
+
+
+async def test_redis_backend_without_the_package_says_so(monkeypatch):
+    monkeypatch.setattr(config, "CACHE_BACKEND", "redis")
+    monkeypatch.setitem(sys.modules, "redis.asyncio", None)
+    with pytest.raises(RuntimeError, match="pip install redis"):
+        await SharedCache().connect()
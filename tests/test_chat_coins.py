@@ -0,0 +1,62 @@
+# tests/test_chat_coins.py — Buffered chat-coin grants: a failed write is retried
+# with its own day, so yesterday's coins never count against today's cap.
+
+import pytest
+from mongomock_motor import AsyncMongoMockCollection
+
+from models.user_model import user_key
+from services import economy_service as economy
+
+GUILD, USER = 1, 7
+
+
+@pytest.fixture
+def flaky_bulk_write(monkeypatch):
+    """bulk_write that fails while `state["down"]` is set."""
+    state = {"down": False}
+    real_bulk_write = AsyncMongoMockCollection.bulk_write
+
+    async def bulk_write(self, ops, ordered=True):
+        if state["down"]:
+            raise ConnectionError("primary stepped down")
+        return await real_bulk_write(self, ops, ordered=ordered)
+
+    monkeypatch.setattr(AsyncMongoMockCollection, "bulk_write", bulk_write)
+    return state
+
+
+def chat_day(monkeypatch, day: str, coins: int):
+    """The in-memory counters as process_chat_coins() leaves them after `coins` today."""
+    monkeypatch.setattr(economy, "_chat_day", day)
+    monkeypatch.setattr(economy, "_chat_today", {(GUILD, USER): coins})
+    monkeypatch.setattr(economy, "_chat_pending", {(GUILD, USER): coins})
+
+
+async def test_failed_flush_is_retried_with_its_own_day(db, flaky_bulk_write, monkeypatch):
+    chat_day(monkeypatch, "2026-01-01", 40)
+    flaky_bulk_write["down"] = True
+    await economy.flush_chat_coins(db)
+    assert [day for _, day, _ in economy._chat_retry] == ["2026-01-01"]
+
+    # Midnight passes before the database is back
+    chat_day(monkeypatch, "2026-01-02", 5)
+    flaky_bulk_write["down"] = False
+    await economy.flush_chat_coins(db)
+
+    user = await db.users.find_one(user_key(USER, GUILD))
+    assert user["balance"] == user["net_worth"] == 45
+    # Today's counter holds only today's coins
+    assert (user["daily_chat_coins"], user["daily_chat_reset"]) == (5, "2026-01-02")
+    assert not economy._chat_retry and not economy._chat_pending
+
+
+async def test_late_write_of_yesterday_keeps_todays_counter(db, flaky_bulk_write, monkeypatch):
+    chat_day(monkeypatch, "2026-01-02", 5)
+    await economy.flush_chat_coins(db)
+
+    # Yesterday's batch, retried after today's already landed
+    await economy._write_chat_grants(db, {(GUILD, USER): 40}, "2026-01-01", {(GUILD, USER): 40})
+
+    user = await db.users.find_one(user_key(USER, GUILD))
+    assert user["balance"] == 45
+    assert (user["daily_chat_coins"], user["daily_chat_reset"]) == (5, "2026-01-02")
@@ -0,0 +1,71 @@
+# tests/test_database.py — Driver selection, and the driver benchmark for the
+# on_message write path (needs MONGO_TEST_URI).
+
+import inspect
+import time
+import uuid
+
+import pytest
+
+import config
+from models import database, user_model
+from models.mongo_storage import MongoStorage
+from tests.conftest import MONGO_TEST_URI
+
+GUILD = 1
+
+
+def test_connect_picks_the_configured_driver(monkeypatch):
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from pymongo import AsyncMongoClient
+
+    monkeypatch.setattr(config, "MONGO_DRIVER", "pymongo")
+    assert isinstance(database.connect("mongodb://localhost:1"), AsyncMongoClient)
+    monkeypatch.setattr(config, "MONGO_DRIVER", "motor")
+    assert isinstance(database.connect("mongodb://localhost:1"), AsyncIOMotorClient)
+
+
+async def test_aggregate_accepts_both_cursor_styles(db):
+    await db.users.insert_many([{"guild_id": GUILD, "xp": n} for n in range(5)])
+    pipeline = [{"$match": {"guild_id": GUILD}}, {"$sort": {"xp": -1}}]
+
+    # Motor (and mongomock) return the cursor itself...
+    assert [d["xp"] for d in await database.aggregate(db.users, pipeline)] == [4, 3, 2, 1, 0]
+
+    # ...PyMongo's async client returns it from a coroutine
+    class AwaitedAggregate:
+        def aggregate(self, pipeline):
+            async def cursor():
+                return db.users.aggregate(pipeline)
+            return cursor()
+
+    assert [d["xp"] for d in await database.aggregate(AwaitedAggregate(), pipeline)] == [4, 3, 2, 1, 0]
+
+
+@pytest.mark.parametrize("driver", ["motor", "pymongo"])
+async def test_driver_write_path_throughput(driver, monkeypatch, record_property):
+    """get_user + record_xp per message, the on_message path; ops/second recorded per driver."""
+    if not MONGO_TEST_URI:
+        pytest.skip("MONGO_TEST_URI not set")
+    monkeypatch.setattr(config, "MONGO_DRIVER", driver)
+    client = database.connect(MONGO_TEST_URI)
+    name = f"bot_bench_{uuid.uuid4().hex[:8]}"
+    store = MongoStorage(client[name])
+    await client[name].meta.insert_one({"_id": "users_schema", "version": 2})
+    await user_model.load_schema_state(client[name])
+    rounds = 2000
+    try:
+        start = time.perf_counter()
+        for i in range(rounds):
+            uid = i % 100
+            user = await store.get_user(uid, GUILD, "xp", "level")
+            await store.record_xp(uid, GUILD, user["xp"] + 10, user["level"], None)
+        elapsed = time.perf_counter() - start
+        record_property(f"{driver}_messages_per_second", round(rounds / elapsed))
+        record_property(f"{driver}_us_per_operation", round(elapsed / (rounds * 2) * 1e6))
+        assert (await store.get_user(0, GUILD))["messages"] == rounds // 100
+    finally:
+        await client.drop_database(name)
+        result = client.close()
+        if inspect.isawaitable(result):
+            await result
@@ -0,0 +1,99 @@
+# tests/test_economy_concurrency.py — Debits are single conditional updates: no
+# double spends and no coins created or destroyed, however calls interleave.
+# racy_db makes gathered calls really interleave; test_naive_debit_overdraws
+# checks that it does, so a non-atomic debit can't slip past these tests.
+
+import asyncio
+import random
+
+import pytest
+
+from models.user_model import get_user, user_filter
+from services import economy_service as economy
+
+GUILD = 1
+
+
+@pytest.fixture
+def db(racy_db):
+    return racy_db
+
+
+async def naive_remove_coins(db, user_id: int, guild_id: int, amount: int) -> bool:
+    """Read, check in Python, then write: the double spend conditional debits prevent."""
+    query = await user_filter(db, user_id, guild_id)
+    user = await db.users.find_one(query)
+    if user["balance"] < amount:
+        return False
+    await db.users.update_one(query, {"$inc": {"balance": -amount, "net_worth": -amount}})
+    return True
+
+
+async def balances(db, *user_ids) -> list[int]:
+    return [(await db.users.find_one({"user_id": uid, "guild_id": GUILD}))["balance"] for uid in user_ids]
+
+
+async def test_concurrent_pays_never_overdraw(db):
+    sender, receivers = 1, list(range(100, 110))
+    await economy.add_coins(db, sender, GUILD, 100)
+
+    results = await asyncio.gather(*(
+        economy.pay(db, sender, random.choice(receivers), GUILD, 1) for _ in range(300)
+    ))
+
+    assert sum(ok for ok, _ in results) == 100
+    assert await balances(db, sender) == [0]
+    assert sum(await balances(db, *receivers)) == 100
+
+
+async def test_pay_conserves_coins_under_contention(db):
+    users = list(range(1, 21))
+    for uid in users:
+        await economy.add_coins(db, uid, GUILD, 50)
+
+    rng = random.Random(42)
+    pairs = [rng.sample(users, 2) for _ in range(1000)]
+    results = await asyncio.gather(*(
+        economy.pay(db, a, b, GUILD, rng.randint(1, 30)) for a, b in pairs
+    ))
+
+    final = await balances(db, *users)
+    assert sum(final) == 50 * len(users)
+    assert min(final) >= 0
+    assert any(ok for ok, _ in results) and not all(ok for ok, _ in results)
+
+
+async def test_naive_debit_overdraws(db):
+    uid = 7
+    await economy.add_coins(db, uid, GUILD, 100)
+
+    removed = await asyncio.gather(*(naive_remove_coins(db, uid, GUILD, 30) for _ in range(10)))
+    # Every caller read 100 before anyone wrote: the checks below would catch this
+    assert sum(removed) > 3
+    assert (await balances(db, uid))[0] < 0
+
+
+async def test_concurrent_debits_respect_balance_and_bank(db):
+    uid = 7
+    await economy.add_coins(db, uid, GUILD, 100)
+
+    removed = await asyncio.gather(*(economy.remove_coins(db, uid, GUILD, 30) for _ in range(10)))
+    assert sum(removed) == 3
+
+    deposits = await asyncio.gather(*(economy.deposit(db, uid, GUILD, 4) for _ in range(10)))
+    user = await get_user(db, uid, GUILD)
+    assert sum(ok for ok, _ in deposits) == 2
+    assert (user["balance"], user["bank"], user["net_worth"]) == (2, 8, 10)
+
+    withdrawals = await asyncio.gather(*(economy.withdraw(db, uid, GUILD, 5) for _ in range(10)))
+    assert sum(ok for ok, _ in withdrawals) == 1
+
+
+async def test_ledger_matches_balances(db):
+    for uid in (1, 2, 3):
+        await economy.add_coins(db, uid, GUILD, 100)
+    await asyncio.gather(*(economy.pay(db, 1 + i % 3, 1 + (i + 1) % 3, GUILD, 40) for i in range(30)))
+
+    for uid in (1, 2, 3):
+        entries = await db.economy_ledger.find({"user_id": uid}).to_list(length=None)
+        assert sum(e["balance"] for e in entries) == (await balances(db, uid))[0]
@@ -0,0 +1,75 @@
+# tests/test_id_schema.py — String IDs written before the int64 switch stay usable
+# while the migration runs, and the migration converts every one of them.
+
+from datetime import datetime
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from models import database, id_schema, user_model
+from models.mongo_storage import INDEXES, MongoStorage
+from services import economy_service as economy
+from services import inventory_service as inventory
+from services import ledger_service as ledger
+
+GUILD, USER = 1, 5
+NOW = datetime(2026, 1, 1)
+
+
+@pytest.fixture
+async def legacy_db(monkeypatch):
+    """A database last written by a version that stored string IDs."""
+    monkeypatch.setattr(id_schema, "MIGRATION_PAUSE_SECONDS", 0)
+    monkeypatch.setattr(id_schema, "_migrating", id_schema._migrating)   # Restored afterwards
+    db = AsyncMongoMockClient()["discord_bot"]
+    await db.meta.insert_one({"_id": "users_schema", "version": 2})
+    await user_model.load_schema_state(db)
+    await database.ensure_indexes(db, economy.INDEXES, inventory.INDEXES, {"warnings": INDEXES["warnings"]})
+    g, u = str(GUILD), str(USER)
+    await db.warnings.insert_one({"guild_id": g, "user_id": u, "moderator_id": "9", "reason": "old", "timestamp": NOW})
+    await db.inventory.insert_one({"guild_id": g, "user_id": u, "item_id": "gem", "quantity": 1, "expires": None})
+    await db.shop_stock.insert_one({"guild_id": g, "item_id": "gem", "remaining": 3})
+    await db.shop_purchases.insert_one({"guild_id": g, "user_id": u, "item_id": "gem", "count": 2})
+    await db.economy_ledger.insert_one(
+        {"guild_id": g, "user_id": u, "reason": "old", "balance": 40, "bank": 0, "ts": NOW}
+    )
+    await id_schema.load_schema_state(db)
+    return db
+
+
+async def test_string_ids_are_read_and_written_in_place_while_migrating(legacy_db):
+    assert id_schema.migration_pending()
+    store = MongoStorage(legacy_db)
+    await store.add_warning({"guild_id": GUILD, "user_id": USER, "moderator_id": 9, "reason": "new",
+                             "timestamp": datetime.utcnow()})
+    assert [w["reason"] for w in await store.get_warnings(USER, GUILD)] == ["new", "old"]
+
+    # Stacks onto the string-ID copy instead of adding an int64 twin
+    await inventory.add_item(legacy_db, GUILD, USER, "gem", "Gem", "collectible")
+    [item] = await legacy_db.inventory.find({"item_id": "gem"}).to_list(length=None)
+    assert (item["guild_id"], item["user_id"], item["quantity"]) == (GUILD, USER, 2)
+
+    # The old purchase count still caps the user
+    assert not await economy._claim_purchase(legacy_db, USER, GUILD, "gem", 2)
+    assert await economy._claim_stock(legacy_db, GUILD, "gem")
+    assert await economy.get_stock(legacy_db, GUILD) == {"gem": 2}
+
+    await ledger.record(legacy_db, GUILD, USER, "new", balance=2)
+    assert (await ledger.balance_at(legacy_db, GUILD, USER, datetime.utcnow()))["balance"] == 42
+
+
+async def test_migration_converts_every_collection(legacy_db):
+    await id_schema.migrate(legacy_db)
+
+    assert not id_schema.migration_pending()
+    assert (await legacy_db.meta.find_one({"_id": "ids_schema"}))["version"] == 2
+    for name, fields in id_schema.ID_FIELDS.items():
+        strings = {"$or": [{f: {"$type": "string"}} for f in fields]}
+        assert await legacy_db[name].count_documents(strings) == 0, name
+    warning = await legacy_db.warnings.find_one()
+    assert (warning["guild_id"], warning["user_id"], warning["moderator_id"]) == (GUILD, USER, 9)
+
+    # Dual reads are off, and the converted documents are found by int alone
+    assert id_schema.snowflake(GUILD) == GUILD
+    assert len(await MongoStorage(legacy_db).get_warnings(USER, GUILD)) == 1
+    assert (await ledger.recent_entries(legacy_db, GUILD, USER))[0]["balance"] == 40
@@ -0,0 +1,373 @@
+# tests/test_index_audit.py — Every query shape the services issue must be served
+# by an index from the INDEXES manifests: no collection scan, no in-memory sort.
+#
+# The shapes aren't listed by hand: _drive() calls the service functions the cogs
+# use against a database whose collections record the filter and sort of every
+# query they run, so the audit follows the queries as they change.
+# test_shapes_have_an_index checks the recorded shapes against the manifests
+# statically (equality keys, then the sort, per index) and always runs.
+# test_explain records them on a seeded real server (MONGO_TEST_URI) and asserts
+# on each one's explain(). Run-once migrations and backfills are left out on
+# purpose. Add a call to _drive() whenever a new service function is written.
+
+import random
+from contextlib import suppress
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from pymongo import TEXT, IndexModel
+
+from models import database, mongo_storage, user_model
+from models.mongo_storage import MongoStorage
+from services import economy_service as economy
+from services import giveaway_service, guild_config_service, moderation_service
+from services import inventory_service as inventory
+from services import ledger_service as ledger
+
+MANIFESTS = (
+    user_model.INDEXES, mongo_storage.INDEXES, economy.INDEXES,
+    ledger.INDEXES, inventory.INDEXES,
+)
+
+G, U = 1, 7
+NOW = datetime(2026, 1, 1, 12)
+DAY = NOW.date().isoformat()
+
+
+def key(uid: int) -> dict:
+    return user_model.user_key(uid, G)["_id"]
+
+
+# ── Recording the services' queries ────────────────────────────────────────
+
+@dataclass
+class Shape:
+    collection: str
+    filter: dict
+    sort: list[tuple[str, int]] = field(default_factory=list)
+
+    @property
+    def text(self) -> bool:
+        """$text query: ranked by textScore, which no index can provide."""
+        return "$text" in self.filter
+
+    @property
+    def name(self) -> str:
+        return f"{self.collection} {_skeleton(self.filter)} sort={self.sort}"
+
+
+def _skeleton(value):
+    """A filter with its values blanked out: queries differing only in values are one shape."""
+    if isinstance(value, dict):
+        return {k: _skeleton(v) for k, v in sorted(value.items())}
+    if isinstance(value, list):
+        return [_skeleton(v) for v in value[:1]]
+    return type(value).__name__
+
+
+def _sort(sort) -> list[tuple[str, int]]:
+    return list(sort.items()) if isinstance(sort, dict) else list(sort or [])
+
+
+def _lookup_filter(expr: dict) -> dict:
+    """{"$and": [{"$eq": ["$field", "$$var"]}, ...]} from a $lookup → the equivalent find filter."""
+    return {eq["$eq"][0].lstrip("$"): 0 for eq in expr.get("$and", [expr])}
+
+
+class _RecordingCollection:
+    """Passes every call through to `collection`, noting the shape of each query."""
+
+    def __init__(self, collection, shapes: dict):
+        self._collection = collection
+        self._shapes = shapes
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    def _note(self, collection: str, filter: dict | None, sort=None):
+        shape = Shape(collection, filter or {}, _sort(sort))
+        self._shapes.setdefault(shape.name, shape)
+
+    def with_options(self, **options):
+        return _RecordingCollection(self._collection.with_options(**options), self._shapes)
+
+    def find(self, filter=None, *args, sort=None, **kwargs):
+        self._note(self.name, filter, sort)
+        return self._collection.find(filter, *args, sort=sort, **kwargs)
+
+    async def find_one(self, filter=None, *args, sort=None, **kwargs):
+        self._note(self.name, filter, sort)
+        return await self._collection.find_one(filter, *args, sort=sort, **kwargs)
+
+    def aggregate(self, pipeline, *args, **kwargs):
+        for i, stage in enumerate(pipeline):
+            after = pipeline[i + 1] if i + 1 < len(pipeline) else {}
+            if i == 0 and "$match" in stage:
+                self._note(self.name, stage["$match"], after.get("$sort"))
+            lookup = stage.get("$lookup", {})
+            if lookup.get("pipeline") and "$match" in lookup["pipeline"][0]:
+                inner = lookup["pipeline"]
+                sort = inner[1].get("$sort") if len(inner) > 1 else None
+                self._note(lookup["from"], _lookup_filter(inner[0]["$match"]["$expr"]), sort)
+        return self._collection.aggregate(pipeline, *args, **kwargs)
+
+    async def bulk_write(self, requests, *args, **kwargs):
+        for request in requests:
+            self._note(self.name, getattr(request, "_filter", None))
+        return await self._collection.bulk_write(requests, *args, **kwargs)
+
+
+def _filtered(method: str):
+    async def call(self, filter, *args, **kwargs):
+        self._note(self.name, filter, kwargs.get("sort"))
+        return await getattr(self._collection, method)(filter, *args, **kwargs)
+    return call
+
+
+for _method in ("count_documents", "update_one", "update_many", "delete_one", "delete_many",
+                "find_one_and_update"):
+    setattr(_RecordingCollection, _method, _filtered(_method))
+
+
+class _RecordingDatabase:
+    def __init__(self, db):
+        self._db = db
+        self.shapes: dict[str, Shape] = {}
+
+    def __getitem__(self, name):
+        return _RecordingCollection(self._db[name], self.shapes)
+
+    def __getattr__(self, name):
+        return self[name]
+
+
+def _unsupported_on_mongomock():
+    """For calls using $merge or $text, which mongomock lacks: their queries are
+    recorded before it gives up. A real server runs them through."""
+    return suppress(NotImplementedError)
+
+
+async def _drive(db):
+    """Call every service function that queries MongoDB, the way the cogs do."""
+    store = MongoStorage(db)
+
+    # Leveling
+    await store.get_user(U, G, "xp", "level")
+    await store.record_xp(U, G, 50, 1, NOW)
+    await store.set_xp(U, G, 80, 1)
+    await store.xp_rank(G, 80)
+    await store.xp_leaderboard(G)
+    await store.reset_xp(U, G)
+
+    # Warnings
+    await moderation_service.add_warning(store, U, G, "spam", 9)
+    await moderation_service.get_warnings(store, U, G)
+    await moderation_service.get_warnings(store, U, G, stale_ok=True)
+    await moderation_service.clear_warnings(store, U, G)
+
+    # Giveaways
+    giveaway = await giveaway_service.create_giveaway(store, G, 2, 3, "Nitro", 1, NOW)
+    await store.get_giveaway(giveaway["_id"])
+    await store.find_giveaway(G, 3, ended=False)
+    await giveaway_service.toggle_entry(store, giveaway["_id"], str(U))
+    await store.active_giveaways(G)
+    await store.due_giveaways(NOW)
+    await store.finish_giveaway(giveaway["_id"], [str(U)])
+    await store.find_giveaway(G, 3, ended=True)
+
+    # Tickets
+    ticket = {"guild_id": G, "user_id": U, "channel_id": None, "status": "open",
+              "created_at": NOW, "closed_at": None, "transcript": []}
+    await store.insert_ticket(ticket)
+    await store.set_ticket_channel(ticket["_id"], 4)
+    await store.open_tickets()
+    await store.close_ticket(ticket["_id"], NOW, ["refund please"])
+    with _unsupported_on_mongomock():
+        await store.search_tickets(G, "refund", U, NOW - timedelta(days=1), NOW, 0, 10)
+    await store.delete_ticket(ticket["_id"])
+
+    # Guild settings
+    await guild_config_service.update_setting(store, G, "BANK_INTEREST_BPS", 100)
+    await guild_config_service.load_all(store)
+    guild_config_service._cache.clear()
+    await guild_config_service.refresh(store)
+
+    # Economy
+    await economy.add_coins(db, U, G, 500)
+    await economy.remove_coins(db, U, G, 10)
+    await economy.set_coins(db, U, G, 400)
+    await economy.deposit(db, U, G, 100)
+    await economy.withdraw(db, U, G, 50)
+    await economy.pay(db, U, U + 1, G, 10)
+    await economy.get_balance(db, U, G)
+    await economy.claim_daily(db, U, G)
+    await economy.do_work(db, U, G)
+    for ranking in ("net_worth", "balance", "bank"):
+        await economy.richest(db, G, ranking)
+    await economy.process_chat_coins(db, U, G)
+    await economy.flush_chat_coins(db)
+    await economy.load_chat_counters(db)
+    with _unsupported_on_mongomock():
+        await economy.apply_rate(db, G, "bank", 0.01)
+    with _unsupported_on_mongomock():
+        await economy.grant_all(db, G, 5)
+    with _unsupported_on_mongomock():
+        await economy.grant_all(db, G, 5, user_ids=[U, U + 2])
+    with _unsupported_on_mongomock():
+        await economy.pay_scheduled_interest(db, G)
+
+    # Shop and inventory
+    await economy.add_shop_item(db, G, {"id": "gem", "name": "Gem", "price": 10, "type": "collectible",
+                                        "stock": 5, "per_user_limit": 2})
+    await economy.load_shops(db)
+    economy.invalidate_shop(G)
+    await economy.buy_item(db, U, G, "gem")
+    await economy.buy_item(db, U + 3, G, "gem")   # Broke: the claims are handed back
+    await economy.get_stock(db, G)
+    await inventory.get_page(db, G, U)
+    await inventory.take_expired(db, NOW)
+    await economy.remove_shop_item(db, G, "gem")
+    await economy.reset_economy(db, U, G)
+
+    # Ledger
+    await ledger.flush(db)
+    with _unsupported_on_mongomock():
+        await ledger.compact(db)   # Seeds the opening snapshots
+    await db.meta.update_one(
+        {"_id": "ledger_snapshots"}, {"$set": {"last_compacted": NOW - timedelta(days=1)}}, upsert=True,
+    )
+    with _unsupported_on_mongomock():
+        await ledger.compact(db)
+    await ledger.balance_at(db, G, U, datetime.utcnow())
+    await ledger.recent_entries(db, G, U)
+
+
+async def _record(db) -> list[Shape]:
+    recording = _RecordingDatabase(db)
+    await _drive(recording)
+    return list(recording.shapes.values())
+
+
+# ── Static check ───────────────────────────────────────────────────────────
+
+def _is_equality(value) -> bool:
+    if not isinstance(value, dict) or not any(k.startswith("$") for k in value):
+        return True   # A plain value or an embedded document
+    return set(value) <= {"$eq", "$in"}
+
+
+def _serves(index, shape: Shape) -> bool:
+    doc = index.document
+    keys = list(doc["key"].items())
+    partial = doc.get("partialFilterExpression", {})
+    if any(shape.filter.get(k) != v for k, v in partial.items()):
+        return False
+    if any(v == TEXT for _, v in keys):
+        prefix = [k for k, v in keys if v != TEXT]
+        return shape.text and all(_is_equality(shape.filter.get(k, {"$x": 0})) for k in prefix)
+    if shape.text:
+        return False
+    names = [k for k, _ in keys]
+    if doc.get("sparse") and names[0] not in shape.filter:
+        return False
+
+    # Equality keys first, then the sort (either direction), as the planner needs
+    eq = {k for k, v in shape.filter.items() if _is_equality(v)}
+    m = 0
+    while m < len(names) and names[m] in eq:
+        m += 1
+    if shape.sort:
+        wanted = keys[m:m + len(shape.sort)]
+        return wanted == shape.sort or wanted == [(k, -d) for k, d in shape.sort]
+    return m > 0 or names[0] in shape.filter
+
+
+def _indexes(collection: str) -> list:
+    return [IndexModel([("_id", 1)])] + [i for m in MANIFESTS for i in m.get(collection, [])]
+
+
+async def test_shapes_have_an_index(db):
+    shapes = await _record(db)
+    # Every collection with declared indexes was queried, so none was left undriven
+    assert {name for m in MANIFESTS for name in m} <= {s.collection for s in shapes}
+    unserved = [s.name for s in shapes if not any(_serves(i, s) for i in _indexes(s.collection))]
+    assert not unserved, f"No index in the manifests serves: {unserved}"
+
+
+# ── explain() on a real server ─────────────────────────────────────────────
+
+async def _seed(db):
+    rng = random.Random(1)
+    await db.users.insert_many([{
+        "_id": key(u), "guild_id": G, "user_id": u, "xp": rng.randint(0, 5000),
+        "balance": rng.randint(0, 900), "bank": rng.randint(0, 900), "net_worth": 0,
+        "daily_chat_reset": DAY if u % 3 else "2025-12-31", "daily_chat_coins": u % 7,
+    } for u in range(500)])
+    await db.warnings.insert_many([
+        {"guild_id": G, "user_id": i % 40, "reason": "r", "timestamp": NOW - timedelta(hours=i)}
+        for i in range(300)
+    ])
+    await db.giveaways.insert_many([
+        {"guild_id": i % 5, "message_id": 1000 + i, "ended": i % 4 == 0, "ends_at": NOW + timedelta(hours=i - 100)}
+        for i in range(300)
+    ])
+    await db.tickets.insert_many([
+        {"guild_id": G, "user_id": 100 + i, "status": "open" if i % 10 == 0 else "closed",
+         "closed_at": NOW, "transcript": [rng.choice(["refund please", "hello", "ban appeal"])]}
+        for i in range(300)
+    ])
+    await db.guilds.insert_many([
+        {"guild_id": 100 + i, **({"settings_version": 1} if i % 3 == 0 else {}),
+         **({"shop_items": [{"id": "i1"}]} if i % 4 == 0 else {})}
+        for i in range(300)
+    ])
+    await db.inventory.insert_many([
+        {"guild_id": G, "user_id": 100 + i % 50, "item_id": f"i{i}",
+         **({"expires": NOW + timedelta(hours=i - 150)} if i % 2 else {})}
+        for i in range(300)
+    ])
+    await db.shop_stock.insert_many([
+        {"guild_id": 100 + i % 10, "item_id": f"i{i}", "remaining": 5} for i in range(100)
+    ])
+    await db.shop_purchases.insert_many([
+        {"guild_id": G, "user_id": 100 + i, "item_id": "i1", "count": 1} for i in range(100)
+    ])
+    await db.economy_ledger.insert_many([
+        {"guild_id": G, "user_id": i % 50, "balance": 1, "bank": 0, "ts": NOW - timedelta(minutes=i)}
+        for i in range(500)
+    ])
+    await db.economy_snapshots.insert_many([
+        {"guild_id": G, "user_id": i % 50, "balance": 1, "bank": 0, "at": NOW - timedelta(days=i)}
+        for i in range(300)
+    ])
+
+
+def _stages(plan: dict):
+    yield plan.get("stage")
+    for child in ("inputStage", "queryPlan", "outerStage", "innerStage"):
+        if child in plan:
+            yield from _stages(plan[child])
+    for child in plan.get("inputStages", []):
+        yield from _stages(child)
+
+
+async def test_explain(server_db):
+    await database.ensure_indexes(server_db, *MANIFESTS)
+    await _seed(server_db)
+
+    problems = []
+    for shape in await _record(server_db):
+        find = {"find": shape.collection, "filter": shape.filter}
+        sort = dict(shape.sort)
+        if shape.text:
+            sort = {"score": {"$meta": "textScore"}, "closed_at": -1}
+            find["projection"] = {"score": {"$meta": "textScore"}}
+        if sort:
+            find["sort"] = sort
+        explained = await server_db.command({"explain": find, "verbosity": "queryPlanner"})
+        stages = set(_stages(explained["queryPlanner"]["winningPlan"]))
+        if "COLLSCAN" in stages:
+            problems.append(f"{shape.name}: collection scan")
+        if "SORT" in stages and not shape.text:
+            problems.append(f"{shape.name}: in-memory sort")
+    assert not problems, problems
@@ -0,0 +1,90 @@
+# tests/test_log_service.py — How the log dispatcher handles the errors Discord
+# can return: split rejected payloads, retry outages, and always pace the sends.
+
+import asyncio
+from types import SimpleNamespace
+
+import discord
+import pytest
+
+import config
+from services.log_service import LogDispatcher
+
+INTERVAL = 0.05
+
+
+def http_error(status: int) -> discord.HTTPException:
+    return discord.HTTPException(SimpleNamespace(status=status, reason="error"), "error")
+
+
+class Channel:
+    """Log channel stub: records delivered embeds and the time of every send attempt."""
+
+    def __init__(self, fail):
+        self.id = 1
+        self.fail = fail        # fail(batch) -> HTTPException to raise, or None
+        self.delivered = []
+        self.attempts = []
+
+    async def send(self, embeds):
+        self.attempts.append(asyncio.get_running_loop().time())
+        error = self.fail(embeds)
+        if error:
+            raise error
+        self.delivered.extend(e.title for e in embeds)
+
+
+@pytest.fixture(autouse=True)
+def fast_logs(monkeypatch):
+    monkeypatch.setattr(config, "LOG_FLUSH_SECONDS", 0.01)
+    monkeypatch.setattr(config, "LOG_MIN_SEND_INTERVAL", INTERVAL)
+
+
+def queue(dispatcher: LogDispatcher, channel: Channel, *titles: str):
+    for title in titles:
+        dispatcher.enqueue(channel, discord.Embed(title=title))
+
+
+async def wait_for(check, timeout: float = 2.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not check() and loop.time() < deadline:
+        await asyncio.sleep(0.01)
+    assert check()
+
+
+def paced(channel: Channel) -> bool:
+    gaps = [b - a for a, b in zip(channel.attempts, channel.attempts[1:])]
+    return all(gap >= INTERVAL * 0.9 for gap in gaps)
+
+
+async def test_rejected_payload_is_split_down_to_the_bad_embed():
+    channel = Channel(lambda batch: http_error(400) if any(e.title == "bad" for e in batch) else None)
+    dispatcher = LogDispatcher()
+    queue(dispatcher, channel, "a", "b", "bad", "c")
+
+    await wait_for(lambda: len(channel.delivered) == 3)
+    await asyncio.sleep(INTERVAL * 2)
+    assert channel.delivered == ["a", "b", "c"]
+    assert paced(channel)
+
+
+async def test_server_error_retries_the_whole_batch():
+    outage = iter([http_error(503), http_error(500)])
+    channel = Channel(lambda batch: next(outage, None))
+    dispatcher = LogDispatcher()
+    queue(dispatcher, channel, "a", "b", "c")
+
+    await wait_for(lambda: channel.delivered == ["a", "b", "c"])
+    # Two failed attempts and one success: no splitting, no burst
+    assert len(channel.attempts) == 3
+    assert paced(channel)
+
+
+async def test_shutdown_during_an_outage_gives_up():
+    channel = Channel(lambda batch: http_error(502))
+    dispatcher = LogDispatcher()
+    queue(dispatcher, channel, "a", "b")
+
+    await asyncio.wait_for(dispatcher.flush_all(), timeout=2)
+    assert channel.delivered == []
@@ -0,0 +1,108 @@
+# tests/test_read_routing.py — Staleness-tolerant reads go to secondaries, a
+# user's own reads and all writes stay on the primary.
+#
+# The simulated replica set is two mongomock databases: writes land on the
+# primary and reach the secondary only when the test calls replicate(), so a
+# read that was routed to the secondary visibly misses recent writes.
+
+from datetime import datetime
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient, AsyncMongoMockCollection
+from pymongo import AsyncMongoClient
+from pymongo.read_preferences import Primary, SecondaryPreferred
+
+import config
+from models import database
+from models.mongo_storage import MongoStorage
+from services import economy_service as economy
+
+GUILD = 1
+
+
+class ReplicaSet:
+    def __init__(self, primary):
+        self.primary = primary
+        self.secondary = AsyncMongoMockClient()[primary.name]
+        self.staleness: list[int] = []   # max_staleness of every routed collection
+
+    def route(self, collection, read_preference=None, **options):
+        if isinstance(read_preference, SecondaryPreferred):
+            self.staleness.append(read_preference.max_staleness)
+            return self.secondary[collection.name]
+        return collection
+
+    async def replicate(self):
+        for name in await self.primary.list_collection_names():
+            await self.secondary[name].delete_many({})
+            docs = await self.primary[name].find().to_list(length=None)
+            if docs:
+                await self.secondary[name].insert_many(docs)
+
+
+@pytest.fixture
+def replica(db, monkeypatch):
+    replica = ReplicaSet(db)
+    monkeypatch.setattr(config, "READ_MAX_STALENESS_SECONDS", 90)
+    monkeypatch.setattr(AsyncMongoMockCollection, "with_options",
+                        lambda collection, **options: replica.route(collection, **options))
+    return replica
+
+
+def test_stale_ok_sets_secondary_preferred_with_bound(monkeypatch):
+    users = AsyncMongoClient("mongodb://localhost:1")["bot"].users   # No I/O until used
+    monkeypatch.setattr(config, "READ_MAX_STALENESS_SECONDS", 90)
+    routed = database.stale_ok(users)
+    assert routed.read_preference == SecondaryPreferred(max_staleness=90)
+    assert database.stale_ok(users) is routed
+    assert users.read_preference == Primary()
+
+
+def test_stale_ok_disabled_reads_primary(monkeypatch):
+    users = AsyncMongoClient("mongodb://localhost:1")["bot"].users
+    monkeypatch.setattr(config, "READ_MAX_STALENESS_SECONDS", 0)
+    assert database.stale_ok(users) is users
+
+
+async def test_leaderboard_and_rank_may_lag(replica):
+    store = MongoStorage(replica.primary)
+    await store.set_xp(1, GUILD, 100, 1)
+
+    assert await store.xp_leaderboard(GUILD) == []
+    assert await store.xp_rank(GUILD, 50) == 1
+    await replica.replicate()
+    assert [u["user_id"] for u in await store.xp_leaderboard(GUILD)] == [1]
+    assert await store.xp_rank(GUILD, 50) == 2
+    assert set(replica.staleness) == {90}
+
+
+async def test_own_reads_see_own_writes(replica):
+    store = MongoStorage(replica.primary)
+    await store.record_xp(1, GUILD, 40, 1, datetime.utcnow())
+    assert (await store.get_user(1, GUILD, "xp"))["xp"] == 40
+
+    await economy.add_coins(replica.primary, 1, GUILD, 250)
+    assert await economy.get_balance(replica.primary, 1, GUILD) == {"balance": 250, "bank": 0}
+    assert replica.staleness == []
+
+
+async def test_warnings_route_only_when_asked(replica):
+    store = MongoStorage(replica.primary)
+    await store.add_warning({"guild_id": GUILD, "user_id": 5, "reason": "spam",
+                             "moderator_id": 9, "timestamp": datetime.utcnow()})
+
+    assert len(await store.get_warnings(5, GUILD)) == 1
+    assert await store.get_warnings(5, GUILD, stale_ok=True) == []
+    await replica.replicate()
+    assert len(await store.get_warnings(5, GUILD, stale_ok=True)) == 1
+
+
+async def test_giveaway_listing_may_lag_but_lookups_do_not(replica):
+    store = MongoStorage(replica.primary)
+    doc = {"guild_id": GUILD, "channel_id": 3, "message_id": 4, "prize": "p", "winners_count": 1,
+           "ends_at": datetime.utcnow(), "ended": False, "entries": []}
+    await store.insert_giveaway(doc)
+
+    assert await store.active_giveaways(GUILD) == []
+    assert (await store.find_giveaway(GUILD, 4))["_id"] == doc["_id"]
+    assert (await store.toggle_giveaway_entry(doc["_id"], "u1"))["entries"] == ["u1"]
@@ -0,0 +1,56 @@
+# tests/test_shop_catalog.py — Shop catalog edits and the catalog cache.
+
+import asyncio
+
+from services import economy_service as economy
+
+GUILD = 1
+
+
+def item(item_id: str, price: int = 10) -> dict:
+    return {"id": item_id, "name": item_id.title(), "price": price, "type": "collectible"}
+
+
+async def test_replacing_an_item_never_hides_it(racy_db):
+    for item_id in ("a", "b", "c"):
+        await economy.add_shop_item(racy_db, GUILD, item(item_id))
+
+    async def read():
+        guild = await racy_db.guilds.find_one({"guild_id": GUILD})
+        return [i["id"] for i in guild["shop_items"]]
+
+    edits = [economy.add_shop_item(racy_db, GUILD, item("b", price)) for price in range(20)]
+    reads = await asyncio.gather(*edits, *(read() for _ in range(40)))
+
+    # Every reader saw the whole catalog, in its original order
+    assert all(ids == ["a", "b", "c"] for ids in reads[len(edits):])
+    assert len(await read()) == 3
+
+
+async def test_add_creates_the_guild_document(db):
+    await economy.add_shop_item(db, GUILD, item("a"))
+    await economy.add_shop_item(db, GUILD, item("a", price=5))
+    assert await db.guilds.count_documents({}) == 1
+    assert [i["price"] for i in await economy.get_shop(db, GUILD)] == [5]
+
+
+async def test_stale_shop_reloads_once_per_guild(db, monkeypatch):
+    calls = []
+    release = asyncio.Event()
+
+    async def get_shop(db, guild_id):
+        calls.append(guild_id)
+        await release.wait()
+
+    monkeypatch.setattr(economy, "get_shop", get_shop)
+    for _ in range(50):   # A user typing into /buy's autocomplete
+        economy.refresh_shop_soon(db, GUILD)
+    await asyncio.sleep(0)
+    assert calls == [GUILD]
+
+    release.set()
+    await asyncio.gather(*economy._background)
+    economy.refresh_shop_soon(db, GUILD)   # Still stale here: the next keystroke may reload again
+    await asyncio.sleep(0)
+    assert calls == [GUILD, GUILD]
+    await asyncio.gather(*economy._background)
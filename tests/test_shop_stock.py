@@ -0,0 +1,104 @@
+# tests/test_shop_stock.py — Limited drops: 1,000 concurrent buyers race for the
+# last copies; stock, purchase caps and coins must all stay consistent.
+# racy_db interleaves the buyers' calls (see conftest), so the race is real.
+
+import asyncio
+import time
+
+import pytest
+
+from models import database
+from services import economy_service as economy
+from services import inventory_service as inventory
+
+GUILD = 1
+PRICE = 10
+
+
+@pytest.fixture
+async def shop(racy_db):
+    await database.ensure_indexes(racy_db, economy.INDEXES, inventory.INDEXES)
+    return racy_db
+
+
+async def add_item(db, stock=None, per_user_limit=None):
+    item = {"id": "drop", "name": "Limited Drop", "price": PRICE, "type": "collectible"}
+    if stock is not None:
+        item["stock"] = stock
+    if per_user_limit is not None:
+        item["per_user_limit"] = per_user_limit
+    await economy.add_shop_item(db, GUILD, item)
+
+
+async def test_thousand_buyers_get_exactly_the_stock(shop, request, record_property):
+    await add_item(shop, stock=50)
+    buyers = range(1, 1001)
+    for uid in buyers:
+        await economy.add_coins(shop, uid, GUILD, PRICE)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(economy.buy_item(shop, uid, GUILD, "drop") for uid in buyers))
+    elapsed = time.perf_counter() - start
+    if request.node.callspec.params["racy_db"] == "mongodb":
+        # mongomock runs in-process: only a real server gives a meaningful rate
+        record_property("buys_per_second", round(len(buyers) / elapsed))
+
+    winners = [uid for uid, (ok, _) in zip(buyers, results) if ok]
+    assert len(winners) == 50
+    assert (await economy.get_stock(shop, GUILD))["drop"] == 0
+    assert await shop.inventory.count_documents({"item_id": "drop"}) == 50
+    # Only the winners paid
+    spent = await shop.users.count_documents({"guild_id": GUILD, "balance": 0})
+    assert spent == 50
+
+
+async def test_naive_stock_claim_oversells(shop, monkeypatch):
+    async def naive_claim_stock(db, guild_id, item_id):
+        """Read, check in Python, then write: what the conditional claim prevents."""
+        query = {"guild_id": guild_id, "item_id": item_id}
+        if (await db.shop_stock.find_one(query))["remaining"] <= 0:
+            return False
+        await db.shop_stock.update_one(query, {"$inc": {"remaining": -1}})
+        return True
+
+    monkeypatch.setattr(economy, "_claim_stock", naive_claim_stock)
+    await add_item(shop, stock=5)
+    buyers = range(1, 51)
+    for uid in buyers:
+        await economy.add_coins(shop, uid, GUILD, PRICE)
+
+    results = await asyncio.gather(*(economy.buy_item(shop, uid, GUILD, "drop") for uid in buyers))
+    # The checks above would catch this
+    assert sum(ok for ok, _ in results) > 5
+
+
+async def test_failed_payment_hands_the_copy_back(shop):
+    await add_item(shop, stock=5)
+    broke, rich = range(1, 11), range(11, 16)
+    for uid in rich:
+        await economy.add_coins(shop, uid, GUILD, PRICE)
+
+    buyers = [*broke, *rich]
+    results = await asyncio.gather(*(economy.buy_item(shop, uid, GUILD, "drop") for uid in buyers))
+    won = {uid for uid, (ok, _) in zip(buyers, results) if ok}
+    assert won <= set(rich)
+
+    # A broke buyer holds a copy until its debit fails, so a rich one can see
+    # "Sold out!" mid-race; the copy is back by the time they try again
+    retries = await asyncio.gather(*(economy.buy_item(shop, uid, GUILD, "drop") for uid in rich if uid not in won))
+    assert len(won) + sum(ok for ok, _ in retries) == 5
+    assert (await economy.get_stock(shop, GUILD))["drop"] == 0
+    assert await shop.inventory.count_documents({"user_id": {"$in": list(broke)}}) == 0
+
+
+async def test_per_user_limit_under_double_clicks(shop):
+    await add_item(shop, per_user_limit=2)
+    await economy.add_coins(shop, 1, GUILD, PRICE * 10)
+
+    results = await asyncio.gather(*(economy.buy_item(shop, 1, GUILD, "drop") for _ in range(10)))
+
+    assert sum(ok for ok, _ in results) == 2
+    user = await shop.users.find_one({"user_id": 1, "guild_id": GUILD})
+    assert user["balance"] == PRICE * 8
+    item = await shop.inventory.find_one({"user_id": 1, "item_id": "drop"})
+    assert item["quantity"] == 2
@@ -0,0 +1,62 @@
+# tests/test_startup.py — setup_hook() timing on the SQLite backend: cog setups
+# overlap, every phase is timed, and SQLite startups skip the MongoDB modules.
+
+import asyncio
+import os
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import AsyncMock
+
+import pytest
+
+import config
+
+ROOT = Path(__file__).resolve().parent.parent
+COG_SETUP_SECONDS = 0.2   # Simulated database round trips in each cog's setup()
+
+
+@pytest.fixture
+def bot_module(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)   # bot.py opens bot.log in the working directory on import
+    monkeypatch.setattr(config, "STORAGE_BACKEND", "sqlite")
+    monkeypatch.setattr(config, "SQLITE_PATH", str(tmp_path / "bot.db"))
+    monkeypatch.setattr(config, "CACHE_BACKEND", "memory")
+    import bot
+    return bot
+
+
+async def test_setup_hook_loads_cogs_concurrently(bot_module, monkeypatch, caplog):
+    bot = bot_module.CommunityBot()
+    loaded = []
+
+    async def load_extension(name):
+        await asyncio.sleep(COG_SETUP_SECONDS)
+        loaded.append(name)
+
+    monkeypatch.setattr(bot, "load_extension", load_extension)
+    monkeypatch.setattr(bot, "sync_commands", AsyncMock())
+    try:
+        await bot.setup_hook()
+    finally:
+        await bot.store.close()
+
+    assert bot.db is None
+    assert "commands.economy" not in loaded and "commands.leveling" in loaded
+    skipped = [r.getMessage() for r in caplog.records if r.levelname == "WARNING" and "Skipped cog" in r.getMessage()]
+    assert len(skipped) == 2 and any("commands.economy" in m for m in skipped)
+    assert {"database", "cogs", "command sync"} <= bot.startup_timings.keys()
+    # One setup's worth of waiting, not one per cog
+    assert bot.startup_timings["cogs"] < COG_SETUP_SECONDS * len(loaded) / 2
+    bot.sync_commands.assert_awaited_once()
+
+
+def test_sqlite_import_skips_mongo_modules(tmp_path):
+    probe = (
+        "import sys, bot; "
+        "print(','.join(m for m in ('models.mongo_storage', 'services.economy_service') if m in sys.modules))"
+    )
+    env = {**os.environ, "PYTHONPATH": str(ROOT), "STORAGE_BACKEND": "sqlite"}
+    result = subprocess.run([sys.executable, "-c", probe], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
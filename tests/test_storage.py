@@ -0,0 +1,246 @@
+# tests/test_storage.py — One conformance suite for every Storage backend.
+#
+# Runs against SQLite, mongomock and (with MONGO_TEST_URI) a real MongoDB. Tests
+# marked server_only rely on partial unique indexes or $text search, which
+# mongomock doesn't implement, so they skip on it.
+
+import time
+from contextlib import AsyncExitStack
+from datetime import datetime, timedelta
+
+import pytest
+from pymongo import TEXT
+
+from models import database, user_model
+from models.mongo_storage import INDEXES, MongoStorage
+from models.sqlite_storage import SQLiteStorage
+from tests.conftest import mock_db, server_database
+
+GUILD, OTHER_GUILD = 1, 2
+# Millisecond precision: what MongoDB keeps
+NOW = datetime.utcnow().replace(microsecond=123000)
+
+
+def _mongomock_indexes(manifest: dict) -> dict:
+    """mongomock enforces a partial unique index on every document and can't build text indexes."""
+    return {
+        name: [i for i in indexes
+               if "partialFilterExpression" not in i.document and TEXT not in i.document["key"].values()]
+        for name, indexes in manifest.items()
+    }
+
+
+async def _mongo_storage(db, manifests) -> MongoStorage:
+    await database.ensure_indexes(db, *manifests)
+    return MongoStorage(db)
+
+
+@pytest.fixture(params=["sqlite", "mongomock", "mongodb"])
+async def store(request, tmp_path):
+    backend = request.param
+    manifests = (user_model.INDEXES, INDEXES)
+    async with AsyncExitStack() as stack:
+        if backend == "sqlite":
+            store = SQLiteStorage(str(tmp_path / "bot.db"))
+        elif backend == "mongomock":
+            if request.node.get_closest_marker("server_only"):
+                pytest.skip("mongomock has no partial indexes or $text search")
+            store = await _mongo_storage(await mock_db(), [_mongomock_indexes(m) for m in manifests])
+        else:
+            store = await _mongo_storage(await stack.enter_async_context(server_database()), manifests)
+        await store.open()
+        yield store
+        await store.close()
+
+
+def giveaway(message_id=101, ends_at=NOW, **fields) -> dict:
+    return {
+        "guild_id": GUILD, "channel_id": 50, "message_id": message_id, "prize": "Nitro",
+        "winners_count": 1, "ends_at": ends_at, "ended": False, "required_role": None,
+        "min_level": 0, "bonus_entries": {}, "entries": [], "winners": [], **fields,
+    }
+
+
+def ticket(user_id=10, **fields) -> dict:
+    return {
+        "guild_id": GUILD, "user_id": user_id, "channel_id": None, "status": "open",
+        "created_at": NOW, "closed_at": None, "transcript": [], **fields,
+    }
+
+
+# ── Users ──────────────────────────────────────────────────────────────────
+
+async def test_get_user_creates_defaults(store):
+    user = await store.get_user(5, GUILD)
+    assert (user["user_id"], user["guild_id"]) == (5, GUILD)
+    assert (user["xp"], user["level"], user["messages"], user["last_xp_time"]) == (0, 0, 0, None)
+
+    again = await store.get_user(5, GUILD, "xp", "level")
+    assert (again["xp"], again["level"]) == (0, 0)
+
+
+async def test_record_xp_sets_totals_and_counts_messages(store):
+    await store.record_xp(5, GUILD, 20, 1, NOW)
+    await store.record_xp(5, GUILD, 45, 2, NOW + timedelta(seconds=61))
+    user = await store.get_user(5, GUILD)
+    assert (user["xp"], user["level"], user["messages"]) == (45, 2, 2)
+    assert user["last_xp_time"] == NOW + timedelta(seconds=61)
+
+
+async def test_set_and_reset_xp(store):
+    await store.record_xp(5, GUILD, 20, 1, NOW)
+    await store.set_xp(5, GUILD, 500, 4)
+    user = await store.get_user(5, GUILD)
+    assert (user["xp"], user["level"], user["messages"]) == (500, 4, 1)
+
+    await store.reset_xp(5, GUILD)
+    user = await store.get_user(5, GUILD)
+    assert (user["xp"], user["level"], user["messages"]) == (0, 0, 0)
+
+
+async def test_set_xp_creates_a_complete_user(store):
+    await store.set_xp(6, GUILD, 100, 1)
+    user = await store.get_user(6, GUILD)
+    assert (user["user_id"], user["guild_id"], user["xp"], user["messages"]) == (6, GUILD, 100, 0)
+    assert [u["user_id"] for u in await store.xp_leaderboard(GUILD)] == [6]
+
+
+async def test_rank_and_leaderboard_are_per_guild(store):
+    for uid, xp in [(1, 100), (2, 300), (3, 200), (4, 50)]:
+        await store.set_xp(uid, GUILD, xp, 1)
+    await store.set_xp(9, OTHER_GUILD, 1000, 5)
+
+    board = await store.xp_leaderboard(GUILD, limit=3)
+    assert [(u["user_id"], u["xp"]) for u in board] == [(2, 300), (3, 200), (1, 100)]
+    assert await store.xp_rank(GUILD, 300) == 1
+    assert await store.xp_rank(GUILD, 100) == 3
+    assert await store.xp_rank(GUILD, 0) == 5
+
+
+# ── Warnings ───────────────────────────────────────────────────────────────
+
+async def test_warnings_newest_first_and_cleared(store):
+    for i in range(3):
+        doc = {"guild_id": GUILD, "user_id": 5, "reason": f"r{i}", "moderator_id": 9,
+               "timestamp": NOW + timedelta(minutes=i)}
+        await store.add_warning(doc)
+        assert doc["_id"] is not None
+    await store.add_warning({"guild_id": OTHER_GUILD, "user_id": 5, "reason": "x",
+                             "moderator_id": 9, "timestamp": NOW})
+
+    warnings = await store.get_warnings(5, GUILD)
+    assert [w["reason"] for w in warnings] == ["r2", "r1", "r0"]
+    assert len(await store.get_warnings(5, GUILD, limit=2, stale_ok=True)) == 2
+
+    assert await store.clear_warnings(5, GUILD) == 3
+    assert await store.get_warnings(5, GUILD) == []
+    assert len(await store.get_warnings(5, OTHER_GUILD)) == 1
+
+
+# ── Giveaways ──────────────────────────────────────────────────────────────
+
+async def test_giveaway_lifecycle(store):
+    doc = giveaway()
+    await store.insert_giveaway(doc)
+    assert (await store.get_giveaway(doc["_id"]))["prize"] == "Nitro"
+    assert (await store.find_giveaway(GUILD, 101))["_id"] == doc["_id"]
+    assert await store.find_giveaway(GUILD, 101, ended=True) is None
+
+    after = await store.toggle_giveaway_entry(doc["_id"], "u1")
+    assert after["entries"] == ["u1"]
+    await store.toggle_giveaway_entry(doc["_id"], "u2")
+    after = await store.toggle_giveaway_entry(doc["_id"], "u1")
+    assert after["entries"] == ["u2"]
+
+    await store.finish_giveaway(doc["_id"], ["u2"])
+    finished = await store.find_giveaway(GUILD, 101, ended=True)
+    assert (finished["ended"], finished["winners"]) == (True, ["u2"])
+    assert await store.toggle_giveaway_entry(doc["_id"], "u3") is None
+
+
+async def test_due_and_active_giveaways(store):
+    due, later = giveaway(101, NOW - timedelta(minutes=1)), giveaway(102, NOW + timedelta(hours=1))
+    done = giveaway(103, NOW - timedelta(hours=1), ended=True)
+    for doc in (due, later, done):
+        await store.insert_giveaway(doc)
+
+    assert [g["message_id"] for g in await store.due_giveaways(NOW)] == [101]
+    assert sorted(g["message_id"] for g in await store.active_giveaways(GUILD)) == [101, 102]
+    assert await store.active_giveaways(OTHER_GUILD) == []
+
+
+# ── Tickets ────────────────────────────────────────────────────────────────
+
+async def test_ticket_lifecycle(store):
+    doc = ticket()
+    assert await store.insert_ticket(doc)
+    await store.set_ticket_channel(doc["_id"], 555)
+    [opened] = await store.open_tickets()
+    assert (opened["_id"], opened["channel_id"]) == (doc["_id"], 555)
+
+    await store.close_ticket(doc["_id"], NOW, ["hello"])
+    assert await store.open_tickets() == []
+
+    other = ticket(11)
+    assert await store.insert_ticket(other)
+    await store.delete_ticket(other["_id"])
+    assert await store.open_tickets() == []
+
+
+@pytest.mark.server_only
+async def test_one_open_ticket_per_user(store):
+    assert await store.insert_ticket(ticket())
+    assert not await store.insert_ticket(ticket())
+    [opened] = await store.open_tickets()
+    await store.close_ticket(opened["_id"], NOW, [])
+    assert await store.insert_ticket(ticket())
+
+
+@pytest.mark.server_only
+async def test_search_closed_tickets(store):
+    for i, (user, words) in enumerate([(10, "refund please"), (11, "refund denied"), (12, "hello")]):
+        doc = ticket(user)
+        await store.insert_ticket(doc)
+        await store.close_ticket(doc["_id"], NOW + timedelta(minutes=i), [words])
+    still_open = ticket(13, transcript=["refund"])
+    await store.insert_ticket(still_open)
+
+    found, total = await store.search_tickets(GUILD, "refund", None, None, None, 0, 10)
+    assert total == 2
+    assert sorted(t["user_id"] for t in found) == [10, 11]
+
+    found, total = await store.search_tickets(GUILD, "refund", 11, None, None, 0, 10)
+    assert (total, [t["user_id"] for t in found]) == (1, [11])
+    found, total = await store.search_tickets(GUILD, "refund", None, NOW + timedelta(seconds=30), None, 0, 10)
+    assert (total, [t["user_id"] for t in found]) == (1, [11])
+
+
+# ── Guild settings ─────────────────────────────────────────────────────────
+
+async def test_guild_settings_versions(store):
+    doc = await store.write_guild_settings(GUILD, {"xp_cooldown_seconds": 30, "work_min": 5}, [])
+    assert (doc["settings"], doc["settings_version"]) == ({"xp_cooldown_seconds": 30, "work_min": 5}, 1)
+
+    doc = await store.write_guild_settings(GUILD, {"work_min": 7}, ["xp_cooldown_seconds"])
+    assert (doc["settings"], doc["settings_version"]) == ({"work_min": 7}, 2)
+
+    await store.write_guild_settings(OTHER_GUILD, {"work_min": 1}, [])
+    assert await store.guild_settings_versions() == {GUILD: 2, OTHER_GUILD: 1}
+    assert {d["guild_id"] for d in await store.guild_settings()} == {GUILD, OTHER_GUILD}
+    [only] = await store.guild_settings([OTHER_GUILD])
+    assert only["settings"] == {"work_min": 1}
+
+
+# ── on_message path ────────────────────────────────────────────────────────
+
+async def test_on_message_path_latency(store, record_property):
+    """The leveling hot path (load the user, store the XP) per backend; recorded, not asserted."""
+    rounds = 300
+    start = time.perf_counter()
+    for i in range(rounds):
+        uid = i % 50
+        user = await store.get_user(uid, GUILD, "xp", "level", "last_xp_time")
+        await store.record_xp(uid, GUILD, user["xp"] + 10, user["level"], NOW)
+    per_message = (time.perf_counter() - start) / rounds
+    record_property("on_message_us", round(per_message * 1e6))
+    assert (await store.get_user(0, GUILD))["messages"] == rounds // 50
@@ -0,0 +1,68 @@
+# tests/test_ticket_service.py — Closing a ticket keeps the open-ticket index
+# consistent with the database, even when the close fails halfway.
+
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from services import ticket_service
+
+
+class FlakyStore:
+    """Storage stub whose close_ticket() waits for a go-ahead, then fails or succeeds."""
+
+    def __init__(self, fail: bool):
+        self.fail = fail
+        self.go = asyncio.Event()
+        self.closed = []
+
+    async def close_ticket(self, ticket_id, closed_at, transcript):
+        await self.go.wait()
+        if self.fail:
+            raise ConnectionError("primary stepped down")
+        self.closed.append(ticket_id)
+
+
+def open_ticket(channel_id=50) -> SimpleNamespace:
+    ticket = {"_id": 1, "guild_id": 1, "user_id": 10, "channel_id": channel_id, "status": "open"}
+    ticket_service._index_ticket(ticket)
+
+    async def history(**kwargs):
+        return
+        yield
+
+    return SimpleNamespace(id=channel_id, history=history, guild=SimpleNamespace(id=1, get_channel=lambda cid: None),
+                           category_id=None, send=AsyncMock(), delete=AsyncMock())
+
+
+async def test_failed_close_leaves_the_ticket_open():
+    channel = open_ticket()
+    store = FlakyStore(fail=True)
+    store.go.set()
+
+    with pytest.raises(ConnectionError):
+        await ticket_service.close_ticket(store, channel, closer=None)
+
+    # Still open in the database, so still closable here and still blocking a second ticket
+    assert ticket_service.get_open_ticket(channel.id)
+    assert (1, 10) in ticket_service._open_by_user
+    assert not ticket_service._closing
+
+
+async def test_second_click_while_closing_is_a_no_op():
+    channel = open_ticket()
+    store = FlakyStore(fail=False)
+    first = asyncio.create_task(ticket_service.close_ticket(store, channel, closer=None))
+    await asyncio.sleep(0)
+
+    assert await ticket_service.close_ticket(store, channel, closer=None) == "This ticket is already closing."
+    store.go.set()
+    while not store.closed:
+        await asyncio.sleep(0)
+    first.cancel()   # Now in the 5-second countdown before the channel is deleted
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    assert store.closed == [1]
+    assert not ticket_service.get_open_ticket(channel.id)
@@ -0,0 +1,25 @@
+# tests/test_user_model.py — Schema v2 transition state across processes.
+
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from models import user_model
+
+
+async def test_watchers_leave_migration_mode_when_v2_is_recorded(monkeypatch):
+    monkeypatch.setattr(user_model, "MIGRATION_RECHECK_SECONDS", 0.01)
+    db = AsyncMongoMockClient()["discord_bot"]
+    await user_model.load_schema_state(db)
+    assert user_model.migration_pending()
+    assert user_model.guild_filter(1) == {"guild_id": {"$in": [1, "1"]}}
+
+    watcher = asyncio.create_task(user_model.watch_schema_state(db))
+    await asyncio.sleep(0.05)
+    assert not watcher.done()
+
+    # What migrate_to_v2() writes when it finishes in another process
+    await db.meta.insert_one({"_id": "users_schema", "version": 2})
+    await asyncio.wait_for(watcher, timeout=1)
+    assert not user_model.migration_pending()
+    assert user_model.guild_filter(1) == {"guild_id": 1}